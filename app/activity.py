@@ -0,0 +1,95 @@
+import base64
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from app.config import get_settings
+from app.pubsub import broker
+
+# /users/{user_id}/activity merges a user's movie listings, ratings and comments newest first
+ACTIVITY_KINDS = ("movie", "rating", "comment")
+ACTIVITY_PAGE_SIZE = 20
+ACTIVITY_MAX_PAGE_SIZE = 100
+# First pages read from the primary are cached per worker. A write clears the entry in its own
+# worker at once and in the others through the pub/sub broker (PUBSUB_BACKEND=postgres)
+ACTIVITY_CACHE_SECONDS = get_settings().activity_cache_seconds
+ACTIVITY_INVALIDATION_TOPIC = "activity:invalidate"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# The cursor holds each stream's position: the (created_at, id) of the last item it contributed,
+# or None once it ran dry. Streams missing from it start at the top
+def encode_cursor(positions: dict):
+    data = {kind: None if position is None else [position[0].isoformat(), position[1]] for kind, position in positions.items()}
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(",", ":")).encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return {
+            kind: None if position is None else (datetime.fromisoformat(position[0]), int(position[1]))
+            for kind, position in data.items() if kind in ACTIVITY_KINDS
+        }
+    except (ValueError, TypeError, IndexError, AttributeError) as exc:
+        raise InvalidCursor("Invalid activity cursor") from exc
+
+
+class ActivityCache:
+
+    def __init__(self, ttl_seconds: float = ACTIVITY_CACHE_SECONDS, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        # Stamp of each user's last invalidation, so a page read before it is not stored after it
+        self._versions = OrderedDict()
+        self._clock = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def version(self, user_id: int):
+        with self._lock:
+            return self._versions.get(user_id, 0)
+
+    def get(self, user_id: int, limit: int):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            page_limit, page, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            return page if page_limit == limit else None
+
+    def set(self, user_id: int, limit: int, page, version: int = 0):
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            if self._versions.get(user_id, 0) != version:
+                return
+            self._entries[user_id] = (limit, page, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *user_ids: int):
+        self.forget(*user_ids)
+        broker.publish(ACTIVITY_INVALIDATION_TOPIC, {"user_ids": list(user_ids)})
+
+    def forget(self, *user_ids: int):
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+                self._versions[user_id] = next(self._clock)
+                self._versions.move_to_end(user_id)
+            while len(self._versions) > self.max_entries:
+                self._versions.popitem(last=False)
+
+
+activity_cache = ActivityCache()
+broker.add_listener(ACTIVITY_INVALIDATION_TOPIC, lambda message: activity_cache.forget(*message["user_ids"]))
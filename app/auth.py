@@ -1,23 +1,18 @@
-import os
-
 from datetime import datetime, timedelta, timezone
-from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from dotenv import load_dotenv
 
+from app.config import get_settings
 from app.crud import user_crud_service
 from app.database import SessionLocal, get_db
 
-# Load environment variables from .env file
-load_dotenv()
-
 # Retrieve configuration values
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM")
-ACCESS_TOKEN_EXPIRES_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRES_MINUTES", "30"))
+settings = get_settings()
+SECRET_KEY = settings.secret_key
+ALGORITHM = settings.algorithm
+ACCESS_TOKEN_EXPIRES_MINUTES = settings.access_token_expires_minutes
 
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -42,6 +37,9 @@ def authenticate_user(db: Session, credentials: str, password: str):
 
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
+    # jose loads its cryptography backends on import; only pay for that once tokens are used
+    from jose import jwt
+
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
@@ -58,6 +56,8 @@ async def get_current_user(db: Session = Depends(get_db), token: str = Depends(o
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -0,0 +1,159 @@
+import csv
+import json
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+import app.schemas as schemas
+from app.crud import movie_crud_service
+from app.logger import logger
+
+SUPPORTED_FORMATS = ("ndjson", "csv")
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+# Lines one CSV record may span before its open quote is reported as the error
+MAX_RECORD_LINES = 100
+
+
+def detect_format(content_type: str | None) -> str:
+    if content_type and "csv" in content_type:
+        return "csv"
+    return "ndjson"
+
+
+# Split a stream of byte chunks into byte lines without buffering the whole body; each line is
+# decoded by the parser so a bad one is reported for that row only
+async def aiter_lines(chunks):
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line + b"\n"
+    if buffer:
+        yield buffer
+
+
+class UnclosedQuote(ValueError):
+    pass
+
+
+class MovieRowParser:
+
+    def __init__(self, fmt: str):
+        if fmt not in SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported format '{fmt}'")
+        self.fmt = fmt
+        self.header = None
+        # Lines of a CSV record whose quoted field spans several lines
+        self.pending = []
+
+    # Returns None for blank lines, the CSV header and lines inside an unfinished quoted field
+    def parse(self, line: str | bytes):
+        if isinstance(line, bytes):
+            try:
+                line = line.decode("utf-8")
+            except UnicodeDecodeError:
+                self.pending = []
+                raise
+        if self.fmt == "ndjson":
+            line = line.strip("\r\n")
+            if not line.strip():
+                return None
+            return json.loads(line)
+
+        self.pending.append(line if line.endswith("\n") else line + "\n")
+        record = "".join(self.pending)
+        if not record.strip():
+            self.pending = []
+            return None
+        try:
+            values = next(csv.reader([record], strict=True))
+        except csv.Error as e:
+            # Only a quoted field still open at the end of the line carries on to the next one
+            if str(e) != "unexpected end of data":
+                self.pending = []
+                raise
+            if len(self.pending) >= MAX_RECORD_LINES:
+                raise UnclosedQuote(f"quoted field not closed within {MAX_RECORD_LINES} lines")
+            return None
+        self.pending = []
+
+        if self.header is None:
+            self.header = [name.strip() for name in values]
+            return None
+        if len(values) != len(self.header):
+            raise ValueError(f"expected {len(self.header)} columns, got {len(values)}")
+        return {key: (value if value != "" else None) for key, value in zip(self.header, values)}
+
+
+class MovieBulkImporter:
+
+    def __init__(self, db: Session, user_id: int, fmt: str, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.db = db
+        self.user_id = user_id
+        self.parser = MovieRowParser(fmt)
+        self.batch_size = batch_size
+        self.batch = []
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+
+    def feed(self, line_no: int, line: str | bytes):
+        # A record spanning several lines is reported at its first line
+        line_no -= len(self.parser.pending)
+        try:
+            row = self.parser.parse(line)
+            if row is None:
+                return
+            movie = schemas.MovieCreate.model_validate(row)
+        except UnclosedQuote as e:
+            self._abandon_record(line_no, str(e))
+            return
+        except ValidationError as e:
+            self._record_error(line_no, [{"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()])
+            return
+        except (ValueError, csv.Error) as e:
+            self._record_error(line_no, [{"loc": [], "msg": str(e)}])
+            return
+
+        self.batch.append((line_no, movie))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.batch:
+            return
+        batch, self.batch = self.batch, []
+        try:
+            self.inserted += movie_crud_service.bulk_create_movies(
+                self.db, [movie for _, movie in batch], user_id=self.user_id)
+            return
+        except SQLAlchemyError:
+            self.db.rollback()
+            logger.warning("Bulk movie insert failed, retrying batch row by row...")
+
+        # Isolate the offending rows so the rest of the batch still lands
+        for line_no, movie in batch:
+            try:
+                self.inserted += movie_crud_service.bulk_create_movies(self.db, [movie], user_id=self.user_id)
+            except SQLAlchemyError as e:
+                self.db.rollback()
+                self._record_error(line_no, [{"loc": [], "msg": str(getattr(e, "orig", None) or e)}])
+
+    def finish(self, line_no: int = 0) -> schemas.BulkImportReport:
+        while self.parser.pending:
+            self._abandon_record(line_no - len(self.parser.pending) + 1, "unexpected end of data in quoted field")
+        self.flush()
+        return schemas.BulkImportReport(inserted=self.inserted, failed=self.failed, errors=self.errors)
+
+    def _abandon_record(self, line_no: int, message: str):
+        # Only the line that opened the quote is bad; the lines swallowed after it are parsed again
+        lines, self.parser.pending = self.parser.pending[1:], []
+        self._record_error(line_no, [{"loc": [], "msg": message}])
+        for offset, line in enumerate(lines, start=1):
+            self.feed(line_no + offset, line)
+
+    def _record_error(self, line_no: int, errors: list):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(schemas.BulkImportError(line=line_no, errors=errors))
@@ -0,0 +1,168 @@
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.bulk import DEFAULT_BATCH_SIZE, SUPPORTED_FORMATS, MovieBulkImporter
+from app.crud import idempotency_crud_service, rating_crud_service, rating_stats_crud_service, trending_crud_service
+from app.database import SessionLocal, engine
+from app.migrations import upgrade_schema
+from app.recommendations import ALS_FACTORS, ALS_ITERATIONS, ALS_REGULARIZATION, RECOMMENDATION_MODEL_DIR, save_model, train_als
+from app.similarity import SIMILARITY_METHODS, SIMILARITY_TOP_K, refresh_similarities
+from app.trending import TRENDING_REBUILD_DAYS
+
+
+def migrate(args):
+    # Run once per deploy (the procfile's release step) instead of on every worker boot
+    report = upgrade_schema(engine)
+    if report["duplicates_removed"]:
+        # The removed duplicates were counted in the rating totals
+        db = SessionLocal()
+        try:
+            rating_stats_crud_service.rebuild_stats(db)
+        finally:
+            db.close()
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+def rebuild_rating_stats(args):
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        movies = rating_stats_crud_service.rebuild_stats(db)
+    finally:
+        db.close()
+
+    print(json.dumps({"movies": movies, "seconds": round(time.perf_counter() - started, 3)}, indent=2))
+    return 0
+
+
+def rebuild_trending(args):
+    since = datetime.now(timezone.utc) - timedelta(days=args.days)
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        movies = trending_crud_service.rebuild_trending(db, since)
+    finally:
+        db.close()
+
+    print(json.dumps({"movies": movies, "seconds": round(time.perf_counter() - started, 3)}, indent=2))
+    return 0
+
+
+def purge_idempotency_keys(args):
+    db = SessionLocal()
+    try:
+        deleted = idempotency_crud_service.purge_expired(db)
+    finally:
+        db.close()
+
+    print(json.dumps({"deleted": deleted}, indent=2))
+    return 0
+
+
+def build_similarities(args):
+    # Ratings do not mark movies stale themselves; each run finds the movies whose ratings changed
+    # since the last one, so with --every this keeps running as the scheduled refresh
+    while True:
+        db = SessionLocal()
+        try:
+            stats = refresh_similarities(db, top_k=args.top_k, method=args.method, full=args.full)
+        finally:
+            db.close()
+
+        print(json.dumps(stats, indent=2), flush=True)
+        if not args.every:
+            return 0
+        args.full = False
+        time.sleep(args.every)
+
+
+def train_recommendations(args):
+    db = SessionLocal()
+    try:
+        triples = rating_crud_service.get_rating_triples(db)
+    finally:
+        db.close()
+
+    started = time.perf_counter()
+    model = train_als(triples, factors=args.factors, iterations=args.iterations, regularization=args.regularization)
+    path = save_model(model, args.model_dir)
+    print(json.dumps({
+        "ratings": len(triples),
+        "users": len(model["user_ids"]),
+        "movies": len(model["movie_ids"]),
+        "seconds": round(time.perf_counter() - started, 3),
+        "path": path,
+    }, indent=2))
+    return 0
+
+
+def import_movies(args):
+    fmt = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+    db = SessionLocal()
+    try:
+        importer = MovieBulkImporter(db, user_id=args.user_id, fmt=fmt, batch_size=args.batch_size)
+        line_no = 0
+        # Binary, so each line is decoded by the importer and a bad one fails only that row
+        with open(args.path, "rb") as f:
+            for line_no, line in enumerate(f, start=1):
+                importer.feed(line_no, line)
+        report = importer.finish(line_no)
+    finally:
+        db.close()
+
+    print(report.model_dump_json(indent=2))
+    return 0 if report.failed == 0 else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Movie API management commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    schema_parser = subparsers.add_parser("migrate", aliases=["create-schema"], help="Create missing tables, indexes and unique constraints")
+    schema_parser.set_defaults(func=migrate)
+
+    stats_parser = subparsers.add_parser("rebuild-rating-stats", help="Recompute the per-movie rating totals from the ratings")
+    stats_parser.set_defaults(func=rebuild_rating_stats)
+
+    trending_parser = subparsers.add_parser("rebuild-trending", help="Recompute trending scores from recent ratings and comments")
+    trending_parser.add_argument("--days", type=float, default=TRENDING_REBUILD_DAYS, help="How much activity to replay")
+    trending_parser.set_defaults(func=rebuild_trending)
+
+    idempotency_parser = subparsers.add_parser("purge-idempotency-keys", help="Delete Idempotency-Key records past their replay window")
+    idempotency_parser.set_defaults(func=purge_idempotency_keys)
+
+    similarity_parser = subparsers.add_parser("build-similarities", help="Refresh the similar-movies table from the ratings")
+    similarity_parser.add_argument("--top-k", type=int, default=SIMILARITY_TOP_K)
+    similarity_parser.add_argument("--method", choices=SIMILARITY_METHODS, default=SIMILARITY_METHODS[0])
+    similarity_parser.add_argument("--full", action="store_true", help="Recompute every movie instead of only stale ones")
+    similarity_parser.add_argument("--every", type=float, default=0, help="Keep running, refreshing stale movies every this many seconds")
+    similarity_parser.set_defaults(func=build_similarities)
+
+    als_parser = subparsers.add_parser("train-recommendations", help="Train the ALS factor model behind /users/{id}/recommendations")
+    als_parser.add_argument("--factors", type=int, default=ALS_FACTORS)
+    als_parser.add_argument("--iterations", type=int, default=ALS_ITERATIONS)
+    als_parser.add_argument("--regularization", type=float, default=ALS_REGULARIZATION)
+    als_parser.add_argument("--model-dir", default=RECOMMENDATION_MODEL_DIR)
+    als_parser.set_defaults(func=train_recommendations)
+
+    import_parser = subparsers.add_parser("import-movies", help="Bulk import movies from an NDJSON or CSV file")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--user-id", type=int, required=True, help="Owner of the imported movies")
+    import_parser.add_argument("--format", choices=SUPPORTED_FORMATS, default=None)
+    import_parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    import_parser.set_defaults(func=import_movies)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
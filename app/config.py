@@ -0,0 +1,67 @@
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+# All configuration, read once from the environment and the .env files (app/.env wins)
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_file=(".env", Path(__file__).parent / ".env"), extra="ignore")
+
+    # Database
+    database_url: Optional[str] = None
+    # Comma-separated read replica URLs
+    database_replica_urls: str = ""
+    db_replica_sticky_seconds: float = 5
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_max_connections: int = 0
+    # Same default as the procfile's gunicorn -w, so DB_MAX_CONNECTIONS is split the same way
+    web_concurrency: int = 10
+    db_external_pooler: bool = False
+
+    # Auth
+    secret_key: Optional[str] = None
+    algorithm: Optional[str] = None
+    access_token_expires_minutes: int = 30
+
+    # Logging
+    better_stack_token: Optional[str] = None
+    log_queue_size: int = 10000
+    log_batch_size: int = 100
+    log_flush_interval: float = 0.5
+    log_format: str = "json"
+    log_sample_rate: float = 1.0
+    log_slow_request_ms: float = 1000
+
+    # Metrics and profiling
+    metrics_dir: Optional[str] = None
+    metrics_flush_interval: float = 5
+    sql_profiling: bool = False
+    slow_query_ms: float = 200
+
+    # Recommendations
+    recommendation_model_dir: str = "recommendation_model"
+    # Phantom votes at the global mean added to every movie on /movies/top
+    leaderboard_min_votes: int = 10
+    trending_half_life_hours: float = 24
+
+    # Pub/sub for live streams: "local" or "postgres"
+    pubsub_backend: str = "local"
+    pubsub_queue_size: int = 100
+    pubsub_coalesce_seconds: float = 0.5
+
+    # Activity feeds
+    activity_cache_seconds: float = 30
+
+    # Startup
+    startup_warmup: bool = True
+    warmup_connections: int = 2
+
+
+@lru_cache
+def get_settings():
+    return Settings()
@@ -1,9 +1,41 @@
+from datetime import datetime, timedelta, timezone
+import heapq
+from itertools import islice
 from math import floor
 import statistics
-from sqlalchemy import func, select
+import time
+from sqlalchemy import and_, case, delete, func, insert, literal, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 import app.models as models
 import app.schemas as schemas
+from app.activity import ACTIVITY_KINDS, activity_cache
+from app.pubsub import broker, rating_updates
+from app.trending import TRENDING_COMMENT_WEIGHT, TRENDING_RATING_WEIGHT, decayed, rank_key
+
+# Dialect-specific INSERT that supports ON CONFLICT clauses
+def upsert_insert(db: Session, model):
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+# Running totals in models.MovieRatingStats, updated by every rating write
+RATING_HISTOGRAM_COLUMNS = [f"votes_{value}" for value in range(1, 11)]
+RATING_STATS_COLUMNS = ["rating_count", "rating_sum", *RATING_HISTOGRAM_COLUMNS]
+
+# How long a finished request's response is replayed for its Idempotency-Key
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+# A claim still without a response after this long belongs to a request that died; it can be claimed again
+IDEMPOTENCY_CLAIM_TIMEOUT = timedelta(minutes=1)
+
+# Payload of the live rating-average stream; `version` orders payloads for the same movie
+def rating_average_event(movie_id: int, rating_count: int, rating_sum: int, version: int = 0):
+    return {
+        "movie_id": movie_id,
+        "rating_count": rating_count,
+        "avg_rating": round(rating_sum / rating_count, 2) if rating_count else 0.0,
+        "version": version,
+    }
 
 # User CRUD Operations
 class UserCRUDService:
@@ -25,9 +57,14 @@ class UserCRUDService:
     def get_users(db: Session, offset: int = 0, limit: int = 10):
         return db.query(models.User).offset(offset).limit(limit).all()
 
+    @staticmethod
+    def get_users_by_ids(db: Session, user_ids: list[int]):
+        return db.query(models.User).filter(models.User.id.in_(user_ids)).all()
+
     @staticmethod
     def get_user_by_id(db: Session, user_id: int):
-        return db.query(models.User).filter(models.User.id == user_id).first()
+        # Session.get answers from the identity map when the row was already loaded this request
+        return db.get(models.User, user_id)
 
     @staticmethod
     def get_user_by_username(db: Session, username: str):
@@ -39,9 +76,14 @@ class UserCRUDService:
 
     @staticmethod
     def get_user_by_email_or_username(db: Session, credentials: str):
-        user = UserCRUDService.get_user_by_email(db, credentials) or \
-               UserCRUDService.get_user_by_username(db, credentials)
-        return user
+        # One round trip on every authenticated request; an email match still wins over a username
+        users = (
+            db.query(models.User)
+            .filter(or_(models.User.email == credentials, models.User.username == credentials))
+            .limit(2)
+            .all()
+        )
+        return next((user for user in users if user.email == credentials), users[0] if users else None)
 
     @staticmethod
     def update_user(db: Session, user_id: int, user_updates: schemas.UserUpdate):
@@ -64,6 +106,7 @@ class UserCRUDService:
         if user:
             db.delete(user)
             db.commit()
+            activity_cache.invalidate(user_id)
         return None
 
 # Movies CRUD Operations
@@ -74,16 +117,35 @@ class MovieCRUDService:
         new_movie = models.Movie(**movie_data.model_dump(), user_id=user_id)
         db.add(new_movie)
         db.commit()
+        activity_cache.invalidate(user_id)
         db.refresh(new_movie)
         return new_movie
 
+    @staticmethod
+    def bulk_create_movies(db: Session, movies: list[schemas.MovieCreate], user_id: int):
+        # One executemany round trip and a single commit for the whole batch
+        rows = [dict(**movie.model_dump(), user_id=user_id) for movie in movies]
+        db.execute(insert(models.Movie), rows)
+        db.commit()
+        activity_cache.invalidate(user_id)
+        return len(rows)
+
     @staticmethod
     def get_movies(db: Session, offset: int = 0, limit: int = 10):
         return db.query(models.Movie).offset(offset).limit(limit).all()
 
     @staticmethod
     def get_movie_by_id(db: Session, movie_id: int):
-        return db.query(models.Movie).filter(models.Movie.id == movie_id).first()
+        return db.get(models.Movie, movie_id)
+
+    @staticmethod
+    def get_existing_movie_ids(db: Session, movie_ids: list[int]):
+        query = select(models.Movie.id).where(models.Movie.id.in_(movie_ids))
+        return set(db.execute(query).scalars())
+
+    @staticmethod
+    def get_movies_by_ids(db: Session, movie_ids: list[int]):
+        return db.query(models.Movie).filter(models.Movie.id.in_(movie_ids)).all()
 
     @staticmethod
     def get_movie_by_title(db: Session, title: str, offset: int = 0, limit: int = 10):
@@ -105,6 +167,7 @@ class MovieCRUDService:
 
         db.add(movie)
         db.commit()
+        activity_cache.invalidate(movie.user_id)
         db.refresh(movie)
         return movie
 
@@ -112,25 +175,122 @@ class MovieCRUDService:
     def delete_movie(db: Session, movie_id: int):
         movie = MovieCRUDService.get_movie_by_id(db, movie_id)
         if movie:
+            # Rows derived from the movie reference it without an ORM relationship; they go in the same transaction
+            for model in (models.MovieRatingStats, models.MovieTrending, models.MovieSimilarity):
+                db.query(model).filter(model.movie_id == movie_id).delete(synchronize_session=False)
             db.delete(movie)
             db.commit()
+            activity_cache.invalidate(movie.user_id)
         return None
 
 # Ratings CRUD Operations
 class RatingCRUDService:
 
+    @staticmethod
+    def _insert_rating(db: Session, rating_value: int, user_id: int, movie_id: int):
+        # INSERT ... SELECT FROM movies so a missing movie simply inserts nothing
+        source = (
+            select(literal(user_id), models.Movie.id, literal(rating_value))
+            .where(models.Movie.id == movie_id)
+        )
+        return upsert_insert(db, models.Rating).from_select(["user_id", "movie_id", "rating_value"], source)
+
     @staticmethod
     def rate_movie(db: Session, rating_data: schemas.RatingCreate, user_id: int, movie_id: int):
-        new_rating = models.Rating(
-            **rating_data.model_dump(),
-            user_id=user_id,
-            movie_id=movie_id
+        # Returns None if the user already rated the movie (or the movie does not exist)
+        query = (
+            RatingCRUDService._insert_rating(db, rating_data.rating_value, user_id, movie_id)
+            .on_conflict_do_nothing(index_elements=[models.Rating.user_id, models.Rating.movie_id])
+            .returning(models.Rating)
         )
-        db.add(new_rating)
+        new_rating = db.scalars(query, execution_options={"populate_existing": True}).first()
+        totals = []
+        if new_rating is not None:
+            totals = RatingStatsCRUDService.apply_changes(db, [(movie_id, None, new_rating.rating_value)])
+            TrendingCRUDService.record_activity(db, {movie_id: TRENDING_RATING_WEIGHT})
         db.commit()
-        db.refresh(new_rating)
+        activity_cache.invalidate(user_id)
+        RatingStatsCRUDService.publish_totals(totals)
         return new_rating
 
+    @staticmethod
+    def _write_ratings(db: Session, values: dict[int, int], user_id: int):
+        # Writes a user's ratings and returns {movie_id: (previous value or None, rating)}, leaving out
+        # movies that do not exist. The previous value comes from the write itself: a row the INSERT
+        # created had none, and a row that already existed is locked before it is read and
+        # overwritten, so two concurrent first ratings cannot both be counted as new
+        written = {}
+        pending = dict(values)
+        while pending:
+            source = (
+                select(literal(user_id), models.Movie.id, case(pending, value=models.Movie.id))
+                .where(models.Movie.id.in_(pending))
+            )
+            query = (
+                upsert_insert(db, models.Rating).from_select(["user_id", "movie_id", "rating_value"], source)
+                .on_conflict_do_nothing(index_elements=[models.Rating.user_id, models.Rating.movie_id])
+                .returning(models.Rating)
+            )
+            for rating in db.scalars(query, execution_options={"populate_existing": True}):
+                written[rating.movie_id] = (None, rating)
+                del pending[rating.movie_id]
+
+            previous = RatingCRUDService.get_rating_values(db, user_id, list(pending)) if pending else {}
+            if previous:
+                query = (
+                    update(models.Rating)
+                    .where(models.Rating.user_id == user_id, models.Rating.movie_id.in_(previous))
+                    .values(rating_value=case(pending, value=models.Rating.movie_id))
+                    .returning(models.Rating)
+                )
+                for rating in db.scalars(query, execution_options={"populate_existing": True}):
+                    written[rating.movie_id] = (previous[rating.movie_id], rating)
+                    del pending[rating.movie_id]
+            elif pending:
+                # Neither inserted nor found: the movie is missing, or the rating was deleted in between
+                existing = MovieCRUDService.get_existing_movie_ids(db, list(pending))
+                pending = {movie_id: value for movie_id, value in pending.items() if movie_id in existing}
+        return written
+
+    @staticmethod
+    def upsert_rating(db: Session, rating_data: schemas.RatingCreate, user_id: int, movie_id: int, idempotency_key: str | None = None):
+        # Returns None only if the movie does not exist
+        written = RatingCRUDService._write_ratings(db, {movie_id: rating_data.rating_value}, user_id)
+        rating = None
+        totals = []
+        if movie_id in written:
+            previous, rating = written[movie_id]
+            totals = RatingStatsCRUDService.apply_changes(db, [(movie_id, previous, rating.rating_value)])
+            # Only a first rating is new activity; re-rating must not let one user pump the score
+            if previous is None:
+                TrendingCRUDService.record_activity(db, {movie_id: TRENDING_RATING_WEIGHT})
+        if idempotency_key is not None:
+            # In the rating's transaction, so the key is never left claimed without a response
+            if rating is None:
+                IdempotencyCRUDService.release_key(db, user_id, idempotency_key)
+            else:
+                response = schemas.Rating.model_validate(rating, from_attributes=True).model_dump_json()
+                IdempotencyCRUDService.save_response(db, user_id, idempotency_key, response)
+        db.commit()
+        activity_cache.invalidate(user_id)
+        RatingStatsCRUDService.publish_totals(totals)
+        return rating
+
+    @staticmethod
+    def upsert_ratings(db: Session, ratings: list[schemas.RatingBatchItem], user_id: int):
+        # Last value wins for repeated movies, a single statement cannot touch a row twice
+        values = {item.movie_id: item.rating_value for item in ratings}
+        written = RatingCRUDService._write_ratings(db, values, user_id)
+        totals = RatingStatsCRUDService.apply_changes(
+            db, [(movie_id, previous, rating.rating_value) for movie_id, (previous, rating) in written.items()]
+        )
+        created = [movie_id for movie_id, (previous, _) in written.items() if previous is None]
+        TrendingCRUDService.record_activity(db, dict.fromkeys(created, TRENDING_RATING_WEIGHT))
+        db.commit()
+        activity_cache.invalidate(user_id)
+        RatingStatsCRUDService.publish_totals(totals)
+        return sorted(written)
+
     @staticmethod
     def get_ratings(db: Session, offset: int = 0, limit: int = 10):
         return db.query(models.Rating).offset(offset).limit(limit).all()
@@ -139,9 +299,35 @@ class RatingCRUDService:
     def get_rating(db: Session, user_id: int, movie_id: int):
         return db.query(models.Rating).filter(models.Rating.user_id == user_id, models.Rating.movie_id == movie_id).first()
 
+    @staticmethod
+    def get_rating_values(db: Session, user_id: int, movie_ids: list[int]):
+        # Current values of a user's existing ratings, locked so the stats delta matches what gets overwritten
+        query = (
+            select(models.Rating.movie_id, models.Rating.rating_value)
+            .where(models.Rating.user_id == user_id, models.Rating.movie_id.in_(movie_ids))
+            .with_for_update()
+        )
+        return dict(db.execute(query).all())
+
+    @staticmethod
+    def get_rating_triples(db: Session):
+        # Ratings left without a movie by a delete are not training data
+        return db.execute(
+            select(models.Rating.user_id, models.Rating.movie_id, models.Rating.rating_value)
+            .where(models.Rating.movie_id.is_not(None))
+        ).all()
+
+    @staticmethod
+    def get_rated_movie_ids(db: Session, user_id: int):
+        return set(db.execute(select(models.Rating.movie_id).where(models.Rating.user_id == user_id)).scalars())
+
+    @staticmethod
+    def get_ratings_by_ids(db: Session, rating_ids: list[int]):
+        return db.query(models.Rating).filter(models.Rating.id.in_(rating_ids)).all()
+
     @staticmethod
     def get_rating_by_id(db: Session, rating_id: int):
-        return db.query(models.Rating).filter(models.Rating.id == rating_id).first()
+        return db.get(models.Rating, rating_id)
 
     @staticmethod
     def get_ratings_by_movie(db: Session, movie_id: int, offset: int = 0, limit: int = 10):
@@ -167,23 +353,144 @@ class RatingCRUDService:
         if not rating:
             return None
 
+        # Locked re-read, so the value replaced is the one committed last rather than the one loaded earlier
+        previous = db.scalar(select(models.Rating.rating_value).where(models.Rating.id == rating_id).with_for_update())
+        if previous is None:
+            return None
         updates_dict = rating_updates.model_dump(exclude_unset=True)
         for key, value in updates_dict.items():
             setattr(rating, key, value)
 
         db.add(rating)
+        totals = RatingStatsCRUDService.apply_changes(db, [(rating.movie_id, previous, rating.rating_value)])
         db.commit()
+        activity_cache.invalidate(rating.user_id)
+        RatingStatsCRUDService.publish_totals(totals)
         db.refresh(rating)
         return rating
 
     @staticmethod
     def delete_rating(db: Session, rating_id: int):
-        rating = RatingCRUDService.get_rating_by_id(db, rating_id)
-        if rating:
-            db.delete(rating)
+        # The deleted values come back from the DELETE, so a concurrent second delete subtracts nothing
+        query = (
+            delete(models.Rating)
+            .where(models.Rating.id == rating_id)
+            .returning(models.Rating.user_id, models.Rating.movie_id, models.Rating.rating_value)
+        )
+        deleted = db.execute(query).first()
+        if deleted:
+            totals = RatingStatsCRUDService.apply_changes(db, [(deleted.movie_id, deleted.rating_value, None)])
             db.commit()
+            activity_cache.invalidate(deleted.user_id)
+            RatingStatsCRUDService.publish_totals(totals)
         return None
 
+# Per-movie Rating Aggregates
+class RatingStatsCRUDService:
+
+    @staticmethod
+    def apply_changes(db: Session, changes: list[tuple[int, int | None, int | None]]):
+        # Each change is (movie_id, old value, new value); None means no rating on that side.
+        # Returns the new (movie_id, rating_count, rating_sum, version) of every movie that changed
+        deltas = {}
+        for movie_id, old_value, new_value in changes:
+            delta = deltas.setdefault(movie_id, dict.fromkeys(RATING_STATS_COLUMNS, 0))
+            for value, sign in ((old_value, -1), (new_value, 1)):
+                if value is not None:
+                    delta["rating_count"] += sign
+                    delta["rating_sum"] += sign * value
+                    delta[f"votes_{value}"] += sign
+
+        rows = [{"movie_id": movie_id, **delta, "version": 1} for movie_id, delta in deltas.items() if any(delta.values())]
+        if not rows:
+            return []
+        stats = models.MovieRatingStats
+        query = upsert_insert(db, stats).values(rows)
+        set_ = {column: getattr(stats, column) + query.excluded[column] for column in RATING_STATS_COLUMNS}
+        # The row lock taken by the upsert orders concurrent writers, so versions follow the totals
+        set_.update(updated_at=func.now(), version=stats.version + 1)
+        query = query.on_conflict_do_update(index_elements=[stats.movie_id], set_=set_)
+        return db.execute(query.returning(stats.movie_id, stats.rating_count, stats.rating_sum, stats.version)).all()
+
+    @staticmethod
+    def publish_totals(totals):
+        # Called after the commit; bursts are coalesced to the newest totals per movie
+        for movie_id, rating_count, rating_sum, version in totals:
+            rating_updates.publish(f"ratings:{movie_id}", rating_average_event(movie_id, rating_count, rating_sum, version))
+
+    @staticmethod
+    def _stats_query():
+        stats = models.MovieRatingStats
+        return (
+            select(stats.movie_id, stats.rating_count, stats.rating_sum, stats.updated_at,
+                   models.Movie.title, models.Movie.genre, models.Movie.release_year)
+            .join(models.Movie, models.Movie.id == stats.movie_id)
+        )
+
+    @staticmethod
+    def get_all_stats(db: Session):
+        return db.execute(RatingStatsCRUDService._stats_query()).all()
+
+    @staticmethod
+    def get_stats_changed_since(db: Session, since):
+        query = RatingStatsCRUDService._stats_query().where(models.MovieRatingStats.updated_at >= since)
+        return db.execute(query).all()
+
+    @staticmethod
+    def get_stats_for_movies(db: Session, movie_ids: list[int]):
+        return db.query(models.MovieRatingStats).filter(models.MovieRatingStats.movie_id.in_(movie_ids)).all()
+
+    @staticmethod
+    def summarize(stats):
+        # Count, mean, median and population standard deviation from the histogram alone
+        histogram = [getattr(stats, column) for column in RATING_HISTOGRAM_COLUMNS] if stats else [0] * len(RATING_HISTOGRAM_COLUMNS)
+        count = sum(histogram)
+        if not count:
+            return {"count": 0, "mean": None, "median": None, "std_dev": None, "histogram": histogram}
+
+        values = range(1, len(histogram) + 1)
+        mean = sum(value * votes for value, votes in zip(values, histogram)) / count
+        variance = sum(votes * (value - mean) ** 2 for value, votes in zip(values, histogram)) / count
+
+        def value_at(position: int):
+            seen = 0
+            for value, votes in zip(values, histogram):
+                seen += votes
+                if seen > position:
+                    return value
+
+        return {
+            "count": count,
+            "mean": round(mean, 2),
+            # Average of the two middle ratings, which are the same one when count is odd
+            "median": (value_at((count - 1) // 2) + value_at(count // 2)) / 2,
+            "std_dev": round(variance ** 0.5, 2),
+            "histogram": histogram,
+        }
+
+    @staticmethod
+    def rebuild_stats(db: Session):
+        # Recomputes every row from the ratings table; for backfills and repairing drift
+        rating = models.Rating
+        # Every rebuilt row gets a version above any published so far, so streams accept the new totals
+        version = (db.scalar(select(func.max(models.MovieRatingStats.version))) or 0) + 1
+        source = (
+            select(
+                rating.movie_id,
+                func.count(rating.id),
+                func.coalesce(func.sum(rating.rating_value), 0),
+                *[func.sum(case((rating.rating_value == value, 1), else_=0)) for value in range(1, len(RATING_HISTOGRAM_COLUMNS) + 1)],
+                literal(version),
+            )
+            # Ratings left with a NULL movie_id when their movie was deleted
+            .where(rating.movie_id.is_not(None))
+            .group_by(rating.movie_id)
+        )
+        db.query(models.MovieRatingStats).delete(synchronize_session=False)
+        db.execute(insert(models.MovieRatingStats).from_select(["movie_id", *RATING_STATS_COLUMNS, "version"], source))
+        db.commit()
+        return db.query(models.MovieRatingStats).count()
+
 # Comments CRUD Operations
 class CommentCRUDService:
 
@@ -195,10 +502,19 @@ class CommentCRUDService:
             movie_id=movie_id
         )
         db.add(new_comment)
+        TrendingCRUDService.record_activity(db, {movie_id: TRENDING_COMMENT_WEIGHT})
         db.commit()
+        activity_cache.invalidate(user_id)
         db.refresh(new_comment)
+        CommentCRUDService._publish(new_comment)
         return new_comment
 
+    @staticmethod
+    def _publish(comment: models.Comment):
+        # After the commit, so subscribers never see a comment that was rolled back
+        event = schemas.CommentEvent.model_validate(comment).model_dump(mode="json")
+        broker.publish(f"comments:{comment.movie_id}", event)
+
     @staticmethod
     def get_comments(db: Session, offset: int = 0, limit: int = 10):
         subquery = (
@@ -225,6 +541,29 @@ class CommentCRUDService:
 
         return comments_with_replies
 
+    @staticmethod
+    def get_comments_by_ids(db: Session, comment_ids: list[int]):
+        return db.query(models.Comment).filter(models.Comment.id.in_(comment_ids)).all()
+
+    @staticmethod
+    def count_replies(db: Session, comment_ids: list[int]):
+        query = (
+            select(models.Comment.parent_id, func.count(models.Comment.id))
+            .where(models.Comment.parent_id.in_(comment_ids))
+            .group_by(models.Comment.parent_id)
+        )
+        return dict(db.execute(query).all())
+
+    @staticmethod
+    def get_comments_by_movie_after(db: Session, movie_id: int, after_id: int, limit: int = 100):
+        return (
+            db.query(models.Comment)
+            .filter(models.Comment.movie_id == movie_id, models.Comment.id > after_id)
+            .order_by(models.Comment.id)
+            .limit(limit)
+            .all()
+        )
+
     @staticmethod
     def get_replies(db: Session, parent_id: int, offset: int = 0, limit: int = 10):
         return db.query(models.Comment).filter(models.Comment.parent_id == parent_id).offset(offset).limit(limit).all()
@@ -260,7 +599,7 @@ class CommentCRUDService:
 
     @staticmethod
     def get_comment(db: Session, comment_id: int):
-        return db.query(models.Comment).filter(models.Comment.id == comment_id).first()
+        return db.get(models.Comment, comment_id)
 
     @staticmethod
     def reply_to_comment(db: Session, parent_id: int, comment_data: schemas.CommentBase, user_id: int):
@@ -275,8 +614,11 @@ class CommentCRUDService:
             user_id=user_id
         )
         db.add(new_comment)
+        TrendingCRUDService.record_activity(db, {parent_comment.movie_id: TRENDING_COMMENT_WEIGHT})
         db.commit()
+        activity_cache.invalidate(user_id)
         db.refresh(new_comment)
+        CommentCRUDService._publish(new_comment)
         return new_comment
 
     @staticmethod
@@ -291,6 +633,7 @@ class CommentCRUDService:
 
         db.add(comment)
         db.commit()
+        activity_cache.invalidate(comment.user_id)
         db.refresh(comment)
         return comment
 
@@ -300,10 +643,229 @@ class CommentCRUDService:
         if comment:
             db.delete(comment)
             db.commit()
+            activity_cache.invalidate(comment.user_id)
         return None
 
+# Export Operations
+class ExportCRUDService:
+
+    @staticmethod
+    def stream_rows(db: Session, model, columns: list[str], after_id: int = 0, batch_size: int = 1000):
+        # Keyset scan over the primary key with a server-side cursor, yielded in partitions
+        query = (
+            select(*[getattr(model, column) for column in columns])
+            .where(model.id > after_id)
+            .order_by(model.id)
+            .execution_options(yield_per=batch_size)
+        )
+        return db.execute(query).partitions()
+
+# Movie Similarity Operations
+class SimilarityCRUDService:
+
+    @staticmethod
+    def get_similarity_rows(db: Session):
+        return db.execute(
+            select(
+                models.MovieSimilarity.movie_id,
+                models.MovieSimilarity.neighbor_ids,
+                models.MovieSimilarity.scores,
+                models.MovieSimilarity.rating_count,
+                models.MovieSimilarity.rating_checksum,
+            )
+        ).all()
+
+    @staticmethod
+    def get_similarity(db: Session, movie_id: int):
+        return db.get(models.MovieSimilarity, movie_id)
+
+    @staticmethod
+    def replace_similarities(db: Session, rows: list[dict], removed_movie_ids: list[int], chunk_size: int = 500):
+        movie_ids = [row["movie_id"] for row in rows] + list(removed_movie_ids)
+        for start in range(0, len(movie_ids), chunk_size):
+            chunk = movie_ids[start:start + chunk_size]
+            db.query(models.MovieSimilarity).filter(models.MovieSimilarity.movie_id.in_(chunk)).delete(synchronize_session=False)
+        for start in range(0, len(rows), chunk_size):
+            db.execute(insert(models.MovieSimilarity), rows[start:start + chunk_size])
+        db.commit()
+
+# Trending Score Operations
+class TrendingCRUDService:
+
+    @staticmethod
+    def record_activity(db: Session, weights: dict[int, float], at: float | None = None):
+        # Decays each movie's stored score up to `at` and adds the new activity on top
+        if not weights:
+            return
+        at = time.time() if at is None else at
+        trending = models.MovieTrending
+        current = db.execute(
+            select(trending.movie_id, trending.score, trending.score_updated_at)
+            .where(trending.movie_id.in_(list(weights)))
+            .with_for_update()
+        ).all()
+        scores = {movie_id: decayed(score, updated_at, at) for movie_id, score, updated_at in current}
+
+        rows = []
+        for movie_id, weight in weights.items():
+            score = scores.get(movie_id, 0.0) + weight
+            rows.append({"movie_id": movie_id, "score": score, "score_updated_at": at, "rank_key": rank_key(score, at)})
+        query = upsert_insert(db, trending).values(rows)
+        query = query.on_conflict_do_update(
+            index_elements=[trending.movie_id],
+            set_={
+                "score": query.excluded.score,
+                "score_updated_at": query.excluded.score_updated_at,
+                "rank_key": query.excluded.rank_key,
+            }
+        )
+        db.execute(query)
+
+    @staticmethod
+    def get_trending(db: Session, limit: int = 10, genre: str | None = None):
+        query = (
+            select(models.MovieTrending.score, models.MovieTrending.score_updated_at, models.Movie)
+            .join(models.Movie, models.Movie.id == models.MovieTrending.movie_id)
+            .order_by(models.MovieTrending.rank_key.desc())
+            .limit(limit)
+        )
+        if genre is not None:
+            query = query.where(models.Movie.genre == genre)
+        return db.execute(query).all()
+
+    @staticmethod
+    def rebuild_trending(db: Session, since: datetime, chunk_size: int = 1000):
+        # Replays rating and comment creation since `since`; for backfills and half-life changes
+        now = time.time()
+        scores = {}
+        for model, weight in ((models.Rating, TRENDING_RATING_WEIGHT), (models.Comment, TRENDING_COMMENT_WEIGHT)):
+            query = (
+                select(model.movie_id, model.created_at)
+                .where(model.created_at >= since, model.movie_id.is_not(None))
+                .execution_options(yield_per=chunk_size)
+            )
+            for movie_id, created_at in db.execute(query):
+                if created_at.tzinfo is None:
+                    created_at = created_at.replace(tzinfo=timezone.utc)
+                scores[movie_id] = scores.get(movie_id, 0.0) + decayed(weight, created_at.timestamp(), now)
+
+        rows = [
+            {"movie_id": movie_id, "score": score, "score_updated_at": now, "rank_key": rank_key(score, now)}
+            for movie_id, score in scores.items() if score > 0
+        ]
+        db.query(models.MovieTrending).delete(synchronize_session=False)
+        for start in range(0, len(rows), chunk_size):
+            db.execute(insert(models.MovieTrending), rows[start:start + chunk_size])
+        db.commit()
+        return len(rows)
+
+# User Activity Operations
+class ActivityCRUDService:
+
+    # Per stream: the model and the columns an activity item carries besides id and created_at
+    STREAMS = {
+        "movie": (models.Movie, ["title"]),
+        "rating": (models.Rating, ["movie_id", "rating_value"]),
+        "comment": (models.Comment, ["movie_id", "parent_id", "comment"]),
+    }
+
+    @staticmethod
+    def get_activity_stream(db: Session, kind: str, user_id: int, after: tuple | None, limit: int):
+        # Keyset page of one stream ordered by (created_at, id) descending. The anchor timestamp is
+        # read back from the row itself so it compares in the database's own representation
+        model, columns = ActivityCRUDService.STREAMS[kind]
+        query = (
+            select(model.id, model.created_at, *[getattr(model, column) for column in columns])
+            .where(model.user_id == user_id)
+            .order_by(model.created_at.desc(), model.id.desc())
+            .limit(limit)
+        )
+        if after is not None:
+            after_at, after_id = after
+            anchor = func.coalesce(select(model.created_at).where(model.id == after_id).scalar_subquery(), after_at)
+            query = query.where(or_(model.created_at < anchor, and_(model.created_at == anchor, model.id < after_id)))
+        return [{"type": kind, **row._asdict()} for row in db.execute(query)]
+
+    @staticmethod
+    def get_user_activity(db: Session, user_id: int, limit: int, positions: dict):
+        # k-way merge of the three streams; each contributes at most limit + 1 rows per page
+        rank = {kind: index for index, kind in enumerate(ACTIVITY_KINDS)}
+        streams = {
+            kind: ActivityCRUDService.get_activity_stream(db, kind, user_id, positions.get(kind), limit + 1)
+            for kind in ACTIVITY_KINDS if kind not in positions or positions[kind] is not None
+        }
+        merged = heapq.merge(*streams.values(), key=lambda item: (item["created_at"], -rank[item["type"]], item["id"]), reverse=True)
+        items = list(islice(merged, limit))
+
+        positions = dict(positions)
+        for kind, rows in streams.items():
+            used = [item for item in items if item["type"] == kind]
+            if used:
+                positions[kind] = (used[-1]["created_at"], used[-1]["id"])
+            if len(used) == len(rows):
+                positions[kind] = None
+        has_more = any(positions.get(kind, True) is not None for kind in ACTIVITY_KINDS)
+        return items, positions if has_more else None
+
+# Idempotency-Key Operations
+class IdempotencyCRUDService:
+
+    @staticmethod
+    def claim_key(db: Session, user_id: int, key: str, fingerprint: str):
+        # Returns None when this request now owns the key, otherwise the existing row. The claim is
+        # part of the caller's transaction, so it commits or rolls back together with the write; a
+        # concurrent request with the same key waits on the primary key until then
+        now = datetime.now(timezone.utc)
+        db.query(models.IdempotencyKey).filter(
+            models.IdempotencyKey.user_id == user_id,
+            models.IdempotencyKey.key == key,
+            or_(
+                models.IdempotencyKey.created_at < now - IDEMPOTENCY_KEY_TTL,
+                and_(models.IdempotencyKey.response.is_(None), models.IdempotencyKey.created_at < now - IDEMPOTENCY_CLAIM_TIMEOUT),
+            ),
+        ).delete(synchronize_session=False)
+        query = (
+            upsert_insert(db, models.IdempotencyKey)
+            .values(user_id=user_id, key=key, fingerprint=fingerprint)
+            .on_conflict_do_nothing(index_elements=[models.IdempotencyKey.user_id, models.IdempotencyKey.key])
+            .returning(models.IdempotencyKey.key)
+        )
+        if db.execute(query).first() is not None:
+            return None
+        return db.execute(
+            select(models.IdempotencyKey.fingerprint, models.IdempotencyKey.response)
+            .where(models.IdempotencyKey.user_id == user_id, models.IdempotencyKey.key == key)
+        ).first()
+
+    @staticmethod
+    def save_response(db: Session, user_id: int, key: str, response: str):
+        # Committed by the caller, together with the write the response describes
+        db.query(models.IdempotencyKey).filter(
+            models.IdempotencyKey.user_id == user_id, models.IdempotencyKey.key == key
+        ).update({"response": response}, synchronize_session=False)
+
+    @staticmethod
+    def release_key(db: Session, user_id: int, key: str):
+        # For requests that failed, so a retry runs again instead of replaying the failure
+        db.query(models.IdempotencyKey).filter(
+            models.IdempotencyKey.user_id == user_id, models.IdempotencyKey.key == key
+        ).delete(synchronize_session=False)
+
+    @staticmethod
+    def purge_expired(db: Session):
+        cutoff = datetime.now(timezone.utc) - IDEMPOTENCY_KEY_TTL
+        deleted = db.query(models.IdempotencyKey).filter(models.IdempotencyKey.created_at < cutoff).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+
 # Instantiate CRUD Services
 user_crud_service = UserCRUDService()
 movie_crud_service = MovieCRUDService()
 rating_crud_service = RatingCRUDService()
+rating_stats_crud_service = RatingStatsCRUDService()
 comment_crud_service = CommentCRUDService()
+export_crud_service = ExportCRUDService()
+similarity_crud_service = SimilarityCRUDService()
+trending_crud_service = TrendingCRUDService()
+activity_crud_service = ActivityCRUDService()
+idempotency_crud_service = IdempotencyCRUDService()
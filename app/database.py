@@ -1,20 +1,190 @@
-import os
-from dotenv import load_dotenv
+import random
+import threading
+import time
+from fastapi import Request, Response
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
+from app.config import get_settings
 
-# Load environment variables from .env file
-load_dotenv()
+settings = get_settings()
+
+SQLALCHEMY_DATABASE_URL = settings.database_url
+
+# Comma-separated read replica URLs; GET routes are served from these when set
+DATABASE_REPLICA_URLS = [url.strip() for url in settings.database_replica_urls.split(",") if url.strip()]
+# How long a user's reads stay on the primary after they write
+DB_REPLICA_STICKY_SECONDS = settings.db_replica_sticky_seconds
+
+# Connection pool settings (per worker process)
+DB_POOL_SIZE = settings.db_pool_size
+DB_MAX_OVERFLOW = settings.db_max_overflow
+DB_POOL_TIMEOUT = settings.db_pool_timeout
+DB_POOL_RECYCLE = settings.db_pool_recycle
+DB_POOL_PRE_PING = settings.db_pool_pre_ping
+# Total connections the whole deployment may open; split across gunicorn workers when set
+DB_MAX_CONNECTIONS = settings.db_max_connections
+WEB_CONCURRENCY = settings.web_concurrency
+# Set when connecting through PgBouncer/pgpool in transaction mode
+DB_EXTERNAL_POOLER = settings.db_external_pooler
+
+
+class PoolStats:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.waits = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.waits += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checkouts": self.waits,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait / self.waits * 1000, 3) if self.waits else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+
+# QueuePool that records how long each checkout waited for a connection
+class TimedQueuePool(QueuePool):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record_wait(time.perf_counter() - start)
+        return connection
+
+
+def worker_pool_limits(pool_size: int, max_overflow: int, max_connections: int, workers: int):
+    # Keep workers * (pool_size + max_overflow) within the deployment-wide budget
+    if max_connections <= 0:
+        return pool_size, max_overflow
+    per_worker = max(1, max_connections // max(1, workers))
+    pool_size = min(pool_size, per_worker)
+    return pool_size, max(0, min(max_overflow, per_worker - pool_size))
+
+
+def engine_options(database_url: str):
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+
+    if DB_EXTERNAL_POOLER:
+        # The external pooler owns connections; also turn off driver-side prepared statements
+        connect_args = {}
+        if url.get_driver_name() == "psycopg":
+            connect_args["prepare_threshold"] = None
+        elif url.get_driver_name() == "asyncpg":
+            connect_args["statement_cache_size"] = 0
+        return {"poolclass": NullPool, "pool_pre_ping": DB_POOL_PRE_PING, "connect_args": connect_args}
+
+    pool_size, max_overflow = worker_pool_limits(DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_MAX_CONNECTIONS, WEB_CONCURRENCY)
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def get_pool_status(engine):
+    pool = engine.pool
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(0, pool.overflow()),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+        })
+    if isinstance(pool, TimedQueuePool):
+        status.update(pool.stats.snapshot())
+    return status
+
+
+# Routes read-only sessions to replicas, except for users who wrote within the sticky window
+class ReplicaRouter:
+
+    STICKY_COOKIE = "db_primary_until"
+
+    def __init__(self, primary, replicas=None, sticky_seconds: float = DB_REPLICA_STICKY_SECONDS):
+        self.primary = primary
+        self.replicas = list(replicas or [])
+        self.sticky_seconds = sticky_seconds
+        self._recent_writers = {}
+        self._lock = threading.Lock()
+
+    def mark_write(self, request: Request, response: Response | None = None):
+        if not self.replicas:
+            return
+        until = time.time() + self.sticky_seconds
+        key = request.headers.get("authorization")
+        if key:
+            with self._lock:
+                self._recent_writers[key] = until
+                self._prune(time.time())
+        # The cookie carries stickiness to the other gunicorn workers
+        if response is not None:
+            response.set_cookie(self.STICKY_COOKIE, str(until), max_age=max(1, int(self.sticky_seconds)), httponly=True)
+
+    def engine_for(self, request: Request):
+        if not self.replicas or self._is_sticky(request):
+            return self.primary
+        return random.choice(self.replicas)
+
+    def _is_sticky(self, request: Request):
+        now = time.time()
+        try:
+            if float(request.cookies.get(self.STICKY_COOKIE, 0)) > now:
+                return True
+        except ValueError:
+            pass
+        key = request.headers.get("authorization")
+        if not key:
+            return False
+        with self._lock:
+            return self._recent_writers.get(key, 0) > now
+
+    def _prune(self, now: float):
+        if len(self._recent_writers) > 10000:
+            self._recent_writers = {key: until for key, until in self._recent_writers.items() if until > now}
 
-# Load environment variables from .env file
-SQLALCHEMY_DATABASE_URL = os.environ.get('DATABASE_URL')
 
 # Create SQLAlchemy engine
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL
+    SQLALCHEMY_DATABASE_URL,
+    **engine_options(SQLALCHEMY_DATABASE_URL)
 )
 
+replica_engines = [create_engine(url, **engine_options(url)) for url in DATABASE_REPLICA_URLS]
+replica_router = ReplicaRouter(engine, replica_engines)
+
 
 # Create a session maker bound to the engine
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -23,10 +193,21 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
-def get_db():
+def get_db(request: Request, response: Response):
      # Provide a database session to be used in dependency injection
+    if request.method not in ("GET", "HEAD", "OPTIONS"):
+        replica_router.mark_write(request, response)
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def get_read_db(request: Request):
+    # Read-only session for GET routes, served by a replica when one is configured
+    db = SessionLocal(bind=replica_router.engine_for(request))
+    try:
+        yield db
+    finally:
+        db.close()
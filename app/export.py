@@ -0,0 +1,66 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+import app.models as models
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+DEFAULT_EXPORT_BATCH_SIZE = 1000
+
+# Columns exported per resource; `id` always comes first since it is the keyset cursor
+EXPORT_COLUMNS = {
+    "movies": (models.Movie, ["id", "title", "genre", "description", "release_year", "user_id", "created_at"]),
+    "ratings": (models.Rating, ["id", "user_id", "movie_id", "rating_value", "created_at"]),
+    "comments": (models.Comment, ["id", "user_id", "movie_id", "parent_id", "comment", "created_at"]),
+}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_ndjson(columns: list[str], rows) -> str:
+    return "".join(
+        json.dumps(dict(zip(columns, row)), default=_json_default, separators=(",", ":")) + "\n"
+        for row in rows
+    )
+
+
+def encode_csv(columns: list[str], rows, header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+# Encode partitions of rows into output chunks, one chunk per partition
+def iter_export(columns: list[str], partitions, fmt: str, compress: bool = False):
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    first = True
+
+    for rows in partitions:
+        if fmt == "csv":
+            chunk = encode_csv(columns, rows, header=first)
+        else:
+            chunk = encode_ndjson(columns, rows)
+        first = False
+
+        data = chunk.encode("utf-8")
+        if compressor:
+            data = compressor.compress(data)
+        if data:
+            yield data
+
+    if fmt == "csv" and first:
+        data = encode_csv(columns, [], header=True).encode("utf-8")
+        yield compressor.compress(data) + compressor.flush() if compressor else data
+    elif compressor:
+        yield compressor.flush()
@@ -0,0 +1,153 @@
+import threading
+import time
+from datetime import timedelta
+from bisect import bisect_left, insort
+from sqlalchemy.orm import Session
+from app.config import get_settings
+from app.crud import movie_crud_service, rating_stats_crud_service
+
+# Ranked by a Bayesian average: every movie starts with LEADERBOARD_MIN_VOTES phantom votes at
+# the global mean, so a single 10/10 cannot outrank hundreds of 9s
+LEADERBOARD_MIN_VOTES = get_settings().leaderboard_min_votes
+# How often a worker asks the stats table for rows changed by any worker
+LEADERBOARD_POLL_SECONDS = 1
+# Full reload from the stats table; refreshes the global mean and titles
+LEADERBOARD_REBUILD_SECONDS = 300
+LEADERBOARD_MAX_LIMIT = 100
+
+
+class LeaderboardEntry:
+    __slots__ = ("movie_id", "title", "genre", "release_year", "rating_count", "rating_sum", "key")
+
+    def __init__(self, row, key):
+        self.movie_id = row.movie_id
+        self.title = row.title
+        self.genre = row.genre
+        self.release_year = row.release_year
+        self.rating_count = row.rating_count
+        self.rating_sum = row.rating_sum
+        self.key = key
+
+
+# Per-worker ranking kept in sorted lists of (-score, movie_id): one overall, one per genre and
+# one per release year. Reads walk a list from the front; changes move a single key
+class Leaderboard:
+
+    def __init__(self, min_votes: int = LEADERBOARD_MIN_VOTES, poll_interval: float = LEADERBOARD_POLL_SECONDS,
+                 rebuild_interval: float = LEADERBOARD_REBUILD_SECONDS):
+        self.min_votes = min_votes
+        self.poll_interval = poll_interval
+        self.rebuild_interval = rebuild_interval
+        self.global_mean = 0.0
+        self._entries = {}
+        self._ranked = []
+        self._by_genre = {}
+        self._by_year = {}
+        self._changed_since = None
+        self._polled_at = None
+        self._rebuilt_at = None
+        self._lock = threading.Lock()
+
+    def score(self, rating_count: int, rating_sum: int):
+        return (self.min_votes * self.global_mean + rating_sum) / (self.min_votes + rating_count)
+
+    def _lists(self, entry: LeaderboardEntry):
+        yield self._ranked
+        yield self._by_genre.setdefault(entry.genre, [])
+        if entry.release_year is not None:
+            yield self._by_year.setdefault(entry.release_year, [])
+
+    def _remove(self, movie_id: int):
+        entry = self._entries.pop(movie_id, None)
+        if entry is None:
+            return
+        for ranked in self._lists(entry):
+            index = bisect_left(ranked, entry.key)
+            if index < len(ranked) and ranked[index] == entry.key:
+                del ranked[index]
+
+    def _add(self, row):
+        if row.rating_count <= 0:
+            return
+        entry = LeaderboardEntry(row, (-self.score(row.rating_count, row.rating_sum), row.movie_id))
+        self._entries[row.movie_id] = entry
+        for ranked in self._lists(entry):
+            insort(ranked, entry.key)
+
+    def _track(self, rows):
+        for row in rows:
+            if self._changed_since is None or row.updated_at > self._changed_since:
+                self._changed_since = row.updated_at
+
+    def rebuild(self, db: Session):
+        rows = rating_stats_crud_service.get_all_stats(db)
+        total_count = sum(row.rating_count for row in rows)
+        self.global_mean = sum(row.rating_sum for row in rows) / total_count if total_count else 0.0
+
+        self._entries, self._ranked, self._by_genre, self._by_year = {}, [], {}, {}
+        for row in rows:
+            if row.rating_count > 0:
+                self._entries[row.movie_id] = LeaderboardEntry(row, (-self.score(row.rating_count, row.rating_sum), row.movie_id))
+        # One sort per list is cheaper than inserting keys one by one
+        for entry in self._entries.values():
+            for ranked in self._lists(entry):
+                ranked.append(entry.key)
+        for ranked in (self._ranked, *self._by_genre.values(), *self._by_year.values()):
+            ranked.sort()
+        self._track(rows)
+        self._rebuilt_at = self._polled_at = time.monotonic()
+
+    def apply_changes(self, db: Session):
+        # Looks a second further back than the newest row seen, for timestamps stored without
+        # fractions and for transactions that commit out of order; re-applying a row is harmless
+        if self._changed_since is None:
+            return self.rebuild(db)
+        rows = rating_stats_crud_service.get_stats_changed_since(db, self._changed_since - timedelta(seconds=1))
+        for row in rows:
+            self._remove(row.movie_id)
+            self._add(row)
+        self._track(rows)
+        self._polled_at = time.monotonic()
+
+    def refresh(self, db: Session):
+        now = time.monotonic()
+        with self._lock:
+            if self._rebuilt_at is None or now - self._rebuilt_at >= self.rebuild_interval:
+                self.rebuild(db)
+            elif now - self._polled_at >= self.poll_interval:
+                self.apply_changes(db)
+
+    def top(self, db: Session, limit: int = 10, genre: str | None = None, year: int | None = None):
+        self.refresh(db)
+        while True:
+            with self._lock:
+                results = self._walk(limit, genre, year)
+            # A deleted movie takes its stats row with it, which polling for changed rows cannot see
+            existing = movie_crud_service.get_existing_movie_ids(db, [entry.movie_id for entry in results])
+            deleted = [entry.movie_id for entry in results if entry.movie_id not in existing]
+            if not deleted:
+                return results
+            with self._lock:
+                for movie_id in deleted:
+                    self._remove(movie_id)
+
+    def _walk(self, limit: int, genre: str | None, year: int | None):
+        if genre is not None:
+            ranked = self._by_genre.get(genre, [])
+        elif year is not None:
+            ranked = self._by_year.get(year, [])
+        else:
+            ranked = self._ranked
+
+        results = []
+        for _, movie_id in ranked:
+            entry = self._entries[movie_id]
+            if year is not None and entry.release_year != year:
+                continue
+            results.append(entry)
+            if len(results) >= limit:
+                break
+        return results
+
+
+leaderboard = Leaderboard()
@@ -0,0 +1,106 @@
+import asyncio
+from fastapi import Depends
+from sqlalchemy.orm import Session
+from app.crud import comment_crud_service, movie_crud_service, rating_crud_service, user_crud_service
+from app.database import get_db, get_read_db
+
+# Ids per IN query; keeps huge id lists under the database's bind parameter limit
+LOADER_CHUNK_SIZE = 1000
+# Ids listed in X-Missing-Ids, keeping the header under proxy size limits; X-Missing-Count has the total
+MISSING_IDS_HEADER_LIMIT = 100
+
+
+# Rows of one model by primary key, remembered for the rest of the request (misses included);
+# whatever is not known yet is fetched in one IN query per LOADER_CHUNK_SIZE ids
+class ModelLoader:
+
+    def __init__(self, fetch, chunk_size: int = LOADER_CHUNK_SIZE):
+        self.fetch = fetch
+        self.chunk_size = chunk_size
+        self._rows = {}
+        self._pending = {}
+
+    def load_many(self, ids: list[int]):
+        # Same order as `ids`; None for ids that do not exist
+        missing = [row_id for row_id in dict.fromkeys(ids) if row_id not in self._rows]
+        for start in range(0, len(missing), self.chunk_size):
+            chunk = missing[start:start + self.chunk_size]
+            found = {row.id: row for row in self.fetch(chunk)}
+            for row_id in chunk:
+                self._rows[row_id] = found.get(row_id)
+        return [self._rows[row_id] for row_id in ids]
+
+    async def load(self, row_id: int):
+        # Loads awaited in the same event loop tick, e.g. under asyncio.gather, share one query
+        if row_id in self._rows:
+            return self._rows[row_id]
+        future = self._pending.get(row_id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            if not self._pending:
+                loop.call_soon(self._dispatch)
+            future = self._pending[row_id] = loop.create_future()
+        return await future
+
+    def _dispatch(self):
+        pending, self._pending = self._pending, {}
+        try:
+            rows = self.load_many(list(pending))
+        except Exception as exc:
+            for future in pending.values():
+                future.set_exception(exc)
+            return
+        for future, row in zip(pending.values(), rows):
+            if not future.cancelled():
+                future.set_result(row)
+
+    def prime(self, row):
+        self._rows[row.id] = row
+
+
+class RequestLoaders:
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.movies = ModelLoader(lambda ids: movie_crud_service.get_movies_by_ids(db, ids))
+        self.users = ModelLoader(lambda ids: user_crud_service.get_users_by_ids(db, ids))
+        self.comments = ModelLoader(lambda ids: comment_crud_service.get_comments_by_ids(db, ids))
+        self.ratings = ModelLoader(lambda ids: rating_crud_service.get_ratings_by_ids(db, ids))
+
+    def load_movies(self, ids: list[int]):
+        # Owners are loaded with one IN query up front, so serialising movie.owner hits the
+        # session's identity map instead of issuing a SELECT per movie
+        movies = self.movies.load_many(ids)
+        self.users.load_many([movie.user_id for movie in movies if movie is not None])
+        return movies
+
+    def load_comments(self, ids: list[int]):
+        comments = self.comments.load_many(ids)
+        self.users.load_many([comment.user_id for comment in comments if comment is not None])
+        return comments
+
+    def count_replies(self, comment_ids: list[int]):
+        counts = {}
+        for start in range(0, len(comment_ids), LOADER_CHUNK_SIZE):
+            counts.update(comment_crud_service.count_replies(self.db, comment_ids[start:start + LOADER_CHUNK_SIZE]))
+        return counts
+
+
+# FastAPI resolves a dependency once per request, so every user of it shares the same loaders
+def get_loaders(db: Session = Depends(get_read_db)):
+    return RequestLoaders(db)
+
+
+# Bound to the write session that the route, get_current_user and the CRUD calls share, so rows
+# the loaders fetch are in that session's identity map and the CRUD layer does not SELECT them again
+def get_write_loaders(db: Session = Depends(get_db)):
+    return RequestLoaders(db)
+
+
+# Drops duplicate ids and sets X-Missing-Ids for the ones that do not exist; returns the rows found
+def found_in_order(response, ids: list[int], rows: list):
+    missing = [row_id for row_id, row in zip(ids, rows) if row is None]
+    if missing:
+        response.headers["X-Missing-Ids"] = ",".join(map(str, missing[:MISSING_IDS_HEADER_LIMIT]))
+        response.headers["X-Missing-Count"] = str(len(missing))
+    return [row for row in rows if row is not None]
@@ -1,14 +1,100 @@
-import os
-
+import atexit
 import logging
+import queue
 import sys
-from dotenv import load_dotenv
-from logtail import LogtailHandler
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+import orjson
+from app.config import get_settings
+
+
+settings = get_settings()
+
+token = settings.better_stack_token
+
+# Log shipping runs on a background thread; records beyond the queue size are dropped
+LOG_QUEUE_SIZE = settings.log_queue_size
+LOG_BATCH_SIZE = settings.log_batch_size
+LOG_FLUSH_INTERVAL = settings.log_flush_interval
+# "json" for one compact JSON object per line, "text" for the plain formatter
+LOG_FORMAT = settings.log_format.lower()
+
+# Attributes every LogRecord has; anything else on a record came in through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+
+    def format(self, record):
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return orjson.dumps(payload, default=str).decode()
+
+
+# Never blocks the caller: when the queue is full the record is dropped and counted
+class DroppingQueueHandler(QueueHandler):
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+
+# Hands records to the handlers in batches, flushing them once per batch
+class BatchQueueListener(QueueListener):
 
+    def __init__(self, log_queue, *handlers, batch_size: int = 100, flush_interval: float = 0.5):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
 
-load_dotenv(dotenv_path='app/.env')
+    def enqueue_sentinel(self):
+        # Wait for room rather than lose the shutdown signal when the queue is full
+        self.queue.put(self._sentinel)
+
+    def _monitor(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not self._sentinel:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            for record in batch:
+                if record is not self._sentinel:
+                    self.handle(record)
+                self.queue.task_done()
+            for handler in self.handlers:
+                # A failing handler must not take the listener thread down with it
+                try:
+                    handler.flush()
+                except Exception:
+                    pass
+
+            if batch[-1] is self._sentinel:
+                return
 
-token = os.getenv("BETTER_STACK_TOKEN")
 
 # Get logger
 
@@ -16,19 +102,54 @@ logger = logging.getLogger()
 
 # Create a formatter
 
-formatter = logging.Formatter(
-    fmt="%(asctime)s - %(levelname)s - %(message)s"
-)
+if LOG_FORMAT == "json":
+    formatter = JsonFormatter()
+else:
+    formatter = logging.Formatter(
+        fmt="%(asctime)s - %(levelname)s - %(message)s"
+    )
 
 # Create handlers
 stream_handler = logging.StreamHandler(sys.stdout)
-better_stack_handler = LogtailHandler(source_token=token)
+better_stack_handler = None
+if token:
+    # logtail pulls in requests/urllib3; skip the import entirely when shipping is off
+    from logtail import LogtailHandler
+    better_stack_handler = LogtailHandler(source_token=token)
 
 # Set formatters
 stream_handler.setFormatter(formatter)
 
+# Request threads only enqueue; the listener thread does the I/O
+log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+queue_handler = DroppingQueueHandler(log_queue)
+log_listener = BatchQueueListener(
+    log_queue, *[handler for handler in (stream_handler, better_stack_handler) if handler],
+    batch_size=LOG_BATCH_SIZE, flush_interval=LOG_FLUSH_INTERVAL
+)
+
 # Add handlers to the logger
-logger.handlers = [stream_handler, better_stack_handler]
+logger.handlers = [queue_handler]
 
 # Set log level
-logger.setLevel(logging.INFO)
\ No newline at end of file
+logger.setLevel(logging.INFO)
+
+
+
+def start_log_listener():
+    if log_listener._thread is None:
+        log_listener.start()
+
+
+# Drains whatever is queued before returning
+def stop_log_listener():
+    if log_listener._thread is not None:
+        log_listener.stop()
+
+
+start_log_listener()
+atexit.register(stop_log_listener)
+
+
+def get_log_stats():
+    return {"queued": log_queue.qsize(), "dropped": queue_handler.dropped}
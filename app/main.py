@@ -1,25 +1,54 @@
+from contextlib import asynccontextmanager
 from fastapi import Depends, FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from starlette.middleware.base import BaseHTTPMiddleware
 
-from app.logger import logger
-from app.middleware import log_middleware
-from app.auth import authenticate_user, create_access_token, pwd_context
+from app.logger import logger, start_log_listener, stop_log_listener
+from app.middleware import LogMiddleware, MetricsMiddleware, ProfilingMiddleware
+from app.metrics import instrument_engine, metrics_registry
+from app import profiling
+from app.auth import authenticate_user, create_access_token, get_current_user, pwd_context
 from app.crud import user_crud_service
 import app.schemas as schemas
-from app.database import engine, Base, get_db
+from app.database import engine, get_db, get_pool_status, replica_engines
+from app.pubsub import broker
+from app.warmup import STARTUP_WARMUP, warm_up
 from app.routers.users import user_router
 from app.routers.comments import comment_router
 from app.routers.movies import movie_router
 from app.routers.ratings import rating_router
+from app.routers.exports import export_router
 
-# Initialize FastAPI app and set up the database
-app = FastAPI()
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_log_listener()
+    # Open pool connections and compile the hot queries before taking traffic
+    if STARTUP_WARMUP:
+        warm_up([engine, *replica_engines])
+    broker.start()
+    yield
+    broker.stop()
+    # Ship queued log records before the worker exits
+    stop_log_listener()
+
+# Initialize FastAPI app; the schema is created by `python -m app.cli migrate`
+app = FastAPI(lifespan=lifespan)
+
+# Add logging and metrics middleware
+app.add_middleware(LogMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+# Count queries and database time per request
+for db_engine in [engine, *replica_engines]:
+    instrument_engine(db_engine)
+
+# Per-statement profiling, only when SQL_PROFILING is enabled
+if profiling.SQL_PROFILING:
+    app.add_middleware(ProfilingMiddleware)
+    for db_engine in [engine, *replica_engines]:
+        profiling.instrument_engine(db_engine)
 
-# Add logging middleware
-app.add_middleware(BaseHTTPMiddleware, dispatch=log_middleware)
 logger.info('API is starting...')
 
 # Root route
@@ -27,11 +56,24 @@ logger.info('API is starting...')
 async def index():
     return {'message': 'Welcome! This is a Movie_app API'}
 
+# Prometheus text exposition, merged across gunicorn workers when METRICS_DIR is set
+@app.get('/metrics', response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+# Connection pool stats for this worker process; operational data, so signed-in users only
+@app.get('/pool_stats')
+async def pool_stats(current_user: schemas.User = Depends(get_current_user)):
+    status = get_pool_status(engine)
+    status["replicas"] = [get_pool_status(replica) for replica in replica_engines]
+    return status
+
 # Include routers for different resources
 app.include_router(user_router, prefix="/users", tags=["Users"])
 app.include_router(comment_router, prefix="/movies/comments", tags=["Comments"])
 app.include_router(movie_router, prefix="/movies", tags=["Movies"])
 app.include_router(rating_router, prefix="/movies/ratings", tags=["Ratings"])
+app.include_router(export_router, prefix="/export", tags=["Export"])
 
 # Signup endpoint
 @app.post("/signup/", status_code=201, response_model=schemas.User)
@@ -42,7 +84,7 @@ async def signup(user: schemas.UserCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="User already registered")
     
     hashed_password = pwd_context.hash(user.password)
-    return user_crud_service.create_user(db=db, user=user, hashed_password=hashed_password)
+    return user_crud_service.create_user(db=db, user_data=user, hashed_password=hashed_password)
 
 # Login endpoint
 @app.post("/login", status_code=200)
@@ -0,0 +1,193 @@
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+from sqlalchemy import event
+from app.config import get_settings
+
+# Directory shared by all gunicorn workers; each worker writes its own snapshot file there
+METRICS_DIR = get_settings().metrics_dir
+METRICS_FLUSH_INTERVAL = get_settings().metrics_flush_interval
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+# Connection lifetimes of server-sent event streams, kept out of the request latency histogram
+STREAM_DURATION_BUCKETS = (1, 10, 60, 300, 900, 3600, 14400)
+
+
+# Counters and fixed-bucket histograms keyed by (name, labels)
+class MetricsRegistry:
+
+    def __init__(self, directory: str | None = None, flush_interval: float = METRICS_FLUSH_INTERVAL):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._flush_thread = None
+
+    def inc(self, name: str, labels: tuple, value: float = 1):
+        with self._lock:
+            key = (name, labels)
+            self.counters[key] = self.counters.get(key, 0) + value
+        self._ensure_flush_thread()
+
+    def observe(self, name: str, labels: tuple, value: float, buckets: tuple = LATENCY_BUCKETS):
+        with self._lock:
+            key = (name, labels)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {"buckets": list(buckets), "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram["counts"][i] += 1
+                    break
+            histogram["sum"] += value
+            histogram["count"] += 1
+        self._ensure_flush_thread()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                "histograms": [
+                    [name, list(labels), histogram["buckets"], list(histogram["counts"]), histogram["sum"], histogram["count"]]
+                    for (name, labels), histogram in self.histograms.items()
+                ],
+            }
+
+    def _path(self, pid: int):
+        return os.path.join(self.directory, f"metrics_{pid}.json")
+
+    def flush(self):
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(os.getpid())
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def _ensure_flush_thread(self):
+        if not self.directory or (self._flush_thread and self._flush_thread.is_alive()):
+            return
+        with self._lock:
+            if self._flush_thread and self._flush_thread.is_alive():
+                return
+            self._flush_thread = threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True)
+            self._flush_thread.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    # Merge this process's live metrics with the snapshots of the other workers
+    def collect(self):
+        snapshots = [self.snapshot()]
+        if self.directory and os.path.isdir(self.directory):
+            own_file = os.path.basename(self._path(os.getpid()))
+            for file_name in os.listdir(self.directory):
+                if not file_name.startswith("metrics_") or not file_name.endswith(".json") or file_name == own_file:
+                    continue
+                try:
+                    with open(os.path.join(self.directory, file_name)) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+
+        counters, histograms = {}, {}
+        for snapshot in snapshots:
+            for name, labels, value in snapshot["counters"]:
+                key = (name, tuple(tuple(label) for label in labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, buckets, counts, total, count in snapshot["histograms"]:
+                key = (name, tuple(tuple(label) for label in labels))
+                merged = histograms.setdefault(key, {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0})
+                merged["counts"] = [a + b for a, b in zip(merged["counts"], counts)]
+                merged["sum"] += total
+                merged["count"] += count
+        return counters, histograms
+
+    def render(self):
+        counters, histograms = self.collect()
+        lines = []
+        seen = set()
+
+        for (name, labels), value in sorted(counters.items()):
+            if name not in seen:
+                lines.append(f"# TYPE {name} counter")
+                seen.add(name)
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for (name, labels), histogram in sorted(histograms.items()):
+            if name not in seen:
+                lines.append(f"# TYPE {name} histogram")
+                seen.add(name)
+            cumulative = 0
+            for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram['sum'])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _format_value(value):
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+metrics_registry = MetricsRegistry(directory=METRICS_DIR)
+atexit.register(metrics_registry.flush)
+
+
+# Per-request database counters, filled in by the engine events below
+class RequestDBStats:
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0
+
+
+current_db_stats = contextvars.ContextVar("current_db_stats", default=None)
+
+
+def instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        stats = current_db_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.duration += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        # after_cursor_execute does not fire for failed statements
+        start_times = context.connection.info.get("query_start_time") if context.connection is not None else None
+        if start_times:
+            start_times.pop()
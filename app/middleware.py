@@ -1,5 +1,9 @@
-from fastapi import Request
+from starlette.datastructures import URL
+from app.config import get_settings
 from app.logger import logger
+from app.metrics import QUERY_COUNT_BUCKETS, STREAM_DURATION_BUCKETS, MetricsRegistry, RequestDBStats, current_db_stats, metrics_registry
+from app.profiling import RequestProfile, current_profile
+import random
 import time
 import logging
 
@@ -9,24 +13,149 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
-async def log_middleware(request: Request, call_next):
-    start_time = time.time()
-    
-    # Process the request and get the response
-    response = await call_next(request)
-    
-    # Calculate the processing time
-    elapsed_time = time.time() - start_time
-    
-    # Create a log dictionary with the request and response details
-    log_data = {
-        'url': str(request.url),
-        'method': request.method,
-        'status_code': response.status_code,
-        'process_time': round(elapsed_time * 1000, 2)  # Convert to milliseconds
-    }
-    
-    # Log the information with the logger
-    logger.info('Request Info: %s', log_data, extra=log_data)
-    
-    return response
+# Server errors and slow requests are always logged, everything else at LOG_SAMPLE_RATE
+LOG_SAMPLE_RATE = get_settings().log_sample_rate
+LOG_SLOW_REQUEST_MS = get_settings().log_slow_request_ms
+
+
+# Pure ASGI middleware: unlike BaseHTTPMiddleware it does not wrap the response
+# body in an extra task and memory stream, so streaming responses pass straight through
+class LogMiddleware:
+
+    def __init__(self, app, sample_rate: float = LOG_SAMPLE_RATE, slow_request_ms: float = LOG_SLOW_REQUEST_MS):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.slow_request_ms = slow_request_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter_ns()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            process_time = (time.perf_counter_ns() - start_time) / 1_000_000  # Convert to milliseconds
+            sample_rate = self._sample_rate(status_code, process_time)
+            # Only pay for building the URL and record when it will be emitted
+            if sample_rate and logger.isEnabledFor(logging.INFO):
+                url = str(URL(scope=scope))
+                logger.info(
+                    'Request Info: %s %s %s %.2fms', scope["method"], url, status_code, process_time,
+                    extra={
+                        'url': url,
+                        'method': scope["method"],
+                        'status_code': status_code,
+                        'process_time': round(process_time, 2),
+                        'sample_rate': sample_rate,
+                    }
+                )
+
+    # Rate the emitted record represents (1.0 for forced records), or 0 to skip it
+    def _sample_rate(self, status_code: int, process_time: float):
+        if status_code >= 500 or process_time >= self.slow_request_ms or self.sample_rate >= 1:
+            return 1.0
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return self.sample_rate
+        return 0
+
+
+# Records per-route request counts, status classes, latency and DB usage
+class MetricsMiddleware:
+
+    def __init__(self, app, registry: MetricsRegistry = metrics_registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+        event_stream = False
+        db_stats = RequestDBStats()
+        token = current_db_stats.set(db_stats)
+
+        async def send_with_status(message):
+            nonlocal status_code, event_stream
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                content_type = dict(message.get("headers", [])).get(b"content-type", b"")
+                event_stream = content_type.startswith(b"text/event-stream")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_db_stats.reset(token)
+            elapsed = time.perf_counter() - start_time
+            # The route template, not the raw path, keeps label cardinality bounded
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            labels = (("method", scope["method"]), ("route", route_path))
+
+            self.registry.inc("http_requests_total", labels + (("status", f"{status_code // 100}xx"),))
+            # An event stream lasts as long as the client stays connected, which would swamp the latency percentiles
+            if event_stream:
+                self.registry.observe("http_stream_duration_seconds", labels, elapsed, STREAM_DURATION_BUCKETS)
+            else:
+                self.registry.observe("http_request_duration_seconds", labels, elapsed)
+            self.registry.observe("db_queries_per_request", labels, db_stats.queries, QUERY_COUNT_BUCKETS)
+            self.registry.observe("db_query_duration_seconds", labels, db_stats.duration)
+
+
+# Opt-in SQL profiling: collects every statement of the request and reports the
+# total in a Server-Timing header, e.g. `db;dur=12.5;desc="4 queries"`. The header goes out
+# before a streaming body runs, so queries made while streaming (exports, SSE replays) are only
+# in the logged summary, counted separately as body_queries
+class ProfilingMiddleware:
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope)
+        token = current_profile.set(profile)
+        headers_sent_after = None
+
+        async def send_with_timing(message):
+            nonlocal headers_sent_after
+            if message["type"] == "http.response.start":
+                headers_sent_after = len(profile.queries)
+                server_timing = f'db;dur={profile.duration_ms:.2f};desc="{len(profile.queries)} queries"'
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", server_timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_profile.reset(token)
+            body_queries = profile.queries[headers_sent_after:] if headers_sent_after is not None else []
+            if profile.queries:
+                logger.info(
+                    'SQL profile: %s queries, %.2fms for %s %s', len(profile.queries), profile.duration_ms, scope["method"], profile.route,
+                    extra={
+                        'route': profile.route,
+                        'method': scope["method"],
+                        'queries': len(profile.queries),
+                        'db_duration_ms': round(profile.duration_ms, 2),
+                        'body_queries': len(body_queries),
+                        'body_db_duration_ms': round(sum(query.duration_ms for query in body_queries), 2),
+                        'crud_methods': profile.by_method(),
+                    }
+                )
@@ -0,0 +1,69 @@
+from sqlalchemy import UniqueConstraint, delete, func, inspect, select, text
+from app.database import Base
+
+# create_all only creates missing tables. Columns, indexes and unique constraints added to the
+# models later reach existing tables here, the constraints as CREATE UNIQUE INDEX so SQLite can
+# apply them too. ON CONFLICT targets accept a unique index exactly like a constraint
+
+
+def _index_names(inspector, table_name: str):
+    names = {index["name"] for index in inspector.get_indexes(table_name)}
+    names.update(constraint["name"] for constraint in inspector.get_unique_constraints(table_name))
+    return names
+
+
+def add_column(connection, table, column):
+    # Rows already in the table need a value: new columns are nullable or have a server default
+    if not column.nullable and column.server_default is None:
+        raise RuntimeError(f"{table.name}.{column.name} needs a server default to be added to an existing table")
+    ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(connection.dialect)}"
+    if column.server_default is not None:
+        ddl += f" DEFAULT {getattr(column.server_default.arg, 'text', column.server_default.arg)}"
+    if not column.nullable:
+        ddl += " NOT NULL"
+    connection.execute(text(ddl))
+
+
+def remove_duplicates(connection, table, columns):
+    # Keeps the newest row (highest id) of each group so the unique index can be built; rows with
+    # a NULL in the key never conflict and are left alone
+    key = [table.c[column] for column in columns]
+    not_null = [column.is_not(None) for column in key]
+    keep = select(func.max(table.c.id)).where(*not_null).group_by(*key)
+    return connection.execute(delete(table).where(*not_null, table.c.id.not_in(keep))).rowcount
+
+
+def upgrade_schema(engine):
+    report = {"tables_created": [], "columns_added": [], "indexes_created": [], "duplicates_removed": 0}
+    with engine.begin() as connection:
+        existing = set(inspect(connection).get_table_names())
+        Base.metadata.create_all(bind=connection)
+        report["tables_created"] = sorted(set(Base.metadata.tables) - existing)
+
+        inspector = inspect(connection)
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing:
+                continue
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    add_column(connection, table, column)
+                    report["columns_added"].append(f"{table.name}.{column.name}")
+
+            names = _index_names(inspector, table.name)
+            for index in table.indexes:
+                if index.name not in names:
+                    index.create(connection)
+                    report["indexes_created"].append(index.name)
+
+            for constraint in table.constraints:
+                if not isinstance(constraint, UniqueConstraint) or constraint.name in names:
+                    continue
+                columns = [column.name for column in constraint.columns]
+                if connection.dialect.name == "postgresql":
+                    # Old workers keep writing during a release; hold their inserts until the index exists
+                    connection.execute(text(f"LOCK TABLE {table.name} IN SHARE ROW EXCLUSIVE MODE"))
+                report["duplicates_removed"] += remove_duplicates(connection, table, columns)
+                connection.execute(text(f"CREATE UNIQUE INDEX {constraint.name} ON {table.name} ({', '.join(columns)})"))
+                report["indexes_created"].append(constraint.name)
+    return report
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, text
+from sqlalchemy import BigInteger, Column, DateTime, Float, ForeignKey, Index, Integer, LargeBinary, String, UniqueConstraint, func, text
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -21,6 +21,10 @@ class User(Base):
 
 class Movie(Base):
     __tablename__ = "movies"
+    __table_args__ = (
+        # Keyset scans of a user's activity, newest first
+        Index("ix_movies_user_created", "user_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True, nullable=False)
     title = Column(String, nullable=False, index=True)
@@ -38,6 +42,11 @@ class Movie(Base):
 
 class Rating(Base):
     __tablename__ = "ratings"
+    __table_args__ = (
+        # One rating per user per movie; also the conflict target for rating upserts
+        UniqueConstraint("user_id", "movie_id", name="uq_ratings_user_movie"),
+        Index("ix_ratings_user_created", "user_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True, nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -52,6 +61,9 @@ class Rating(Base):
 
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = (
+        Index("ix_comments_user_created", "user_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, nullable=False, autoincrement=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -63,4 +75,63 @@ class Comment(Base):
     # Relationships
     author = relationship("User", back_populates="comments")
     movie = relationship("Movie", back_populates="comments")
-    replies = relationship("Comment", backref="parent", remote_side=[id])
\ No newline at end of file
+    replies = relationship("Comment", backref="parent", remote_side=[id])
+
+
+class MovieSimilarity(Base):
+    __tablename__ = "movie_similarities"
+
+    # Top-K neighbours of one movie, packed as int32 movie ids and float32 scores
+    movie_id = Column(Integer, ForeignKey("movies.id"), primary_key=True)
+    neighbor_ids = Column(LargeBinary, nullable=False)
+    scores = Column(LargeBinary, nullable=False)
+    # Signature of the movie's ratings when the row was computed; a mismatch marks it stale
+    rating_count = Column(Integer, nullable=False)
+    rating_checksum = Column(BigInteger, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=text('CURRENT_TIMESTAMP'), onupdate=func.now())
+
+
+class MovieRatingStats(Base):
+    __tablename__ = "movie_rating_stats"
+
+    # Running totals kept in step by every rating write, so aggregates never scan ratings
+    movie_id = Column(Integer, ForeignKey("movies.id"), primary_key=True)
+    rating_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    # Histogram: number of ratings with each value 1-10
+    votes_1 = Column(Integer, nullable=False, default=0)
+    votes_2 = Column(Integer, nullable=False, default=0)
+    votes_3 = Column(Integer, nullable=False, default=0)
+    votes_4 = Column(Integer, nullable=False, default=0)
+    votes_5 = Column(Integer, nullable=False, default=0)
+    votes_6 = Column(Integer, nullable=False, default=0)
+    votes_7 = Column(Integer, nullable=False, default=0)
+    votes_8 = Column(Integer, nullable=False, default=0)
+    votes_9 = Column(Integer, nullable=False, default=0)
+    votes_10 = Column(Integer, nullable=False, default=0)
+    # Bumped by every change, so consumers of published totals can drop ones that arrive out of order
+    version = Column(BigInteger, nullable=False, server_default=text("0"))
+    # Indexed so leaderboards can pick up only the rows changed since they last looked
+    updated_at = Column(DateTime(timezone=True), nullable=False, index=True, server_default=text('CURRENT_TIMESTAMP'), onupdate=func.now())
+
+
+class MovieTrending(Base):
+    __tablename__ = "movie_trending"
+
+    # Decayed activity score as of score_updated_at (Unix seconds); see app/trending.py
+    movie_id = Column(Integer, ForeignKey("movies.id"), primary_key=True)
+    score = Column(Float, nullable=False)
+    score_updated_at = Column(Float, nullable=False)
+    rank_key = Column(Float, nullable=False, index=True)
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # An Idempotency-Key claimed by a user; `response` is the JSON to replay, NULL while the first
+    # request is still running. Shared by every worker, unlike an in-process cache
+    user_id = Column(Integer, primary_key=True)
+    key = Column(String, primary_key=True)
+    fingerprint = Column(String, nullable=False)
+    response = Column(String)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True, server_default=text('CURRENT_TIMESTAMP'))
@@ -0,0 +1,107 @@
+import contextvars
+import sys
+import time
+from sqlalchemy import event
+from app.config import get_settings
+from app.logger import logger
+
+# Opt-in: attaches statement timing to every request and adds a Server-Timing header
+SQL_PROFILING = get_settings().sql_profiling
+SLOW_QUERY_MS = get_settings().slow_query_ms
+
+
+class QueryProfile:
+
+    def __init__(self, statement: str, duration_ms: float, rows: int, crud_method: str, parameters):
+        self.statement = statement
+        self.duration_ms = duration_ms
+        self.rows = rows
+        self.crud_method = crud_method
+        self.parameters = parameters
+
+
+class RequestProfile:
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.queries = []
+
+    @property
+    def route(self):
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or self.scope.get("path")
+
+    @property
+    def duration_ms(self):
+        return sum(query.duration_ms for query in self.queries)
+
+    def by_method(self):
+        summary = {}
+        for query in self.queries:
+            entry = summary.setdefault(query.crud_method, {"queries": 0, "duration_ms": 0.0})
+            entry["queries"] += 1
+            entry["duration_ms"] = round(entry["duration_ms"] + query.duration_ms, 3)
+        return summary
+
+
+current_profile = contextvars.ContextVar("current_profile", default=None)
+
+
+# Name of the closest *CRUDService method on the call stack, e.g. "MovieCRUDService.get_movies".
+# Only walked while profiling, so the normal request path pays nothing for it.
+def find_crud_method():
+    frame = sys._getframe(1)
+    while frame is not None:
+        name = getattr(frame.f_code, "co_qualname", frame.f_code.co_name)
+        if "CRUDService." in name:
+            return name
+        frame = frame.f_back
+    return None
+
+
+# Types, not values, so slow-query logs never carry user data
+def parameter_shape(parameters, executemany: bool = False):
+    if executemany and isinstance(parameters, (list, tuple)):
+        first = parameters[0] if parameters else None
+        return {"rows": len(parameters), "row": parameter_shape(first)}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def instrument_engine(engine, slow_query_ms: float = SLOW_QUERY_MS):
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if current_profile.get() is not None:
+            conn.info.setdefault("profile_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        profile = current_profile.get()
+        start_times = conn.info.get("profile_start_time")
+        if profile is None or not start_times:
+            return
+        duration_ms = (time.perf_counter() - start_times.pop()) * 1000
+        query = QueryProfile(statement, duration_ms, cursor.rowcount, find_crud_method(), parameter_shape(parameters, executemany))
+        profile.queries.append(query)
+
+        if duration_ms >= slow_query_ms:
+            logger.warning(
+                'Slow query: %.2fms in %s (%s)', duration_ms, query.crud_method, profile.route,
+                extra={
+                    'statement': statement,
+                    'duration_ms': round(duration_ms, 2),
+                    'rows': query.rows,
+                    'crud_method': query.crud_method,
+                    'route': profile.route,
+                    'parameter_shape': query.parameters,
+                }
+            )
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        start_times = context.connection.info.get("profile_start_time") if context.connection is not None else None
+        if start_times:
+            start_times.pop()
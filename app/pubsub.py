@@ -0,0 +1,247 @@
+import asyncio
+import json
+import select
+import threading
+from sqlalchemy import text
+from app.config import get_settings
+from app.logger import logger
+
+settings = get_settings()
+
+# "local" delivers within this process only; "postgres" fans out to every worker through
+# LISTEN/NOTIFY on the primary database
+PUBSUB_BACKEND = settings.pubsub_backend
+# Messages buffered per subscriber before it counts as too slow
+PUBSUB_QUEUE_SIZE = settings.pubsub_queue_size
+# Shortest gap between two messages on a coalesced topic, such as a movie's rating average
+PUBSUB_COALESCE_SECONDS = settings.pubsub_coalesce_seconds
+# Comment lines sent on idle event streams so proxies keep the connection open
+SSE_KEEPALIVE_SECONDS = 15
+PUBSUB_CHANNEL = "movie_api_events"
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+PUBSUB_MAX_PAYLOAD = 7900
+
+
+# On coalesced and latest-only topics a message may carry a "version"; one older than the message
+# already held is dropped, so a commit that publishes late cannot replace newer totals
+def is_older(message: dict, than: dict | None):
+    return than is not None and message.get("version", 0) < than.get("version", 0)
+
+
+class Subscription:
+
+    def __init__(self, broker, topic: str, maxsize: int, latest_only: bool = False):
+        self.broker = broker
+        self.topic = topic
+        self.loop = asyncio.get_running_loop()
+        # A latest-only subscriber holds one message and a newer one replaces it, so a slow
+        # client skips intermediate values instead of queueing them
+        self.latest_only = latest_only
+        self.queue = asyncio.Queue(1 if latest_only else maxsize)
+        # Set when the queue overflowed; the stream ends so the client reconnects and catches up
+        self.overflowed = False
+
+    def _put(self, message: dict):
+        if self.latest_only and self.queue.full():
+            held = self.queue.get_nowait()
+            if is_older(message, held):
+                message = held
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            logger.warning('Subscriber to %s fell behind and was dropped', self.topic)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+# Publishes through the backend, which hands each message to deliver() in every worker; delivery
+# runs on each subscriber's own event loop, so publishing is safe from any thread
+class Broker:
+
+    def __init__(self, backend=None, queue_size: int = PUBSUB_QUEUE_SIZE):
+        self.backend = backend or LocalBackend()
+        self.backend.deliver = self.deliver
+        self.queue_size = queue_size
+        self._subscriptions = {}
+        self._listeners = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic: str, maxsize: int | None = None, latest_only: bool = False):
+        subscription = Subscription(self, topic, maxsize or self.queue_size, latest_only)
+        with self._lock:
+            self._subscriptions.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    # A plain callback run on the delivering thread, for per-process state such as caches
+    def add_listener(self, topic: str, callback):
+        with self._lock:
+            self._listeners.setdefault(topic, []).append(callback)
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.topic)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.topic]
+
+    def subscriber_count(self, topic: str):
+        with self._lock:
+            return len(self._subscriptions.get(topic, ()))
+
+    def has_listeners(self, topic: str):
+        # With the local backend nobody outside this process can be listening
+        if not isinstance(self.backend, LocalBackend):
+            return True
+        with self._lock:
+            return bool(self._subscriptions.get(topic) or self._listeners.get(topic))
+
+    def publish(self, topic: str, message: dict):
+        if not self.has_listeners(topic):
+            return
+        try:
+            self.backend.publish(topic, message)
+        except Exception:
+            logger.exception('Failed to publish to %s', topic)
+
+    def deliver(self, topic: str, message: dict):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(topic, ()))
+            listeners = list(self._listeners.get(topic, ()))
+        for callback in listeners:
+            try:
+                callback(message)
+            except Exception:
+                logger.exception('Listener on %s failed', topic)
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._put, message)
+            except RuntimeError:
+                # The subscriber's loop has shut down
+                self.unsubscribe(subscription)
+
+    def start(self):
+        self.backend.start()
+
+    def stop(self):
+        self.backend.stop()
+
+
+class LocalBackend:
+
+    def start(self):
+        pass
+
+    def publish(self, topic: str, message: dict):
+        self.deliver(topic, message)
+
+    def stop(self):
+        pass
+
+
+class PostgresBackend:
+
+    def __init__(self, engine, channel: str = PUBSUB_CHANNEL, poll_interval: float = 1.0):
+        self.engine = engine
+        self.channel = channel
+        self.poll_interval = poll_interval
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._listen, name="pubsub-listener", daemon=True)
+        self._thread.start()
+
+    def publish(self, topic: str, message: dict):
+        payload = json.dumps({"topic": topic, "message": message}, default=str)
+        if len(payload.encode()) > PUBSUB_MAX_PAYLOAD:
+            logger.warning('Dropped a %s event too large for NOTIFY', topic)
+            return
+        with self.engine.connect() as connection:
+            connection.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": self.channel, "payload": payload})
+            connection.commit()
+
+    def _listen(self):
+        while not self._stopping.is_set():
+            try:
+                connection = self.engine.raw_connection()
+                connection.detach()
+                try:
+                    dbapi_connection = connection.driver_connection
+                    dbapi_connection.autocommit = True
+                    dbapi_connection.cursor().execute(f"LISTEN {self.channel}")
+                    while not self._stopping.is_set():
+                        if select.select([dbapi_connection], [], [], self.poll_interval) == ([], [], []):
+                            continue
+                        dbapi_connection.poll()
+                        while dbapi_connection.notifies:
+                            notify = dbapi_connection.notifies.pop(0)
+                            event = json.loads(notify.payload)
+                            self.deliver(event["topic"], event["message"])
+                finally:
+                    connection.close()
+            except Exception:
+                logger.exception('Pub/sub listener failed; reconnecting')
+                self._stopping.wait(self.poll_interval)
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval * 2)
+
+
+# Keeps only the newest message per topic and publishes it at most once per interval, so a
+# burst of writes to one movie becomes a couple of messages
+class CoalescingPublisher:
+
+    def __init__(self, broker: Broker, interval: float = PUBSUB_COALESCE_SECONDS):
+        self.broker = broker
+        self.interval = interval
+        self._pending = {}
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def publish(self, topic: str, message: dict):
+        if not self.broker.has_listeners(topic):
+            return
+        with self._lock:
+            if is_older(message, self._pending.get(topic)):
+                return
+            self._pending[topic] = message
+            if self._timer is None:
+                self._timer = threading.Timer(self.interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending, self._timer = self._pending, {}, None
+        for topic, message in pending.items():
+            self.broker.publish(topic, message)
+
+
+# One server-sent event; `data` is sent as a single JSON line
+def sse_event(event: str, data: dict, event_id: int | None = None):
+    lines = [f"event: {event}", f"data: {json.dumps(data, default=str)}"]
+    if event_id is not None:
+        lines.insert(0, f"id: {event_id}")
+    return "\n".join(lines) + "\n\n"
+
+
+def create_broker(backend: str = PUBSUB_BACKEND):
+    if backend == "postgres":
+        from app.database import engine
+        return Broker(PostgresBackend(engine))
+    return Broker()
+
+
+broker = create_broker()
+rating_updates = CoalescingPublisher(broker)
@@ -0,0 +1,183 @@
+import json
+import os
+import threading
+import time
+from app.config import get_settings
+from app.logger import logger
+
+# Factors are trained offline by `python -m app.cli train-recommendations` and served from
+# memory-mapped .npy files; NumPy is imported lazily so app start-up does not pay for it
+RECOMMENDATION_MODEL_DIR = get_settings().recommendation_model_dir
+ALS_FACTORS = 32
+ALS_ITERATIONS = 10
+ALS_REGULARIZATION = 0.1
+# Ratings whose factor outer products are summed at once while solving; caps that buffer at
+# ALS_CHUNK_RATINGS * factors^2 floats
+ALS_CHUNK_RATINGS = 8192
+
+
+# One regularised least-squares solve per row of `ratings` (CSR) against the fixed factors
+def solve_factors(ratings, fixed, regularization: float):
+    import numpy as np
+
+    rows, factors = ratings.shape[0], fixed.shape[1]
+    solved = np.zeros((rows, factors), dtype=np.float32)
+    identity = np.eye(factors, dtype=np.float32)
+    indptr = ratings.indptr
+
+    start = 0
+    while start < rows:
+        end = start + 1
+        while end < rows and indptr[end + 1] - indptr[start] <= ALS_CHUNK_RATINGS:
+            end += 1
+        counts = np.diff(indptr[start:end + 1])
+        filled = np.nonzero(counts)[0]
+        if len(filled):
+            low, high = indptr[start], indptr[end]
+            vectors = fixed[ratings.indices[low:high]]
+            offsets = indptr[start:end][filled] - low
+            if high - low > ALS_CHUNK_RATINGS:
+                # A single row longer than a chunk: V.T @ V without materialising its outer products
+                gram = (vectors.T @ vectors)[None]
+            else:
+                # Normal equations of every row in the chunk, solved as one batch
+                gram = np.add.reduceat(vectors[:, :, None] * vectors[:, None, :], offsets, axis=0)
+            gram += regularization * counts[filled][:, None, None] * identity
+            rhs = np.add.reduceat(vectors * ratings.data[low:high, None], offsets, axis=0)
+            solved[start + filled] = np.linalg.solve(gram, rhs[:, :, None])[:, :, 0]
+        start = end
+    return solved
+
+
+# Alternating least squares on mean-centred explicit ratings
+def train_als(triples, factors: int = ALS_FACTORS, iterations: int = ALS_ITERATIONS,
+              regularization: float = ALS_REGULARIZATION, seed: int = 42):
+    import numpy as np
+    from scipy import sparse
+
+    data = np.array(triples, dtype=np.int64).reshape(-1, 3)
+    user_ids, user_index = np.unique(data[:, 0], return_inverse=True)
+    movie_ids, movie_index = np.unique(data[:, 1], return_inverse=True)
+    values = data[:, 2].astype(np.float32)
+    global_mean = float(values.mean()) if len(values) else 0.0
+
+    by_user = sparse.csr_matrix((values - global_mean, (user_index, movie_index)), shape=(len(user_ids), len(movie_ids)))
+    by_movie = by_user.T.tocsr()
+
+    rng = np.random.default_rng(seed)
+    user_factors = np.zeros((len(user_ids), factors), dtype=np.float32)
+    movie_factors = rng.normal(0, 0.1, (len(movie_ids), factors)).astype(np.float32)
+    for _ in range(iterations):
+        user_factors = solve_factors(by_user, movie_factors, regularization)
+        movie_factors = solve_factors(by_movie, user_factors, regularization)
+
+    return {
+        "user_ids": user_ids.astype(np.int32),
+        "movie_ids": movie_ids.astype(np.int32),
+        "user_factors": user_factors,
+        "movie_factors": movie_factors,
+        "global_mean": global_mean,
+    }
+
+
+# Writes a new model version next to the old one, then switches CURRENT to it atomically
+def save_model(model: dict, directory: str = RECOMMENDATION_MODEL_DIR):
+    import numpy as np
+
+    version = f"model-{time.time_ns()}"
+    path = os.path.join(directory, version)
+    os.makedirs(path)
+    for name in ("user_ids", "movie_ids", "user_factors", "movie_factors"):
+        np.save(os.path.join(path, f"{name}.npy"), model[name])
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({"global_mean": model["global_mean"], "factors": int(model["movie_factors"].shape[1])}, f)
+
+    current = os.path.join(directory, "CURRENT")
+    with open(f"{current}.tmp", "w") as f:
+        f.write(version)
+    os.replace(f"{current}.tmp", current)
+
+    # Keep the previous version for workers that still have it mapped
+    versions = sorted(name for name in os.listdir(directory) if name.startswith("model-"))
+    for old in versions[:-2]:
+        for file_name in os.listdir(os.path.join(directory, old)):
+            os.remove(os.path.join(directory, old, file_name))
+        os.rmdir(os.path.join(directory, old))
+    return path
+
+
+class RecommendationModel:
+
+    def __init__(self, path: str):
+        import numpy as np
+
+        self.path = path
+        self.user_factors = np.load(os.path.join(path, "user_factors.npy"), mmap_mode="r")
+        self.movie_factors = np.load(os.path.join(path, "movie_factors.npy"), mmap_mode="r")
+        # Both id arrays are sorted, so lookups are binary searches
+        self.movie_ids = np.load(os.path.join(path, "movie_ids.npy"))
+        self.user_ids = np.load(os.path.join(path, "user_ids.npy"))
+        with open(os.path.join(path, "meta.json")) as f:
+            self.global_mean = json.load(f)["global_mean"]
+
+    def _position(self, ids, value: int):
+        import numpy as np
+
+        index = int(np.searchsorted(ids, value))
+        return index if index < len(ids) and ids[index] == value else None
+
+    def recommend(self, user_id: int, exclude_movie_ids, limit: int = 10):
+        import numpy as np
+
+        row = self._position(self.user_ids, user_id)
+        if row is None:
+            return []
+
+        scores = self.movie_factors @ self.user_factors[row]
+        exclude = np.fromiter(exclude_movie_ids, dtype=np.int64)
+        positions = np.searchsorted(self.movie_ids, exclude)
+        found = positions < len(self.movie_ids)
+        positions = positions[found]
+        scores[positions[self.movie_ids[positions] == exclude[found]]] = -np.inf
+
+        limit = min(limit, len(scores))
+        if limit <= 0:
+            return []
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        top = top[np.isfinite(scores[top])]
+        return [(int(self.movie_ids[index]), float(scores[index]) + self.global_mean) for index in top]
+
+
+# The model of the version named in CURRENT, reloaded when a new version is published
+class RecommendationStore:
+
+    def __init__(self, directory: str = RECOMMENDATION_MODEL_DIR, check_interval: float = 30):
+        self.directory = directory
+        self.check_interval = check_interval
+        self._model = None
+        self._version = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def get_model(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return self._model
+        with self._lock:
+            self._checked_at = now
+            try:
+                with open(os.path.join(self.directory, "CURRENT")) as f:
+                    version = f.read().strip()
+            except FileNotFoundError:
+                return self._model
+            if version != self._version:
+                try:
+                    self._model = RecommendationModel(os.path.join(self.directory, version))
+                    self._version = version
+                except (OSError, ValueError):
+                    logger.exception('Failed to load recommendation model %s', version)
+        return self._model
+
+
+recommendation_store = RecommendationStore()
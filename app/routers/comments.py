@@ -1,17 +1,34 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from app.logger import logger
 from app.auth import get_current_user
 import app.schemas as schemas
 from app.crud import comment_crud_service, movie_crud_service, user_crud_service
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, get_read_db
+from app.loaders import RequestLoaders, found_in_order, get_loaders, get_write_loaders
+from app.pubsub import SSE_KEEPALIVE_SECONDS, broker, sse_event
+
+# Comments replayed to a reconnecting client that sends Last-Event-ID
+COMMENT_STREAM_REPLAY_LIMIT = 100
 
 comment_router = APIRouter()
 
+# With ?ids=1&ids=2 returns those comments in request order, with unknown ids in X-Missing-Ids
 @comment_router.get("/", status_code=200, response_model=List[schemas.CommentResponse])
-async def get_comments(db: Session = Depends(get_db), offset: int = 0, limit: int = 10):
-    comments = comment_crud_service.get_comments(db, offset=offset, limit=limit)
+async def get_comments(http_response: Response, db: Session = Depends(get_read_db), offset: int = 0, limit: int = 10,
+                       ids: Optional[List[int]] = Query(None), loaders: RequestLoaders = Depends(get_loaders)):
+    if ids:
+        # One IN query each for the comments, their authors and their reply counts
+        ids = list(dict.fromkeys(ids))
+        found = found_in_order(http_response, ids, loaders.load_comments(ids))
+        reply_counts = loaders.count_replies([comment.id for comment in found])
+        authors = loaders.users.load_many([comment.user_id for comment in found])
+        comments = [(comment, author, reply_counts.get(comment.id, 0)) for comment, author in zip(found, authors)]
+    else:
+        comments = comment_crud_service.get_comments(db, offset=offset, limit=limit)
     
     # Transform the results into the desired response format
     response = [
@@ -34,15 +51,56 @@ async def get_comments(db: Session = Depends(get_db), offset: int = 0, limit: in
 
     return response
 
+async def comment_events(subscription, backlog: list[dict], caught_up: bool = True):
+    try:
+        for event in backlog:
+            yield sse_event("comment", event, event_id=event["id"])
+        # More were missed than one replay holds: end here, the client reconnects from the last one sent
+        if not caught_up:
+            return
+        last_id = backlog[-1]["id"] if backlog else 0
+        # An overflowed subscriber is cut off; the client reconnects with Last-Event-ID and replays
+        while not subscription.overflowed:
+            try:
+                event = await asyncio.wait_for(subscription.get(), timeout=SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            # Published while the backlog was being read
+            if event["id"] <= last_id:
+                continue
+            yield sse_event("comment", event, event_id=event["id"])
+    finally:
+        subscription.close()
+
+# Server-sent events for new comments and replies on a movie, pushed as they are committed.
+# Declared before '/{comment_id}' so "stream" is not parsed as a comment id
+@comment_router.get("/stream/{movie_id}", status_code=200)
+async def stream_movie_comments(movie_id: int, last_event_id: Optional[int] = Header(None), db: Session = Depends(get_read_db)):
+    movie = movie_crud_service.get_movie_by_id(db, movie_id)
+    if not movie:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
+
+    # Subscribe before reading the backlog so nothing committed in between is missed; the
+    # database is not touched again once the stream starts
+    subscription = broker.subscribe(f"comments:{movie_id}")
+    backlog, caught_up = [], True
+    if last_event_id is not None:
+        comments = comment_crud_service.get_comments_by_movie_after(db, movie_id, last_event_id, COMMENT_STREAM_REPLAY_LIMIT + 1)
+        caught_up = len(comments) <= COMMENT_STREAM_REPLAY_LIMIT
+        backlog = [schemas.CommentEvent.model_validate(comment).model_dump(mode="json") for comment in comments[:COMMENT_STREAM_REPLAY_LIMIT]]
+    return StreamingResponse(comment_events(subscription, backlog, caught_up), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @comment_router.get("/{comment_id}", status_code=200, response_model=schemas.CommentOut)
-async def get_comment_by_id(comment_id: int, db: Session = Depends(get_db)):
+async def get_comment_by_id(comment_id: int, db: Session = Depends(get_read_db)):
     comment = comment_crud_service.get_comment_by_id(db, comment_id)
     if not comment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found")
     return comment
 
 @comment_router.get("/movie/{movie_id}", status_code=200, response_model=List[schemas.Comment])
-async def get_comments_by_movie(movie_id: int, db: Session = Depends(get_db), offset: int = 0, limit: int = 10):
+async def get_comments_by_movie(movie_id: int, db: Session = Depends(get_read_db), offset: int = 0, limit: int = 10):
     movie = movie_crud_service.get_movie_by_id(db, movie_id)
     if not movie:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
@@ -52,7 +110,7 @@ async def get_comments_by_movie(movie_id: int, db: Session = Depends(get_db), of
     return comments
 
 @comment_router.get("/user/{user_id}", status_code=200, response_model=List[schemas.Comment])
-async def get_comments_by_user(user_id: int, db: Session = Depends(get_db), offset: int = 0, limit: int = 10):
+async def get_comments_by_user(user_id: int, db: Session = Depends(get_read_db), offset: int = 0, limit: int = 10):
     user = user_crud_service.get_user_by_id(db, user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
@@ -62,12 +120,12 @@ async def get_comments_by_user(user_id: int, db: Session = Depends(get_db), offs
     return comments
 
 @comment_router.get("/replies/{parent_id}", status_code=200, response_model=List[schemas.Comment])
-async def get_replies_to_comment(parent_id: int, db: Session = Depends(get_db), offset: int = 0, limit: int = 10):
-    parent_comment = comment_crud_service.get_a_comment(db, parent_id)
+async def get_replies_to_comment(parent_id: int, db: Session = Depends(get_read_db), offset: int = 0, limit: int = 10, loaders: RequestLoaders = Depends(get_loaders)):
+    parent_comment = await loaders.comments.load(parent_id)
     if not parent_comment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parent comment not found")
 
-    replies = comment_crud_service.get_replies_to_comment(db, parent_id, offset=offset, limit=limit)
+    replies = comment_crud_service.get_replies(db, parent_id, offset=offset, limit=limit)
     if not replies:
         logger.warning("No replies for comment....")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No replies found for this comment")
@@ -80,33 +138,34 @@ async def create_comment(movie_id: int, comment: schemas.CommentCreate, current_
     if not movie:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Movie not found")
 
-    db_comment = comment_crud_service.create_comment(db, comment=comment, user_id=current_user.id, movie_id=movie_id)
+    db_comment = comment_crud_service.create_comment(db, comment_data=comment, movie_id=movie_id, user_id=current_user.id)
     return db_comment
 
 @comment_router.post("/reply_comment/{comment_id}", status_code=201, response_model=schemas.Comment)
-async def reply_comment(comment_id: int, comment_payload: schemas.CommentBase, current_user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    parent_comment = comment_crud_service.get_a_comment(db, comment_id=comment_id)
+async def reply_comment(comment_id: int, comment_payload: schemas.CommentBase, current_user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db), loaders: RequestLoaders = Depends(get_write_loaders)):
+    # reply_to_comment reads the parent again, from the session's identity map
+    parent_comment = await loaders.comments.load(comment_id)
     if not parent_comment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found")
     
-    reply = comment_crud_service.reply_comment(comment_id, db, comment=comment_payload, user_id=current_user.id)
+    reply = comment_crud_service.reply_to_comment(db, comment_id, comment_data=comment_payload, user_id=current_user.id)
     return reply
 
 @comment_router.put("/{comment_id}", status_code=200, response_model=schemas.Comment)
-async def update_comment(comment_payload: schemas.CommentUpdate, comment_id: int, current_user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    comment = comment_crud_service.get_a_comment(db, comment_id=comment_id)
+async def update_comment(comment_payload: schemas.CommentUpdate, comment_id: int, current_user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db), loaders: RequestLoaders = Depends(get_write_loaders)):
+    comment = await loaders.comments.load(comment_id)
     if not comment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found")
     
     if comment.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authorized")
 
-    updated_comment = comment_crud_service.update_comment(db, comment_payload=comment_payload, comment_id=comment_id)
+    updated_comment = comment_crud_service.update_comment(db, comment_id=comment_id, comment_updates=comment_payload)
     return updated_comment
 
 @comment_router.delete("/{comment_id}", status_code=200)
-async def delete_comment(comment_id: int, current_user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    comment = comment_crud_service.get_a_comment(db, comment_id)
+async def delete_comment(comment_id: int, current_user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db), loaders: RequestLoaders = Depends(get_write_loaders)):
+    comment = await loaders.comments.load(comment_id)
     if not comment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found")
     
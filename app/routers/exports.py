@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from app.crud import export_crud_service
+from app.database import get_read_db
+from app.export import DEFAULT_EXPORT_BATCH_SIZE, EXPORT_COLUMNS, EXPORT_FORMATS, iter_export
+
+export_router = APIRouter()
+
+
+def stream_export(resource: str, db: Session, format: str, gzip: bool, after: int, batch_size: int):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported export format")
+
+    model, columns = EXPORT_COLUMNS[resource]
+
+    def body():
+        # The generator outlives the request handler, so it owns closing the session
+        try:
+            partitions = export_crud_service.stream_rows(db, model, columns, after_id=after, batch_size=batch_size)
+            yield from iter_export(columns, partitions, format, compress=gzip)
+        finally:
+            db.close()
+
+    headers = {"Content-Disposition": f'attachment; filename="{resource}.{format}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body(), media_type=EXPORT_FORMATS[format], headers=headers)
+
+
+# `after` is the keyset resume token: the last id received from a previous export
+@export_router.get("/movies", status_code=200)
+async def export_movies(db: Session = Depends(get_read_db), format: str = "ndjson", gzip: bool = False, after: int = Query(0, ge=0), batch_size: int = Query(DEFAULT_EXPORT_BATCH_SIZE, ge=1, le=10000)):
+    return stream_export("movies", db, format, gzip, after, batch_size)
+
+@export_router.get("/ratings", status_code=200)
+async def export_ratings(db: Session = Depends(get_read_db), format: str = "ndjson", gzip: bool = False, after: int = Query(0, ge=0), batch_size: int = Query(DEFAULT_EXPORT_BATCH_SIZE, ge=1, le=10000)):
+    return stream_export("ratings", db, format, gzip, after, batch_size)
+
+@export_router.get("/comments", status_code=200)
+async def export_comments(db: Session = Depends(get_read_db), format: str = "ndjson", gzip: bool = False, after: int = Query(0, ge=0), batch_size: int = Query(DEFAULT_EXPORT_BATCH_SIZE, ge=1, le=10000)):
+    return stream_export("comments", db, format, gzip, after, batch_size)
@@ -1,29 +1,86 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+import time
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
 import app.schemas as schemas
-from app.crud import movie_crud_service
-from app.database import get_db
+from app.crud import movie_crud_service, similarity_crud_service, trending_crud_service
+from app.database import get_db, get_read_db
 from app.auth import get_current_user
+from app.bulk import DEFAULT_BATCH_SIZE, SUPPORTED_FORMATS, MovieBulkImporter, aiter_lines, detect_format
+from app.loaders import RequestLoaders, found_in_order, get_loaders
+from app.leaderboard import LEADERBOARD_MAX_LIMIT, leaderboard
 from app.logger import logger
+from app.similarity import SIMILARITY_TOP_K, unpack_neighbors
+from app.trending import TRENDING_MAX_LIMIT, decayed
 
 movie_router = APIRouter()
 
+# With ?ids=1&ids=2 returns those movies in request order, with unknown ids in X-Missing-Ids
 @movie_router.get("/", status_code=200, response_model=List[schemas.Movie])
-async def get_movies(db: Session = Depends(get_db), offset: int = 0, limit: int = 10):
+async def get_movies(response: Response, db: Session = Depends(get_read_db), offset: int = 0, limit: int = 10,
+                     ids: Optional[List[int]] = Query(None), loaders: RequestLoaders = Depends(get_loaders)):
+    if ids:
+        ids = list(dict.fromkeys(ids))
+        return found_in_order(response, ids, loaders.load_movies(ids))
     movies = movie_crud_service.get_movies(db, offset=offset, limit=limit)
     return movies
 
+# Declared before '/{movie_id}' so "top" is not parsed as a movie id
+@movie_router.get("/top", status_code=200, response_model=List[schemas.TopMovie])
+async def get_top_movies(db: Session = Depends(get_read_db), limit: int = Query(10, ge=1, le=LEADERBOARD_MAX_LIMIT),
+                         genre: Optional[str] = None, year: Optional[int] = None):
+    entries = leaderboard.top(db, limit=limit, genre=genre, year=year)
+    return [
+        schemas.TopMovie(id=entry.movie_id, title=entry.title, genre=entry.genre, release_year=entry.release_year,
+                         score=round(-entry.key[0], 4), rating_count=entry.rating_count,
+                         average_rating=round(entry.rating_sum / entry.rating_count, 2))
+        for entry in entries
+    ]
+
+def trending_movies(db: Session, limit: int, genre: Optional[str] = None):
+    now = time.time()
+    return [
+        schemas.TrendingMovie(id=movie.id, title=movie.title, genre=movie.genre, release_year=movie.release_year,
+                              score=round(decayed(score, updated_at, now), 4))
+        for score, updated_at, movie in trending_crud_service.get_trending(db, limit=limit, genre=genre)
+    ]
+
+# Recent rating and comment activity, each event fading by half every TRENDING_HALF_LIFE_HOURS
+@movie_router.get("/trending", status_code=200, response_model=List[schemas.TrendingMovie])
+async def get_trending_movies(db: Session = Depends(get_read_db), limit: int = Query(10, ge=1, le=TRENDING_MAX_LIMIT)):
+    return trending_movies(db, limit)
+
+@movie_router.get("/trending/{genre}", status_code=200, response_model=List[schemas.TrendingMovie])
+async def get_trending_movies_by_genre(genre: str, db: Session = Depends(get_read_db), limit: int = Query(10, ge=1, le=TRENDING_MAX_LIMIT)):
+    return trending_movies(db, limit, genre=genre)
+
 @movie_router.get("/{movie_id}", status_code=200, response_model=schemas.Movie)
-async def get_movie_by_id(movie_id: int, db: Session = Depends(get_db)):
+async def get_movie_by_id(movie_id: int, db: Session = Depends(get_read_db)):
     movie = movie_crud_service.get_movie_by_id(db, movie_id)
     if not movie:
         logger.warning(f"Movie with ID {movie_id} not found.")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
     return movie
 
+# "People who rated this also liked", served from the precomputed neighbours of the movie
+@movie_router.get("/{movie_id}/similar", status_code=200, response_model=List[schemas.SimilarMovie])
+async def get_similar_movies(movie_id: int, db: Session = Depends(get_read_db), limit: int = Query(10, ge=1, le=SIMILARITY_TOP_K)):
+    similarity = similarity_crud_service.get_similarity(db, movie_id)
+    if similarity is None:
+        if not movie_crud_service.get_movie_by_id(db, movie_id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
+        return []
+
+    neighbors = unpack_neighbors(similarity.neighbor_ids, similarity.scores)[:limit]
+    movies = {movie.id: movie for movie in movie_crud_service.get_movies_by_ids(db, [neighbor_id for neighbor_id, _ in neighbors])}
+    return [
+        schemas.SimilarMovie(id=neighbor_id, title=movies[neighbor_id].title, genre=movies[neighbor_id].genre,
+                             release_year=movies[neighbor_id].release_year, score=round(score, 4))
+        for neighbor_id, score in neighbors if neighbor_id in movies
+    ]
+
 @movie_router.get("/genre/{genre}", status_code=200, response_model=List[schemas.Movie])
-async def get_movies_by_genre(genre: str, db: Session = Depends(get_db), offset: int = 0, limit: int = 10):
+async def get_movies_by_genre(genre: str, db: Session = Depends(get_read_db), offset: int = 0, limit: int = 10):
     movies = movie_crud_service.get_movies_by_genre(db, genre, offset, limit)
     if not movies:
         logger.info(f"No movies found for genre '{genre}'.")
@@ -31,7 +88,7 @@ async def get_movies_by_genre(genre: str, db: Session = Depends(get_db), offset:
     return movies
 
 @movie_router.get("/title/{movie_title}", status_code=200, response_model=List[schemas.Movie])
-async def get_movies_by_title(movie_title: str, db: Session = Depends(get_db), offset: int = 0, limit: int = 10):
+async def get_movies_by_title(movie_title: str, db: Session = Depends(get_read_db), offset: int = 0, limit: int = 10):
     movies = movie_crud_service.get_movies_by_title(db, movie_title, offset, limit)
     if not movies:
         logger.info(f"No movies found with title '{movie_title}'.")
@@ -43,6 +100,23 @@ async def create_movie(payload: schemas.MovieCreate, current_user: schemas.User
     movie = movie_crud_service.create_movie(db, payload, user_id=current_user.id)
     return movie
 
+# Bulk import movies from an NDJSON or CSV request body
+@movie_router.post('/bulk', status_code=200, response_model=schemas.BulkImportReport)
+async def bulk_import_movies(request: Request, format: Optional[str] = None, batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=10000), current_user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    fmt = format or detect_format(request.headers.get("content-type"))
+    if fmt not in SUPPORTED_FORMATS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported import format")
+
+    importer = MovieBulkImporter(db, user_id=current_user.id, fmt=fmt, batch_size=batch_size)
+    line_no = 0
+    async for line in aiter_lines(request.stream()):
+        line_no += 1
+        importer.feed(line_no, line)
+
+    report = importer.finish(line_no)
+    logger.info(f"User {current_user.id} bulk imported {report.inserted} movies ({report.failed} failed).")
+    return report
+
 @movie_router.put('/{movie_id}', status_code=200, response_model=schemas.Movie)
 async def update_movie(movie_id: int, payload: schemas.MovieUpdate, current_user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db)):
     db_movie = movie_crud_service.get_movie_by_id(db, movie_id)
@@ -1,28 +1,83 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 import app.schemas as schemas
-from app.crud import rating_crud_service, movie_crud_service
-from app.database import get_db
+from app.crud import idempotency_crud_service, rating_average_event, rating_crud_service, rating_stats_crud_service, movie_crud_service
+from app.database import get_db, get_read_db
 from app.auth import get_current_user
+from app.loaders import RequestLoaders, get_write_loaders
 from app.logger import logger
+from app.pubsub import SSE_KEEPALIVE_SECONDS, broker, sse_event
 
 rating_router = APIRouter()
 
 @rating_router.get("/", status_code=200, response_model=List[schemas.Rating])
-async def get_ratings(db: Session = Depends(get_db), offset: int = 0, limit: int = 10):
+async def get_ratings(db: Session = Depends(get_read_db), offset: int = 0, limit: int = 10):
     ratings = rating_crud_service.get_ratings(db, offset=offset, limit=limit)
     return ratings
 
+# Read from the per-movie histogram the rating writes maintain, never from the ratings table.
+# Declared before '/{rating_id}' so "distribution" is not parsed as a rating id
+@rating_router.get("/distribution", status_code=200, response_model=List[schemas.RatingDistribution])
+async def get_rating_distributions(movie_ids: List[int] = Query(..., max_length=100), db: Session = Depends(get_read_db)):
+    existing_ids = movie_crud_service.get_existing_movie_ids(db, movie_ids)
+    stats = {row.movie_id: row for row in rating_stats_crud_service.get_stats_for_movies(db, list(existing_ids))}
+    return [
+        schemas.RatingDistribution(movie_id=movie_id, **rating_stats_crud_service.summarize(stats.get(movie_id)))
+        for movie_id in dict.fromkeys(movie_ids) if movie_id in existing_ids
+    ]
+
+@rating_router.get("/distribution/{movie_id}", status_code=200, response_model=schemas.RatingDistribution)
+async def get_rating_distribution(movie_id: int, db: Session = Depends(get_read_db)):
+    stats = rating_stats_crud_service.get_stats_for_movies(db, [movie_id])
+    if not stats and not movie_crud_service.get_movie_by_id(db, movie_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
+    return schemas.RatingDistribution(movie_id=movie_id, **rating_stats_crud_service.summarize(stats[0] if stats else None))
+
+async def rating_average_events(subscription, current: dict):
+    try:
+        yield sse_event("rating", current)
+        version = current.get("version", 0)
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), timeout=SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            # Commits can publish out of order, here or through another worker; never step back
+            if event.get("version", 0) <= version:
+                continue
+            version = event.get("version", 0)
+            yield sse_event("rating", event)
+    finally:
+        subscription.close()
+
+# Live count and average of a movie's ratings as server-sent events: the current value first,
+# then at most one update per PUBSUB_COALESCE_SECONDS, skipping values a slow client missed
+@rating_router.get("/stream/{movie_id}", status_code=200)
+async def stream_movie_rating(movie_id: int, db: Session = Depends(get_read_db)):
+    # Subscribed before reading the current value so no update falls in between
+    subscription = broker.subscribe(f"ratings:{movie_id}", latest_only=True)
+    stats = rating_stats_crud_service.get_stats_for_movies(db, [movie_id])
+    if not stats and not movie_crud_service.get_movie_by_id(db, movie_id):
+        subscription.close()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
+
+    current = rating_average_event(movie_id, stats[0].rating_count, stats[0].rating_sum, stats[0].version) if stats else rating_average_event(movie_id, 0, 0)
+    return StreamingResponse(rating_average_events(subscription, current), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @rating_router.get("/{rating_id}", status_code=200, response_model=schemas.Rating)
-async def get_rating_by_id(rating_id: int, db: Session = Depends(get_db)):
+async def get_rating_by_id(rating_id: int, db: Session = Depends(get_read_db)):
     rating = rating_crud_service.get_rating_by_id(db, rating_id)
     if not rating:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rating not found")
     return rating
 
 @rating_router.get("/movie/{movie_id}", status_code=200, response_model=List[schemas.Rating])
-async def get_ratings_by_movie_id(movie_id: int, db: Session = Depends(get_db), offset: int = 0, limit: int = 10):
+async def get_ratings_by_movie_id(movie_id: int, db: Session = Depends(get_read_db), offset: int = 0, limit: int = 10):
     movie = movie_crud_service.get_movie_by_id(db, movie_id)
     if not movie:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
@@ -30,7 +85,7 @@ async def get_ratings_by_movie_id(movie_id: int, db: Session = Depends(get_db),
     return ratings
 
 @rating_router.get("/average_rating/{movie_id}", status_code=200)
-async def get_movie_avg_rating(movie_id: int, db: Session = Depends(get_db)):
+async def get_movie_avg_rating(movie_id: int, db: Session = Depends(get_read_db)):
     movie = movie_crud_service.get_movie_by_id(db, movie_id)
     if not movie:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
@@ -43,20 +98,50 @@ async def get_movie_avg_rating(movie_id: int, db: Session = Depends(get_db)):
     }
     return {"message": "Successful", "data": data}
 
+# Declared before '/{movie_id}' so "batch" is not parsed as a movie id
+@rating_router.post('/batch', status_code=200, response_model=schemas.RatingBatchResult)
+async def rate_movies_batch(payload: schemas.RatingBatch, current_user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    movie_ids = {item.movie_id for item in payload.ratings}
+    missing_ids = movie_ids - movie_crud_service.get_existing_movie_ids(db, list(movie_ids))
+    if missing_ids:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Movies not found: {sorted(missing_ids)}")
+
+    affected_movie_ids = rating_crud_service.upsert_ratings(db, payload.ratings, user_id=current_user.id)
+    return schemas.RatingBatchResult(upserted=len(affected_movie_ids), movie_ids=affected_movie_ids)
+
 @rating_router.post('/{movie_id}', status_code=201, response_model=schemas.Rating)
-async def rate_movie(movie_id: int, rating: schemas.RatingCreate, current_user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    movie = movie_crud_service.get_movie_by_id(db, movie_id)
-    if not movie:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
-    
-    existing_rating = rating_crud_service.get_rating(db, user_id=current_user.id, movie_id=movie_id)
-    if existing_rating is not None:
+async def rate_movie(movie_id: int, rating: schemas.RatingCreate, current_user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db), loaders: RequestLoaders = Depends(get_write_loaders)):
+    # The insert is a no-op on (user_id, movie_id) conflict, so concurrent double submits can't duplicate.
+    # It also inserts nothing for a missing movie, so the movie is only looked up when it fails
+    new_rating = rating_crud_service.rate_movie(db, rating, user_id=current_user.id, movie_id=movie_id)
+    if new_rating is None:
+        if await loaders.movies.load(movie_id) is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
         logger.warning(f"User {current_user.id} is trying to rate movie {movie_id} again.")
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="You have already rated this movie. Update your existing rating instead.")
-
-    new_rating = rating_crud_service.rate_movie_by_id(db, rating=rating, user_id=current_user.id, movie_id=movie_id)
     return new_rating
 
+# Create or replace the current user's rating for a movie in a single statement
+@rating_router.put('/movie/{movie_id}', status_code=200, response_model=schemas.Rating)
+async def upsert_movie_rating(movie_id: int, payload: schemas.RatingCreate, response: Response, idempotency_key: Optional[str] = Header(None), current_user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    # Keys live in the database, so a retry replays the stored response on whichever worker it lands
+    fingerprint = f"{movie_id}:{payload.rating_value}"
+    if idempotency_key:
+        claimed = idempotency_crud_service.claim_key(db, current_user.id, idempotency_key, fingerprint)
+        if claimed is not None:
+            if claimed.fingerprint != fingerprint:
+                raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Idempotency-Key was already used for a different request")
+            if claimed.response is None:
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A request with this Idempotency-Key is still in progress")
+            response.headers["Idempotent-Replayed"] = "true"
+            return schemas.Rating.model_validate_json(claimed.response)
+
+    # Commits the key claim together with the rating and its stored response, or releases it on a 404
+    rating = rating_crud_service.upsert_rating(db, payload, user_id=current_user.id, movie_id=movie_id, idempotency_key=idempotency_key)
+    if rating is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
+    return rating
+
 @rating_router.put("/{rating_id}", status_code=200, response_model=schemas.Rating)
 async def update_rating(rating_id: int, payload: schemas.RatingUpdate, current_user: schemas.User = Depends(get_current_user), db: Session = Depends(get_db)):
     rating = rating_crud_service.get_rating_by_id(db, rating_id)
@@ -1,31 +1,85 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 import app.schemas as schemas
-from app.crud import user_crud_service
-from app.database import get_db
+from app.activity import ACTIVITY_MAX_PAGE_SIZE, ACTIVITY_PAGE_SIZE, InvalidCursor, activity_cache, decode_cursor, encode_cursor
+from app.crud import activity_crud_service, movie_crud_service, rating_crud_service, user_crud_service
+from app.database import get_db, get_read_db, replica_engines
 from app.auth import get_current_user
+from app.loaders import RequestLoaders, found_in_order, get_loaders
 from app.logger import logger
+from app.recommendations import recommendation_store
 
 user_router = APIRouter()
 
 # Endpoint to get a list of users
+# With ?ids=1&ids=2 returns those users in request order, with unknown ids in X-Missing-Ids
 @user_router.get("/", status_code=200, response_model=List[schemas.User])
-async def get_users(db: Session = Depends(get_db), offset: int = 0, limit: int = 10):
+async def get_users(response: Response, db: Session = Depends(get_read_db), offset: int = 0, limit: int = 10,
+                    ids: Optional[List[int]] = Query(None), loaders: RequestLoaders = Depends(get_loaders)):
+    if ids:
+        ids = list(dict.fromkeys(ids))
+        return found_in_order(response, ids, loaders.users.load_many(ids))
     users = user_crud_service.get_users(db, offset=offset, limit=limit)
     return users
 
 # Endpoint to get a single user by ID
 @user_router.get("/{user_id}", status_code=200, response_model=schemas.User)
-async def get_user_by_id(user_id: int, db: Session = Depends(get_db)):
+async def get_user_by_id(user_id: int, db: Session = Depends(get_read_db)):
     user = user_crud_service.get_user_by_id(db, user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     return user
 
+# Personalised recommendations scored against the latest trained factor model
+@user_router.get("/{user_id}/recommendations", status_code=200, response_model=List[schemas.RecommendedMovie])
+async def get_recommendations(user_id: int, db: Session = Depends(get_read_db), limit: int = Query(10, ge=1, le=100)):
+    if not user_crud_service.get_user_by_id(db, user_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    model = recommendation_store.get_model()
+    if model is None:
+        return []
+
+    # Scoring is CPU-bound over every movie; keep it off the event loop
+    recommended = await run_in_threadpool(model.recommend, user_id, rating_crud_service.get_rated_movie_ids(db, user_id), limit)
+    movies = {movie.id: movie for movie in movie_crud_service.get_movies_by_ids(db, [movie_id for movie_id, _ in recommended])}
+    return [
+        schemas.RecommendedMovie(id=movie_id, title=movies[movie_id].title, genre=movies[movie_id].genre,
+                                 release_year=movies[movie_id].release_year, predicted_rating=round(score, 2))
+        for movie_id, score in recommended if movie_id in movies
+    ]
+
+# The user's movie listings, ratings and comments, newest first. Pass back next_cursor for the
+# following page; the first page is served from a per-user cache that the user's writes clear
+@user_router.get("/{user_id}/activity", status_code=200, response_model=schemas.ActivityPage)
+async def get_user_activity(user_id: int, db: Session = Depends(get_read_db), cursor: Optional[str] = None,
+                            limit: int = Query(ACTIVITY_PAGE_SIZE, ge=1, le=ACTIVITY_MAX_PAGE_SIZE)):
+    if cursor is None:
+        cached = activity_cache.get(user_id, limit)
+        if cached is not None:
+            return cached
+        version = activity_cache.version(user_id)
+    try:
+        positions = decode_cursor(cursor) if cursor else {}
+    except InvalidCursor:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    if not user_crud_service.get_user_by_id(db, user_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+    items, next_positions = activity_crud_service.get_user_activity(db, user_id, limit, positions)
+    page = schemas.ActivityPage(
+        items=[schemas.ActivityItem(**item) for item in items],
+        next_cursor=encode_cursor(next_positions) if next_positions else None,
+    )
+    # A replica may not have the user's latest writes yet, so only primary reads are cached
+    if cursor is None and db.get_bind() not in replica_engines:
+        activity_cache.set(user_id, limit, page, version)
+    return page
+
 # Endpoint to get a single user by username
 @user_router.get("/name/{username}", status_code=200, response_model=schemas.User)
-async def get_user_by_username(username: str, db: Session = Depends(get_db)):
+async def get_user_by_username(username: str, db: Session = Depends(get_read_db)):
     user = user_crud_service.get_user_by_username(db, username)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
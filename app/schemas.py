@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Any, List, Optional
 from datetime import datetime
 from pydantic import BaseModel, EmailStr, Field
 
@@ -59,6 +59,25 @@ class RatingCreate(RatingBase):
 class RatingUpdate(RatingBase):
     pass
 
+class RatingBatchItem(RatingBase):
+    movie_id: int
+
+class RatingBatch(BaseModel):
+    ratings: List[RatingBatchItem] = Field(..., min_length=1, max_length=1000)
+
+class RatingBatchResult(BaseModel):
+    upserted: int
+    movie_ids: List[int]
+
+class RatingDistribution(BaseModel):
+    movie_id: int
+    count: int
+    mean: Optional[float] = None
+    median: Optional[float] = None
+    std_dev: Optional[float] = None
+    # histogram[i] is the number of ratings with value i + 1
+    histogram: List[int]
+
 class Rating(RatingBase):
     id: int
     user_id: int
@@ -90,6 +109,17 @@ class Comment(CommentBase):
     class Config:
         orm_mode = True  # Use orm_mode instead of from_attributes for SQLAlchemy integration
 
+# Pushed to /movies/comments/stream/{movie_id} subscribers
+class CommentEvent(CommentBase):
+    id: int
+    user_id: int
+    movie_id: int
+    parent_id: Optional[int] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
 # Response Schemas
 class AuthorResponse(BaseModel):
     id: int
@@ -115,3 +145,60 @@ class CommentResponse(BaseModel):
 class CommentOut(BaseModel):
     comment: Comment
     replies: int
+
+# Bulk Import Schemas
+class BulkImportError(BaseModel):
+    line: int
+    errors: List[dict[str, Any]]
+
+class BulkImportReport(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[BulkImportError]
+
+# Recommendation Schemas
+class SimilarMovie(BaseModel):
+    id: int
+    title: str
+    genre: str
+    release_year: Optional[int] = None
+    score: float
+
+class RecommendedMovie(BaseModel):
+    id: int
+    title: str
+    genre: str
+    release_year: Optional[int] = None
+    predicted_rating: float
+
+# Leaderboard Schemas
+class TopMovie(BaseModel):
+    id: int
+    title: str
+    genre: str
+    release_year: Optional[int] = None
+    score: float
+    rating_count: int
+    average_rating: float
+
+class TrendingMovie(BaseModel):
+    id: int
+    title: str
+    genre: str
+    release_year: Optional[int] = None
+    score: float
+
+# Activity Feed Schemas
+class ActivityItem(BaseModel):
+    type: str
+    id: int
+    created_at: datetime
+    movie_id: Optional[int] = None
+    title: Optional[str] = None
+    rating_value: Optional[int] = None
+    parent_id: Optional[int] = None
+    comment: Optional[str] = None
+
+class ActivityPage(BaseModel):
+    items: List[ActivityItem]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,131 @@
+import time
+from array import array
+from sqlalchemy.orm import Session
+from app.crud import rating_crud_service, similarity_crud_service
+from app.logger import logger
+
+# NumPy and SciPy are only needed by the batch job, so they are imported inside it;
+# serving a precomputed row only unpacks bytes
+SIMILARITY_TOP_K = 20
+SIMILARITY_METHODS = ("adjusted_cosine", "cosine")
+# Rows of the similarity matrix computed at once; each chunk is dense over all movies, so fewer
+# rows are taken when there are many movies to keep a chunk within SIMILARITY_CHUNK_CELLS floats
+SIMILARITY_CHUNK_ROWS = 256
+SIMILARITY_CHUNK_CELLS = 16_000_000
+
+
+def unpack_neighbors(neighbor_ids: bytes, scores: bytes):
+    ids = array("i")
+    ids.frombytes(neighbor_ids)
+    values = array("f")
+    values.frombytes(scores)
+    return list(zip(ids, values))
+
+
+# Sparse movie x user matrix with L2-normalised rows, plus the rating signature of every movie
+def build_rating_matrix(triples, method: str = "adjusted_cosine"):
+    import numpy as np
+    from scipy import sparse
+
+    data = np.array(triples, dtype=np.int64).reshape(-1, 3)
+    user_ids, movie_ids, values = data[:, 0], data[:, 1], data[:, 2]
+    movies, movie_index = np.unique(movie_ids, return_inverse=True)
+    _, user_index = np.unique(user_ids, return_inverse=True)
+
+    weights = values.astype(np.float32)
+    if method == "adjusted_cosine":
+        # Centre each rating on its user's mean so harsh and generous raters compare fairly
+        user_means = np.bincount(user_index, weights=weights) / np.bincount(user_index)
+        weights = weights - user_means[user_index].astype(np.float32)
+
+    matrix = sparse.csr_matrix((weights, (movie_index, user_index)), shape=(len(movies), user_index.max(initial=-1) + 1))
+    matrix.eliminate_zeros()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    matrix = sparse.diags(1 / norms).dot(matrix).tocsr().astype(np.float32)
+
+    # Taken over the centred weights: a new rating moves its user's mean, which changes every
+    # movie that user rated
+    counts = np.bincount(movie_index, minlength=len(movies))
+    checksums = np.zeros(len(movies), dtype=np.int64)
+    np.add.at(checksums, movie_index, user_ids * np.round(weights * 1000).astype(np.int64))
+    return matrix, movies, counts, checksums
+
+
+# Yields (row, neighbour rows, scores, similarity row) for each requested row of the matrix
+def iter_neighbors(matrix, rows, top_k: int):
+    import numpy as np
+
+    chunk_rows = max(1, min(SIMILARITY_CHUNK_ROWS, SIMILARITY_CHUNK_CELLS // max(1, matrix.shape[0])))
+    for start in range(0, len(rows), chunk_rows):
+        chunk = rows[start:start + chunk_rows]
+        similarities = matrix[chunk].dot(matrix.T).toarray()
+        similarities[np.arange(len(chunk)), chunk] = 0
+        k = min(top_k, similarities.shape[1])
+        for offset, row in enumerate(chunk):
+            scores = similarities[offset]
+            candidates = np.argpartition(-scores, k - 1)[:k] if k else np.array([], dtype=np.int64)
+            candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+            candidates = candidates[scores[candidates] > 0]
+            yield row, candidates, scores[candidates], scores
+
+
+def refresh_similarities(db: Session, top_k: int = SIMILARITY_TOP_K, method: str = "adjusted_cosine", full: bool = False):
+    import numpy as np
+
+    started = time.perf_counter()
+    matrix, movies, counts, checksums = build_rating_matrix(rating_crud_service.get_rating_triples(db), method)
+    stored = {row.movie_id: row for row in similarity_crud_service.get_similarity_rows(db)}
+    position = {int(movie_id): row for row, movie_id in enumerate(movies)}
+
+    removed = [movie_id for movie_id in stored if movie_id not in position]
+    if full:
+        changed = list(range(len(movies)))
+    else:
+        changed = [
+            row for row, movie_id in enumerate(movies)
+            if (stored_row := stored.get(int(movie_id))) is None
+            or (stored_row.rating_count, stored_row.rating_checksum) != (int(counts[row]), int(checksums[row]))
+        ]
+
+    results = {}
+    best_change = np.zeros(len(movies), dtype=np.float32)
+    for row, neighbors, scores, similarities in iter_neighbors(matrix, changed, top_k):
+        results[row] = (neighbors, scores)
+        np.maximum(best_change, similarities, out=best_change)
+
+    # A stored row goes stale when it lists a changed movie, or a changed movie now beats its weakest neighbour
+    touched = {int(movies[row]) for row in changed} | set(removed)
+    affected = []
+    if (changed or removed) and not full:
+        for row, movie_id in enumerate(movies):
+            stored_row = stored.get(int(movie_id))
+            if row in results or stored_row is None:
+                continue
+            neighbors = unpack_neighbors(stored_row.neighbor_ids, stored_row.scores)
+            weakest = neighbors[-1][1] if len(neighbors) >= top_k else 0
+            if best_change[row] > weakest or any(neighbor_id in touched for neighbor_id, _ in neighbors):
+                affected.append(row)
+    for row, neighbors, scores, _ in iter_neighbors(matrix, affected, top_k):
+        results[row] = (neighbors, scores)
+
+    rows = [
+        {
+            "movie_id": int(movies[row]),
+            "neighbor_ids": movies[neighbors].astype(np.int32).tobytes(),
+            "scores": scores.astype(np.float32).tobytes(),
+            "rating_count": int(counts[row]),
+            "rating_checksum": int(checksums[row]),
+        }
+        for row, (neighbors, scores) in results.items()
+    ]
+    similarity_crud_service.replace_similarities(db, rows, removed)
+
+    stats = {
+        "movies": len(movies),
+        "recomputed": len(rows),
+        "removed": len(removed),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    logger.info('Movie similarities refreshed', extra=stats)
+    return stats
@@ -1,10 +1,20 @@
+import os
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
-from movie_app.main import app
-from movie_app.database import Base, get_db
+
+# The app module creates its engine at import time; tests swap in their own below
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+# The lifespan warm-up would run against the app's own empty in-memory database, not the test one
+os.environ.setdefault("STARTUP_WARMUP", "false")
+
+from app.main import app
+from app.database import Base, get_db, get_read_db
+from app.logger import stop_log_listener
 
 SQLALCHEMY_DATABASE_URL = "sqlite://"
 
@@ -29,6 +39,7 @@ def override_get_db():
 
 
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
 
 
 @pytest.fixture(scope="module")
@@ -41,4 +52,36 @@ def client():
 def setup_database():
     Base.metadata.create_all(bind=engine)
     yield
-    Base.metadata.drop_all(bind=engine)
\ No newline at end of file
+    Base.metadata.drop_all(bind=engine)
+
+
+# Signs a new user up and returns the Authorization headers for it
+@pytest.fixture(scope="module")
+def signup_and_login(client, setup_database):
+    def signup(username: str):
+        user_data = {"username": username, "email": f"{username}@example.com",
+                     "full_name": "Test User", "password": "testpassword123"}
+        response = client.post("/signup/", json=user_data)
+        assert response.status_code == 201
+
+        response = client.post("/login/", data={"username": username, "password": "testpassword123"})
+        assert response.status_code == 200
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return signup
+
+
+# Session on the test database for calling CRUD and batch code directly
+@pytest.fixture
+def db_session():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# Drain queued log records while pytest's output capture is still open
+@pytest.fixture(scope="session", autouse=True)
+def flush_logs():
+    yield
+    stop_log_listener()
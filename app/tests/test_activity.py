@@ -0,0 +1,127 @@
+import pytest
+from sqlalchemy import event
+from app.activity import ACTIVITY_INVALIDATION_TOPIC, ActivityCache, activity_cache
+from app.pubsub import Broker, broker
+from app.tests.conftest import engine
+
+
+@pytest.fixture(scope="module")
+def user(client, signup_and_login):
+    headers = signup_and_login("activityuser")
+    user_id = client.get("/users/name/activityuser").json()["id"]
+
+    for title in ("Listed One", "Listed Two"):
+        response = client.post("/movies", json={"title": title, "genre": "Drama"}, headers=headers)
+        assert response.status_code == 201
+        movie_id = response.json()["id"]
+        response = client.post(f"/movies/ratings/{movie_id}", json={"rating_value": 7}, headers=headers)
+        assert response.status_code == 201
+        response = client.post(f"/movies/comments/{movie_id}", json={"comment": f"About {title}"}, headers=headers)
+        assert response.status_code == 201
+    return user_id, headers
+
+
+def count_statements(client, path, **params):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        response = client.get(path, params=params)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return response, statements
+
+
+def test_activity_merges_streams_newest_first(client, user):
+    user_id, _ = user
+    response = client.get(f"/users/{user_id}/activity")
+
+    assert response.status_code == 200
+    page = response.json()
+    assert page["next_cursor"] is None
+    assert sorted(item["type"] for item in page["items"]) == ["comment", "comment", "movie", "movie", "rating", "rating"]
+    keys = [(item["created_at"], item["id"]) for item in page["items"]]
+    assert [key[0] for key in keys] == sorted((key[0] for key in keys), reverse=True)
+
+
+def test_activity_keyset_pages(client, user):
+    user_id, _ = user
+    everything = client.get(f"/users/{user_id}/activity", params={"limit": 100}).json()["items"]
+
+    collected, cursor = [], None
+    while True:
+        params = {"limit": 4 if cursor is None else 2}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get(f"/users/{user_id}/activity", params=params).json()
+        collected.extend(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [(item["type"], item["id"]) for item in collected] == [(item["type"], item["id"]) for item in everything]
+
+
+def test_first_page_cached_until_the_user_writes(client, user):
+    user_id, headers = user
+    client.get(f"/users/{user_id}/activity")
+
+    response, statements = count_statements(client, f"/users/{user_id}/activity")
+    assert response.status_code == 200
+    assert not any("FROM comments" in statement for statement in statements)
+
+    movie_id = next(item["id"] for item in response.json()["items"] if item["type"] == "movie")
+    response = client.post(f"/movies/comments/{movie_id}", json={"comment": "Fresh"}, headers=headers)
+    assert response.status_code == 201
+
+    response, statements = count_statements(client, f"/users/{user_id}/activity")
+    assert "Fresh" in [item["comment"] for item in response.json()["items"]]
+    assert any("FROM comments" in statement for statement in statements)
+
+
+def test_writes_on_other_workers_clear_the_cache(client, user):
+    user_id, _ = user
+    client.get(f"/users/{user_id}/activity")
+    assert activity_cache.get(user_id, 20) is not None
+
+    # What the Postgres listener thread delivers when another worker's write commits
+    broker.deliver(ACTIVITY_INVALIDATION_TOPIC, {"user_ids": [user_id]})
+    assert activity_cache.get(user_id, 20) is None
+
+
+def test_invalidate_is_published(monkeypatch):
+    published = []
+    backend = type("RecordingBackend", (), {"publish": lambda self, topic, message: published.append((topic, message))})()
+    monkeypatch.setattr("app.activity.broker", Broker(backend))
+
+    ActivityCache(ttl_seconds=30).invalidate(1, 2)
+    assert published == [(ACTIVITY_INVALIDATION_TOPIC, {"user_ids": [1, 2]})]
+
+
+def test_page_read_before_a_write_is_not_cached():
+    cache = ActivityCache(ttl_seconds=30)
+    version = cache.version(1)
+    # The user writes while their page is being read
+    cache.invalidate(1)
+    cache.set(1, 20, "stale", version)
+    assert cache.get(1, 20) is None
+
+    cache.set(1, 20, "fresh", cache.version(1))
+    assert cache.get(1, 20) == "fresh"
+
+
+def test_replica_reads_are_not_cached(client, user, monkeypatch):
+    user_id, _ = user
+    monkeypatch.setattr("app.routers.users.replica_engines", [engine])
+    monkeypatch.setattr("app.routers.users.activity_cache", ActivityCache(ttl_seconds=30))
+    client.get(f"/users/{user_id}/activity")
+
+    response, statements = count_statements(client, f"/users/{user_id}/activity")
+    assert response.status_code == 200
+    assert any("FROM comments" in statement for statement in statements)
+
+
+def test_activity_errors(client, user):
+    user_id, _ = user
+    assert client.get("/users/999/activity").status_code == 404
+    assert client.get(f"/users/{user_id}/activity", params={"cursor": "not-a-cursor"}).status_code == 400
@@ -0,0 +1,145 @@
+import pytest
+
+
+@pytest.fixture(scope="module")
+def headers(signup_and_login):
+    return signup_and_login("bulkuser")
+
+
+def test_bulk_import_requires_authentication(client, setup_database):
+    response = client.post("/movies/bulk", content=b'{"title": "A", "genre": "Drama"}\n')
+    assert response.status_code == 401
+
+
+def test_bulk_import_ndjson(client, headers):
+    body = (
+        b'{"title": "Movie One", "genre": "Drama", "release_year": 1999}\n'
+        b'{"title": "Movie Two", "genre": "Action"}\n'
+        b'not json\n'
+        b'\n'
+        b'{"title": "No Genre"}\n'
+        b'{"title": "Movie Three", "genre": "Comedy", "description": "Funny"}'
+    )
+    response = client.post(
+        "/movies/bulk?batch_size=2",
+        content=body,
+        headers={**headers, "Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["inserted"] == 3
+    assert data["failed"] == 2
+    assert [error["line"] for error in data["errors"]] == [3, 5]
+    assert data["errors"][1]["errors"][0]["loc"] == ["genre"]
+
+    response = client.get("/movies/?limit=100")
+    assert response.status_code == 200
+    movies = {movie["title"]: movie for movie in response.json()}
+    assert movies["Movie Three"]["owner"]["username"] == "bulkuser"
+    assert movies["Movie One"]["release_year"] == 1999
+
+
+def test_bulk_import_csv(client, headers):
+    body = (
+        "title,genre,description,release_year\n"
+        "Csv One,Drama,\"Quoted, with comma\",2001\n"
+        "Csv Two,Horror,,not-a-year\n"
+        "Csv Three,Horror,,\n"
+    ).encode()
+    response = client.post(
+        "/movies/bulk",
+        content=body,
+        headers={**headers, "Content-Type": "text/csv"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["inserted"] == 2
+    assert data["failed"] == 1
+    assert data["errors"][0]["line"] == 3
+
+    response = client.get("/movies/?limit=100")
+    movies = {movie["title"]: movie for movie in response.json()}
+    assert movies["Csv One"]["description"] == "Quoted, with comma"
+
+
+def test_bulk_import_unsupported_format(client, headers):
+    response = client.post(
+        "/movies/bulk?format=xml",
+        content=b"<movies/>",
+        headers=headers
+    )
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Unsupported import format"}
+
+
+def test_bulk_import_invalid_utf8_fails_only_that_row(client, headers):
+    body = (
+        b'{"title": "Before Bad Bytes", "genre": "Drama"}\n'
+        b'{"title": "Bad \xff Bytes", "genre": "Drama"}\n'
+        b'{"title": "After Bad Bytes", "genre": "Drama"}\n'
+    )
+    response = client.post(
+        "/movies/bulk?batch_size=1",
+        content=body,
+        headers={**headers, "Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["inserted"] == 2
+    assert [error["line"] for error in data["errors"]] == [2]
+    assert "utf-8" in data["errors"][0]["errors"][0]["msg"]
+
+
+def test_bulk_import_csv_quoted_newlines(client, headers):
+    body = (
+        b'title,genre,description\n'
+        b'Multi Line,Drama,"First line\nsecond ""quoted"" line"\n'
+        b'Bad \xff Csv,Drama,\n'
+        b'After Multi Line,Drama,\n'
+        b'Unterminated,Drama,"never\n'
+        b'closed\n'
+    )
+    response = client.post(
+        "/movies/bulk",
+        content=body,
+        headers={**headers, "Content-Type": "text/csv"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["inserted"] == 2
+    # The unclosed quote fails line 6; line 7 is then parsed on its own and is one column short
+    assert [error["line"] for error in data["errors"]] == [4, 6, 7]
+
+    response = client.get("/movies/?limit=100")
+    movies = {movie["title"]: movie for movie in response.json()}
+    assert movies["Multi Line"]["description"] == 'First line\nsecond "quoted" line'
+    assert "After Multi Line" in movies
+
+
+def test_bulk_import_csv_stray_quotes_and_misaligned_rows(client, headers, monkeypatch):
+    monkeypatch.setattr("app.bulk.MAX_RECORD_LINES", 3)
+    body = (
+        b'title,genre,description\n'
+        b'The 12" Single,Music,\n'
+        b'Shifted,Drama\n'
+        b'Too Many,Drama,,extra\n'
+        b'Open Quote,Drama,"never closed\n'
+        b'Kept One,Drama,\n'
+        b'Kept Two,Drama,\n'
+        b'Kept Three,Drama,\n'
+    )
+    response = client.post(
+        "/movies/bulk",
+        content=body,
+        headers={**headers, "Content-Type": "text/csv"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["inserted"] == 4
+    assert [error["line"] for error in data["errors"]] == [3, 4, 5]
+    assert data["errors"][0]["errors"][0]["msg"] == "expected 3 columns, got 2"
+    assert data["errors"][2]["errors"][0]["msg"] == "quoted field not closed within 3 lines"
+
+    response = client.get("/movies/?limit=100")
+    titles = {movie["title"] for movie in response.json()}
+    assert {'The 12" Single', "Kept One", "Kept Two", "Kept Three"} <= titles
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import pytest
+from app.pubsub import Broker, broker, sse_event
+from app.routers.comments import comment_events
+
+
+@pytest.fixture(scope="module")
+def headers(client, signup_and_login):
+    return signup_and_login("streamuser")
+
+
+@pytest.fixture(scope="module")
+def movie_id(client, headers):
+    response = client.post("/movies", json={"title": "Live", "genre": "Drama"}, headers=headers)
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def parse_event(text):
+    fields = dict(line.split(": ", 1) for line in text.strip().splitlines())
+    return fields["event"], json.loads(fields["data"])
+
+
+def test_stream_unknown_movie(client, headers):
+    response = client.get("/movies/comments/stream/999")
+    assert response.status_code == 404
+
+
+def test_comments_and_replies_are_pushed(client, headers, movie_id):
+    async def scenario():
+        subscription = broker.subscribe(f"comments:{movie_id}")
+        events = comment_events(subscription, [])
+        # The test client runs the app in its own thread and loop, like another request would
+        response = await asyncio.to_thread(client.post, f"/movies/comments/{movie_id}", json={"comment": "First!"}, headers=headers)
+        assert response.status_code == 201
+        comment = parse_event(await anext(events))
+
+        response = await asyncio.to_thread(client.post, f"/movies/comments/reply_comment/{comment[1]['id']}", json={"comment": "Second"}, headers=headers)
+        assert response.status_code == 201
+        reply = parse_event(await anext(events))
+        await events.aclose()
+        return comment, reply
+
+    comment, reply = asyncio.run(scenario())
+
+    assert comment[0] == "comment"
+    assert comment[1]["comment"] == "First!"
+    assert comment[1]["movie_id"] == movie_id
+    assert reply[1]["parent_id"] == comment[1]["id"]
+    assert broker.subscriber_count(f"comments:{movie_id}") == 0
+
+
+def test_backlog_replayed_without_duplicates():
+    local = Broker()
+
+    async def scenario():
+        subscription = local.subscribe("comments:1")
+        events = comment_events(subscription, [{"id": 1, "comment": "missed"}])
+        first = await anext(events)
+        local.publish("comments:1", {"id": 1, "comment": "missed"})
+        local.publish("comments:1", {"id": 2, "comment": "new"})
+        second = await anext(events)
+        await events.aclose()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == sse_event("comment", {"id": 1, "comment": "missed"}, event_id=1)
+    assert parse_event(second)[1]["id"] == 2
+
+
+def test_long_backlog_ends_the_stream_for_a_reconnect(client, headers, movie_id, monkeypatch):
+    monkeypatch.setattr("app.routers.comments.COMMENT_STREAM_REPLAY_LIMIT", 2)
+    ids = []
+    for n in range(3):
+        response = client.post(f"/movies/comments/{movie_id}", json={"comment": f"Missed {n}"}, headers=headers)
+        assert response.status_code == 201
+        ids.append(response.json()["id"])
+
+    # The stream closes after one page instead of skipping the rest
+    response = client.get(f"/movies/comments/stream/{movie_id}", headers={"Last-Event-ID": str(ids[0] - 1)})
+    assert response.status_code == 200
+    events = [parse_event(chunk) for chunk in response.text.split("\n\n") if chunk.strip()]
+    assert [event[1]["id"] for event in events] == ids[:2]
+    assert broker.subscriber_count(f"comments:{movie_id}") == 0
+
+
+def test_slow_subscriber_is_cut_off():
+    local = Broker(queue_size=2)
+
+    async def scenario():
+        subscription = local.subscribe("comments:1")
+        for comment_id in range(1, 4):
+            local.publish("comments:1", {"id": comment_id})
+        await asyncio.sleep(0)
+        return subscription.overflowed, [event async for event in comment_events(subscription, [])]
+
+    overflowed, events = asyncio.run(scenario())
+    assert overflowed
+    assert events == []
+    assert local.subscriber_count("comments:1") == 0
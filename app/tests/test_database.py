@@ -0,0 +1,100 @@
+import pytest
+from sqlalchemy import create_engine, text
+from starlette.requests import Request
+from app import database
+from app.database import ReplicaRouter, TimedQueuePool, get_pool_status, worker_pool_limits
+
+
+@pytest.mark.parametrize("pool_size, max_overflow, max_connections, workers, expected", [
+    (5, 10, 0, 10, (5, 10)),
+    (5, 10, 100, 10, (5, 5)),
+    (5, 10, 40, 10, (4, 0)),
+    (5, 10, 3, 10, (1, 0)),
+    (5, 10, 300, 1, (5, 10)),
+])
+def test_worker_pool_limits(pool_size, max_overflow, max_connections, workers, expected):
+    assert worker_pool_limits(pool_size, max_overflow, max_connections, workers) == expected
+
+
+def test_pool_status_queue_pool():
+    engine = create_engine("sqlite:///:memory:", poolclass=TimedQueuePool, pool_size=2, max_overflow=1)
+    with engine.connect() as connection:
+        connection.execute(text("select 1"))
+        status = get_pool_status(engine)
+        assert status["pool_class"] == "TimedQueuePool"
+        assert status["checked_out"] == 1
+        assert status["size"] == 2
+        assert status["max_overflow"] == 1
+
+    status = get_pool_status(engine)
+    assert status["checked_out"] == 0
+    assert status["checkouts"] >= 1
+
+
+def test_pool_stats_endpoint(client, signup_and_login):
+    response = client.get("/pool_stats")
+    assert response.status_code == 401
+
+    response = client.get("/pool_stats", headers=signup_and_login("poolstats"))
+
+    assert response.status_code == 200
+    data = response.json()
+    assert "pool_class" in data
+    assert data["replicas"] == []
+
+
+@pytest.fixture
+def replica_setup(tmp_path):
+    # Two SQLite files stand in for the primary and a replica
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    for engine, name in ((primary, "primary"), (replica, "replica")):
+        with engine.begin() as connection:
+            connection.execute(text("create table source (name text)"))
+            connection.execute(text("insert into source values (:name)"), {"name": name})
+    return primary, replica, ReplicaRouter(primary, [replica], sticky_seconds=60)
+
+
+def make_request(method="GET", headers=None):
+    raw_headers = [(key.lower().encode(), value.encode()) for key, value in (headers or {}).items()]
+    return Request({"type": "http", "method": method, "headers": raw_headers})
+
+
+def read_source(db_generator):
+    db = next(db_generator)
+    try:
+        return db.execute(text("select name from source")).scalar()
+    finally:
+        db_generator.close()
+
+
+def test_read_db_routes_to_replica(replica_setup, monkeypatch):
+    primary, replica, router = replica_setup
+    monkeypatch.setattr(database, "replica_router", router)
+    monkeypatch.setattr(database, "SessionLocal", database.sessionmaker(bind=primary))
+
+    assert read_source(database.get_read_db(make_request())) == "replica"
+    assert read_source(database.get_db(make_request("POST"), database.Response())) == "primary"
+
+
+def test_read_db_sticks_to_primary_after_write(replica_setup, monkeypatch):
+    primary, replica, router = replica_setup
+    monkeypatch.setattr(database, "replica_router", router)
+    monkeypatch.setattr(database, "SessionLocal", database.sessionmaker(bind=primary))
+    headers = {"Authorization": "Bearer writer"}
+
+    response = database.Response()
+    read_source(database.get_db(make_request("PUT", headers), response))
+
+    # Same worker: recognised by the bearer token
+    assert read_source(database.get_read_db(make_request(headers=headers))) == "primary"
+    # Other users still read from the replica
+    assert read_source(database.get_read_db(make_request(headers={"Authorization": "Bearer reader"}))) == "replica"
+    # Other workers: recognised by the sticky cookie set on the write response
+    cookie = response.headers["set-cookie"].split(";")[0]
+    assert read_source(database.get_read_db(make_request(headers={"Cookie": cookie}))) == "primary"
+
+
+def test_read_db_without_replicas_uses_primary(replica_setup):
+    primary, replica, router = replica_setup
+    assert ReplicaRouter(primary).engine_for(make_request()) is primary
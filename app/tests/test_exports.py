@@ -0,0 +1,64 @@
+import csv
+import io
+import json
+import pytest
+
+
+@pytest.fixture(scope="module")
+def headers(client, signup_and_login):
+    headers = signup_and_login("exportuser")
+
+    body = "".join(
+        json.dumps({"title": f"Export Movie {i}", "genre": "Drama", "release_year": 2000 + i}) + "\n"
+        for i in range(5)
+    )
+    response = client.post("/movies/bulk", content=body.encode(), headers=headers)
+    assert response.json()["inserted"] == 5
+    return headers
+
+
+def test_export_movies_ndjson(client, headers):
+    response = client.get("/export/movies?batch_size=2")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["title"] for row in rows] == [f"Export Movie {i}" for i in range(5)]
+    assert [row["id"] for row in rows] == sorted(row["id"] for row in rows)
+
+
+def test_export_movies_resume_after(client, headers):
+    rows = [json.loads(line) for line in client.get("/export/movies").text.splitlines()]
+
+    response = client.get(f"/export/movies?after={rows[2]['id']}")
+    assert response.status_code == 200
+    resumed = [json.loads(line) for line in response.text.splitlines()]
+    assert resumed == rows[3:]
+
+
+def test_export_movies_csv_gzip(client, headers):
+    response = client.get("/export/movies?format=csv&gzip=true&batch_size=2")
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 5
+    assert rows[0]["title"] == "Export Movie 0"
+    assert rows[4]["release_year"] == "2004"
+
+
+def test_export_empty_csv_has_header(client, headers):
+    response = client.get("/export/ratings?format=csv")
+
+    assert response.status_code == 200
+    assert response.text.strip() == "id,user_id,movie_id,rating_value,created_at"
+
+    response = client.get("/export/comments")
+    assert response.status_code == 200
+    assert response.text == ""
+
+
+def test_export_unsupported_format(client, headers):
+    response = client.get("/export/movies?format=xml")
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Unsupported export format"}
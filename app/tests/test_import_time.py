@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Self time of the app's own modules, summed; override on slow CI machines
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1500"))
+# Only needed once a request uses them, or when log shipping is configured
+DEFERRED_MODULES = ("logtail", "requests", "jose")
+
+
+def import_times():
+    env = dict(os.environ, BETTER_STACK_TOKEN="")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=Path(__file__).resolve().parents[2], env=env, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        if self_us.strip().isdigit():
+            times[name.strip()] = int(self_us) / 1000
+    return times
+
+
+def test_app_import_time_budget():
+    times = import_times()
+
+    assert "app.main" in times
+    app_ms = sum(ms for name, ms in times.items() if name == "app" or name.startswith("app."))
+    assert app_ms < IMPORT_TIME_BUDGET_MS, f"app modules took {app_ms:.0f}ms to import"
+    for name in DEFERRED_MODULES:
+        assert name not in times, f"{name} is imported eagerly"
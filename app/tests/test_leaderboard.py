@@ -0,0 +1,145 @@
+import pytest
+from sqlalchemy import event, func, select
+import app.models as models
+from app.crud import rating_stats_crud_service
+from app.leaderboard import Leaderboard, leaderboard
+from app.tests.conftest import engine
+
+# "Steady" has five 9s, "Fluke" a single 10; the Bayesian average should rank Steady first
+RATINGS = {
+    "lbuser1": {"Steady": 9, "Fluke": 10, "Sleeper": 6},
+    "lbuser2": {"Steady": 9, "Sleeper": 7},
+    "lbuser3": {"Steady": 9},
+    "lbuser4": {"Steady": 9},
+    "lbuser5": {"Steady": 9},
+}
+
+
+@pytest.fixture(autouse=True)
+def poll_every_read(monkeypatch):
+    monkeypatch.setattr(leaderboard, "poll_interval", 0)
+
+
+@pytest.fixture(scope="module")
+def headers(client, signup_and_login):
+    return {username: signup_and_login(username) for username in RATINGS}
+
+
+@pytest.fixture(scope="module")
+def movie_ids(client, headers):
+    ids = {}
+    for title, year in (("Steady", 1999), ("Fluke", 2001), ("Sleeper", 1999)):
+        response = client.post("/movies", json={"title": title, "genre": "Leaderboard", "release_year": year}, headers=headers["lbuser1"])
+        assert response.status_code == 201
+        ids[title] = response.json()["id"]
+
+    for username, ratings in RATINGS.items():
+        for title, value in ratings.items():
+            response = client.post(f"/movies/ratings/{ids[title]}", json={"rating_value": value}, headers=headers[username])
+            assert response.status_code == 201
+    return ids
+
+
+def test_top_movies_bayesian_order(client, movie_ids):
+    response = client.get("/movies/top", params={"genre": "Leaderboard"})
+
+    assert response.status_code == 200
+    top = response.json()
+    assert [movie["title"] for movie in top] == ["Steady", "Fluke", "Sleeper"]
+    assert top[0]["rating_count"] == 5
+    assert top[0]["average_rating"] == 9.0
+
+
+def test_top_movies_filters(client, movie_ids):
+    response = client.get("/movies/top", params={"genre": "Leaderboard", "year": 1999, "limit": 1})
+    assert [movie["title"] for movie in response.json()] == ["Steady"]
+
+    response = client.get("/movies/top", params={"year": 2001})
+    assert "Fluke" in [movie["title"] for movie in response.json()]
+
+    response = client.get("/movies/top", params={"limit": 101})
+    assert response.status_code == 422
+
+
+def test_top_movies_follow_rating_writes(client, movie_ids, headers, db_session):
+    for username in ("lbuser2", "lbuser3", "lbuser4", "lbuser5"):
+        response = client.put(f"/movies/ratings/movie/{movie_ids['Sleeper']}", json={"rating_value": 10}, headers=headers[username])
+        assert response.status_code == 200
+
+    response = client.get("/movies/top", params={"genre": "Leaderboard"})
+    assert response.json()[0]["title"] == "Sleeper"
+
+    rating_id = db_session.scalar(select(models.Rating.id).where(models.Rating.movie_id == movie_ids["Fluke"]))
+    response = client.delete(f"/movies/ratings/{rating_id}", headers=headers["lbuser1"])
+    assert response.status_code == 200
+
+    response = client.get("/movies/top", params={"genre": "Leaderboard"})
+    assert "Fluke" not in [movie["title"] for movie in response.json()]
+
+
+def test_stats_match_ratings(movie_ids, db_session):
+    maintained = {row.movie_id: (row.rating_count, row.rating_sum) for row in rating_stats_crud_service.get_all_stats(db_session)}
+    expected = db_session.execute(
+        select(models.Rating.movie_id, func.count(models.Rating.id), func.sum(models.Rating.rating_value))
+        .group_by(models.Rating.movie_id)
+    ).all()
+
+    assert {movie_id: (count, total) for movie_id, count, total in expected} == {
+        movie_id: stats for movie_id, stats in maintained.items() if stats[0]
+    }
+    rating_stats_crud_service.rebuild_stats(db_session)
+    rebuilt = {row.movie_id: (row.rating_count, row.rating_sum) for row in rating_stats_crud_service.get_all_stats(db_session)}
+    assert rebuilt == {movie_id: stats for movie_id, stats in maintained.items() if stats[0]}
+
+
+def test_top_read_does_not_scan_ratings(movie_ids, db_session):
+    board = Leaderboard(poll_interval=0)
+    board.top(db_session)
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        assert len(board.top(db_session, limit=100)) >= 2
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert statements
+    assert not any("FROM ratings" in statement for statement in statements)
+
+
+def test_rated_movie_can_be_deleted(client, movie_ids, headers):
+    response = client.post("/movies", json={"title": "Doomed", "genre": "Leaderboard"}, headers=headers["lbuser1"])
+    doomed_id = response.json()["id"]
+    for username in ("lbuser1", "lbuser2"):
+        response = client.post(f"/movies/ratings/{doomed_id}", json={"rating_value": 10}, headers=headers[username])
+        assert response.status_code == 201
+    assert "Doomed" in [movie["title"] for movie in client.get("/movies/top", params={"genre": "Leaderboard"}).json()]
+    assert "Doomed" in [movie["title"] for movie in client.get("/movies/trending").json()]
+
+    # SQLite only enforces foreign keys when asked, as Postgres always does
+    with engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA foreign_keys=ON")
+    try:
+        response = client.delete(f"/movies/{doomed_id}", headers=headers["lbuser1"])
+    finally:
+        with engine.connect() as connection:
+            connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+    assert response.status_code == 200
+
+    assert "Doomed" not in [movie["title"] for movie in client.get("/movies/top", params={"genre": "Leaderboard"}).json()]
+    assert "Doomed" not in [movie["title"] for movie in client.get("/movies/trending").json()]
+
+
+def test_repeated_first_rating_counts_once(client, movie_ids, headers, db_session):
+    response = client.post("/movies", json={"title": "Twice", "genre": "Leaderboard"}, headers=headers["lbuser1"])
+    twice_id = response.json()["id"]
+
+    for _ in range(2):
+        response = client.put(f"/movies/ratings/movie/{twice_id}", json={"rating_value": 8}, headers=headers["lbuser2"])
+        assert response.status_code == 200
+        response = client.post("/movies/ratings/batch", json={"ratings": [{"movie_id": twice_id, "rating_value": 8}]}, headers=headers["lbuser3"])
+        assert response.status_code == 200
+
+    stats = db_session.get(models.MovieRatingStats, twice_id)
+    assert (stats.rating_count, stats.rating_sum, stats.votes_8) == (2, 16, 2)
@@ -0,0 +1,47 @@
+import logging
+import queue
+from app.logger import BatchQueueListener, DroppingQueueHandler
+
+
+class RecordingHandler(logging.Handler):
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+        self.flushes = 0
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+    def flush(self):
+        self.flushes += 1
+
+
+def make_record(message):
+    return logging.LogRecord("test", logging.INFO, __file__, 1, message, None, None)
+
+
+def test_queue_handler_drops_when_full():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=2))
+
+    for i in range(5):
+        handler.handle(make_record(f"message {i}"))
+
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+
+def test_listener_ships_in_batches():
+    log_queue = queue.Queue()
+    recorder = RecordingHandler()
+    listener = BatchQueueListener(log_queue, recorder, batch_size=10, flush_interval=5)
+    handler = DroppingQueueHandler(log_queue)
+
+    for i in range(25):
+        handler.handle(make_record(f"message {i}"))
+    listener.start()
+    listener.stop()
+
+    assert recorder.messages == [f"message {i}" for i in range(25)]
+    # Three batches of at most ten records, one flush each
+    assert recorder.flushes == 3
@@ -0,0 +1,95 @@
+import json
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from app.metrics import MetricsRegistry, instrument_engine
+from app.middleware import MetricsMiddleware
+
+
+def test_render_counters_and_histograms():
+    registry = MetricsRegistry()
+    labels = (("method", "GET"), ("route", "/movies/{movie_id}"))
+    registry.inc("http_requests_total", labels + (("status", "2xx"),))
+    registry.inc("http_requests_total", labels + (("status", "2xx"),))
+    registry.observe("http_request_duration_seconds", labels, 0.003, buckets=(0.005, 0.1))
+    registry.observe("http_request_duration_seconds", labels, 0.05, buckets=(0.005, 0.1))
+    registry.observe("http_request_duration_seconds", labels, 3, buckets=(0.005, 0.1))
+
+    output = registry.render()
+    assert '# TYPE http_requests_total counter' in output
+    assert 'http_requests_total{method="GET",route="/movies/{movie_id}",status="2xx"} 2' in output
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/movies/{movie_id}",le="0.005"} 1' in output
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/movies/{movie_id}",le="0.1"} 2' in output
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/movies/{movie_id}",le="+Inf"} 3' in output
+    assert 'http_request_duration_seconds_count{method="GET",route="/movies/{movie_id}"} 3' in output
+
+
+def test_collect_merges_worker_snapshots(tmp_path):
+    worker = MetricsRegistry()
+    worker.inc("http_requests_total", (("status", "2xx"),), 5)
+    worker.observe("http_request_duration_seconds", (), 0.2)
+    (tmp_path / "metrics_99999.json").write_text(json.dumps(worker.snapshot()))
+
+    registry = MetricsRegistry(directory=str(tmp_path))
+    registry.inc("http_requests_total", (("status", "2xx"),), 2)
+    registry.observe("http_request_duration_seconds", (), 0.02)
+
+    output = registry.render()
+    assert 'http_requests_total{status="2xx"} 7' in output
+    assert 'http_request_duration_seconds_count 2' in output
+
+    registry.flush()
+    assert len(list(tmp_path.glob("metrics_*.json"))) == 2
+
+
+def test_middleware_labels_route_template_and_counts_queries():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    registry = MetricsRegistry()
+
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        with engine.connect() as connection:
+            connection.execute(text("select 1"))
+            connection.execute(text("select 2"))
+        return {"id": item_id}
+
+    client = TestClient(MetricsMiddleware(app, registry=registry))
+    assert client.get("/items/1").status_code == 200
+    assert client.get("/items/2").status_code == 200
+    assert client.get("/nowhere").status_code == 404
+
+    output = registry.render()
+    assert 'http_requests_total{method="GET",route="/items/{item_id}",status="2xx"} 2' in output
+    assert 'http_requests_total{method="GET",route="unmatched",status="4xx"} 1' in output
+    assert 'db_queries_per_request_bucket{method="GET",route="/items/{item_id}",le="1"} 0' in output
+    assert 'db_queries_per_request_bucket{method="GET",route="/items/{item_id}",le="2"} 2' in output
+
+
+def test_event_streams_kept_out_of_request_latency():
+    registry = MetricsRegistry()
+    app = FastAPI()
+
+    @app.get("/events")
+    async def events():
+        return StreamingResponse(iter(["data: 1\n\n"]), media_type="text/event-stream")
+
+    client = TestClient(MetricsMiddleware(app, registry=registry))
+    assert client.get("/events").status_code == 200
+
+    output = registry.render()
+    assert 'http_stream_duration_seconds_count{method="GET",route="/events"} 1' in output
+    assert 'http_request_duration_seconds_count{method="GET",route="/events"}' not in output
+    assert 'http_requests_total{method="GET",route="/events",status="2xx"} 1' in output
+
+
+def test_metrics_endpoint(client):
+    client.get("/")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_requests_total{method="GET",route="/",status="2xx"}' in response.text
@@ -0,0 +1,104 @@
+import logging
+import orjson
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from app.logger import JsonFormatter
+from app.middleware import LogMiddleware
+
+app = FastAPI()
+
+
+@app.get("/ok")
+async def ok():
+    return {"ok": True}
+
+
+@app.get("/missing")
+async def missing():
+    return StreamingResponse(iter([b"a", b"b"]), status_code=404)
+
+
+@app.get("/boom")
+async def boom():
+    raise RuntimeError("boom")
+
+
+def make_client(raise_server_exceptions=True, **options):
+    return TestClient(LogMiddleware(app, **options), raise_server_exceptions=raise_server_exceptions)
+
+
+def request_records(caplog):
+    return [record for record in caplog.records if record.getMessage().startswith("Request Info")]
+
+
+def test_logs_request(caplog):
+    client = make_client()
+    with caplog.at_level(logging.INFO):
+        response = client.get("/ok?page=2")
+
+    assert response.status_code == 200
+    record, = request_records(caplog)
+    assert record.url == "http://testserver/ok?page=2"
+    assert record.method == "GET"
+    assert record.status_code == 200
+    assert record.process_time >= 0
+
+
+def test_logs_streaming_status(caplog):
+    client = make_client()
+    with caplog.at_level(logging.INFO):
+        response = client.get("/missing")
+
+    assert response.content == b"ab"
+    record, = request_records(caplog)
+    assert record.status_code == 404
+
+
+def test_logs_unhandled_error_as_500(caplog):
+    client = make_client(raise_server_exceptions=False)
+    with caplog.at_level(logging.INFO):
+        response = client.get("/boom")
+
+    assert response.status_code == 500
+    record, = request_records(caplog)
+    assert record.status_code == 500
+
+
+def test_samples_successful_requests(caplog):
+    client = make_client(raise_server_exceptions=False, sample_rate=0.0)
+    with caplog.at_level(logging.INFO):
+        client.get("/ok")
+        client.get("/boom")
+
+    # The error is kept, the sampled-out success is not
+    record, = request_records(caplog)
+    assert record.status_code == 500
+    assert record.sample_rate == 1.0
+
+
+def test_always_logs_slow_requests(caplog):
+    client = make_client(sample_rate=0.0, slow_request_ms=0)
+    with caplog.at_level(logging.INFO):
+        client.get("/ok")
+
+    assert len(request_records(caplog)) == 1
+
+
+def test_json_formatter():
+    record = logging.LogRecord("app", logging.INFO, __file__, 1, "Request Info: %s", ("GET",), None)
+    record.status_code = 200
+
+    data = orjson.loads(JsonFormatter().format(record))
+    assert data["msg"] == "Request Info: GET"
+    assert data["level"] == "INFO"
+    assert data["status_code"] == 200
+    assert "args" not in data
+
+
+def test_skips_record_when_disabled(caplog):
+    client = make_client()
+    with caplog.at_level(logging.WARNING):
+        client.get("/ok")
+
+    assert request_records(caplog) == []
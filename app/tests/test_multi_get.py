@@ -0,0 +1,92 @@
+import pytest
+from sqlalchemy import event
+from app.tests.conftest import engine
+
+
+@pytest.fixture(scope="module")
+def data(client, signup_and_login):
+    users, movies, comments = [], [], []
+    for n in range(3):
+        headers = signup_and_login(f"multiget{n}")
+        users.append(client.get(f"/users/name/multiget{n}").json()["id"])
+        response = client.post("/movies", json={"title": f"Batch {n}", "genre": "Drama"}, headers=headers)
+        assert response.status_code == 201
+        movies.append(response.json()["id"])
+        response = client.post(f"/movies/comments/{movies[0]}", json={"comment": f"Comment {n}"}, headers=headers)
+        assert response.status_code == 201
+        comments.append(response.json()["id"])
+
+    response = client.post(f"/movies/comments/reply_comment/{comments[0]}", json={"comment": "Reply"}, headers=headers)
+    assert response.status_code == 201
+    return {"users": users, "movies": movies, "comments": comments}
+
+
+def count_statements(client, path, params):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        response = client.get(path, params=params)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return response, statements
+
+
+def test_movies_by_ids(client, data):
+    ids = [data["movies"][2], 999, data["movies"][0], data["movies"][2]]
+    response, statements = count_statements(client, "/movies/", {"ids": ids})
+
+    assert response.status_code == 200
+    assert [movie["id"] for movie in response.json()] == [data["movies"][2], data["movies"][0]]
+    assert response.json()[0]["owner"]["id"] == data["users"][2]
+    assert response.headers["X-Missing-Ids"] == "999"
+    # Movies, then their owners; no SELECT per movie
+    assert len(statements) == 2
+
+
+def test_users_by_ids(client, data):
+    ids = [data["users"][1], data["users"][0]]
+    response, statements = count_statements(client, "/users/", {"ids": ids})
+
+    assert response.status_code == 200
+    assert [user["id"] for user in response.json()] == ids
+    assert "X-Missing-Ids" not in response.headers
+    assert len(statements) == 1
+
+
+def test_comments_by_ids(client, data):
+    ids = data["comments"] + [998]
+    response, statements = count_statements(client, "/movies/comments/", {"ids": ids})
+
+    assert response.status_code == 200
+    comments = response.json()
+    assert [comment["id"] for comment in comments] == data["comments"]
+    assert [comment["replies"] for comment in comments] == [1, 0, 0]
+    assert comments[1]["author"]["username"] == "multiget1"
+    assert response.headers["X-Missing-Ids"] == "998"
+    assert len(statements) == 3
+
+
+def test_comments_by_ids_in_chunks(client, data, monkeypatch):
+    monkeypatch.setattr("app.loaders.LOADER_CHUNK_SIZE", 2)
+    response, statements = count_statements(client, "/movies/comments/", {"ids": data["comments"]})
+
+    assert response.status_code == 200
+    assert [comment["replies"] for comment in response.json()] == [1, 0, 0]
+    # Reply counts for three comments take two IN queries
+    assert len([statement for statement in statements if "count(" in statement]) == 2
+
+
+def test_missing_ids_header_is_capped(client, data, monkeypatch):
+    monkeypatch.setattr("app.loaders.MISSING_IDS_HEADER_LIMIT", 2)
+    response = client.get("/movies/", params={"ids": [997, data["movies"][0], 998, 999]})
+
+    assert response.status_code == 200
+    assert response.headers["X-Missing-Ids"] == "997,998"
+    assert response.headers["X-Missing-Count"] == "3"
+
+
+def test_list_without_ids_unchanged(client, data):
+    response = client.get("/movies/", params={"limit": 2})
+    assert response.status_code == 200
+    assert len(response.json()) == 2
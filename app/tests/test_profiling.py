@@ -0,0 +1,95 @@
+import logging
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from app.middleware import ProfilingMiddleware
+from app.profiling import instrument_engine, parameter_shape
+
+engine = create_engine("sqlite://")
+instrument_engine(engine, slow_query_ms=0)
+
+
+class ItemCRUDService:
+
+    @staticmethod
+    def get_items(limit: int):
+        with engine.connect() as connection:
+            connection.execute(text("select :limit"), {"limit": limit})
+            connection.execute(text("select 2"))
+
+
+app = FastAPI()
+
+
+@app.get("/items")
+async def get_items(limit: int = 10):
+    ItemCRUDService.get_items(limit)
+    return []
+
+
+@app.get("/empty")
+async def empty():
+    return []
+
+
+client = TestClient(ProfilingMiddleware(app))
+
+
+def test_server_timing_header():
+    response = client.get("/items")
+
+    assert response.status_code == 200
+    assert response.headers["server-timing"].startswith("db;dur=")
+    assert response.headers["server-timing"].endswith('desc="2 queries"')
+
+    response = client.get("/empty")
+    assert response.headers["server-timing"] == 'db;dur=0.00;desc="0 queries"'
+
+
+def test_slow_queries_logged_with_crud_method_and_parameter_shape(caplog):
+    with caplog.at_level(logging.INFO):
+        client.get("/items?limit=5")
+
+    slow = [record for record in caplog.records if record.getMessage().startswith("Slow query")]
+    assert len(slow) == 2
+    assert slow[0].crud_method == "ItemCRUDService.get_items"
+    assert slow[0].route == "/items"
+    assert slow[0].parameter_shape == ["int"]
+
+    summary, = [record for record in caplog.records if record.getMessage().startswith("SQL profile")]
+    assert summary.queries == 2
+    assert summary.crud_methods["ItemCRUDService.get_items"]["queries"] == 2
+
+
+def test_parameter_shape():
+    assert parameter_shape({"id": 1, "title": "x"}) == {"id": "int", "title": "str"}
+    assert parameter_shape((1, None)) == ["int", "NoneType"]
+    assert parameter_shape([{"id": 1}, {"id": 2}], executemany=True) == {"rows": 2, "row": {"id": "int"}}
+
+
+def test_queries_outside_requests_are_not_profiled(caplog):
+    with caplog.at_level(logging.INFO):
+        ItemCRUDService.get_items(1)
+
+    assert not [record for record in caplog.records if record.getMessage().startswith("Slow query")]
+
+
+@app.get("/stream")
+async def stream():
+    def body():
+        # Runs in the threadpool after the headers went out, like the export generators
+        ItemCRUDService.get_items(3)
+        yield "done\n"
+    return StreamingResponse(body(), media_type="text/plain")
+
+
+def test_queries_in_streaming_bodies_are_logged(caplog):
+    with caplog.at_level(logging.INFO):
+        response = client.get("/stream")
+
+    # The header is sent before the body runs, so it cannot include the body's queries
+    assert response.headers["server-timing"].endswith('desc="0 queries"')
+    summary, = [record for record in caplog.records if record.getMessage().startswith("SQL profile")]
+    assert summary.queries == 2
+    assert summary.body_queries == 2
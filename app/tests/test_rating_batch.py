@@ -0,0 +1,57 @@
+import pytest
+
+
+@pytest.fixture(scope="module")
+def headers(client, signup_and_login):
+    headers = signup_and_login("batchuser")
+
+    for title in ("Batch One", "Batch Two", "Batch Three"):
+        response = client.post("/movies", json={"title": title, "genre": "Drama"}, headers=headers)
+        assert response.status_code == 201
+    return headers
+
+
+def test_rate_batch_requires_authentication(client, setup_database):
+    response = client.post("/movies/ratings/batch", json={"ratings": [{"movie_id": 1, "rating_value": 5}]})
+    assert response.status_code == 401
+
+
+def test_rate_batch_upserts(client, headers):
+    payload = {"ratings": [
+        {"movie_id": 1, "rating_value": 7},
+        {"movie_id": 2, "rating_value": 3},
+        {"movie_id": 1, "rating_value": 9},
+    ]}
+    response = client.post("/movies/ratings/batch", json=payload, headers=headers)
+
+    assert response.status_code == 200
+    assert response.json() == {"upserted": 2, "movie_ids": [1, 2]}
+
+    # Re-rating updates in place instead of inserting duplicates
+    payload = {"ratings": [{"movie_id": 2, "rating_value": 10}, {"movie_id": 3, "rating_value": 4}]}
+    response = client.post("/movies/ratings/batch", json=payload, headers=headers)
+    assert response.status_code == 200
+
+    ratings = {rating["movie_id"]: rating["rating_value"] for rating in client.get("/movies/ratings/").json()}
+    assert ratings == {1: 9, 2: 10, 3: 4}
+
+
+def test_rate_batch_unknown_movie(client, headers):
+    payload = {"ratings": [{"movie_id": 1, "rating_value": 2}, {"movie_id": 99, "rating_value": 5}]}
+    response = client.post("/movies/ratings/batch", json=payload, headers=headers)
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Movies not found: [99]"}
+
+    # Nothing from a rejected batch is applied
+    ratings = {rating["movie_id"]: rating["rating_value"] for rating in client.get("/movies/ratings/").json()}
+    assert ratings[1] == 9
+
+
+def test_rate_batch_validation(client, headers):
+    payload = {"ratings": [{"movie_id": 1, "rating_value": 11}]}
+    response = client.post("/movies/ratings/batch", json=payload, headers=headers)
+    assert response.status_code == 422
+
+    response = client.post("/movies/ratings/batch", json={"ratings": []}, headers=headers)
+    assert response.status_code == 422
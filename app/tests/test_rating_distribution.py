@@ -0,0 +1,63 @@
+import pytest
+
+VALUES = [2, 7, 7, 9]
+
+
+@pytest.fixture(scope="module")
+def headers(client, signup_and_login):
+    return [signup_and_login(f"distuser{n}") for n in range(len(VALUES))]
+
+
+@pytest.fixture(scope="module")
+def movie_ids(client, headers):
+    ids = []
+    for title in ("Divisive", "Unrated"):
+        response = client.post("/movies", json={"title": title, "genre": "Drama"}, headers=headers[0])
+        assert response.status_code == 201
+        ids.append(response.json()["id"])
+
+    for user_headers, value in zip(headers, VALUES):
+        response = client.post(f"/movies/ratings/{ids[0]}", json={"rating_value": value}, headers=user_headers)
+        assert response.status_code == 201
+    return ids
+
+
+def test_rating_distribution(client, movie_ids):
+    response = client.get(f"/movies/ratings/distribution/{movie_ids[0]}")
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "movie_id": movie_ids[0],
+        "count": 4,
+        "mean": 6.25,
+        "median": 7.0,
+        "std_dev": 2.59,
+        "histogram": [0, 1, 0, 0, 0, 0, 2, 0, 1, 0],
+    }
+
+
+def test_rating_distribution_follows_writes(client, movie_ids, headers):
+    response = client.put(f"/movies/ratings/movie/{movie_ids[0]}", json={"rating_value": 10}, headers=headers[0])
+    assert response.status_code == 200
+
+    distribution = client.get(f"/movies/ratings/distribution/{movie_ids[0]}").json()
+    assert distribution["histogram"] == [0, 0, 0, 0, 0, 0, 2, 0, 1, 1]
+    assert distribution["median"] == 8.0
+
+
+def test_rating_distribution_unrated_and_unknown(client, movie_ids):
+    response = client.get(f"/movies/ratings/distribution/{movie_ids[1]}")
+    assert response.status_code == 200
+    assert response.json()["count"] == 0
+    assert response.json()["median"] is None
+
+    response = client.get("/movies/ratings/distribution/999")
+    assert response.status_code == 404
+
+
+def test_rating_distributions_batch(client, movie_ids):
+    response = client.get("/movies/ratings/distribution", params={"movie_ids": [movie_ids[1], 999, movie_ids[0]]})
+
+    assert response.status_code == 200
+    assert [item["movie_id"] for item in response.json()] == [movie_ids[1], movie_ids[0]]
+    assert [item["count"] for item in response.json()] == [0, 4]
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import pytest
+from app.pubsub import Broker, CoalescingPublisher, rating_updates
+from app.routers.ratings import rating_average_events
+
+
+@pytest.fixture(scope="module")
+def headers(client, signup_and_login):
+    return [signup_and_login(f"ratestream{n}") for n in range(2)]
+
+
+@pytest.fixture(scope="module")
+def movie_id(client, headers):
+    response = client.post("/movies", json={"title": "Live Ratings", "genre": "Drama"}, headers=headers[0])
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def event_data(text):
+    return json.loads(text.split("data: ", 1)[1])
+
+
+def test_stream_unknown_movie(client, headers):
+    response = client.get("/movies/ratings/stream/999")
+    assert response.status_code == 404
+
+
+def test_rating_writes_are_pushed(client, headers, movie_id):
+    topic = f"ratings:{movie_id}"
+
+    async def scenario():
+        subscription = rating_updates.broker.subscribe(topic, latest_only=True)
+        events = rating_average_events(subscription, {"movie_id": movie_id, "rating_count": 0, "avg_rating": 0.0})
+        initial = event_data(await anext(events))
+
+        for user_headers, value in zip(headers, (8, 5)):
+            response = await asyncio.to_thread(client.post, f"/movies/ratings/{movie_id}", json={"rating_value": value}, headers=user_headers)
+            assert response.status_code == 201
+        # Both ratings land within one coalescing interval, so only the newest totals arrive
+        update = event_data(await anext(events))
+        await events.aclose()
+        return initial, update
+
+    initial, update = asyncio.run(scenario())
+
+    assert initial["rating_count"] == 0
+    assert update == {"movie_id": movie_id, "rating_count": 2, "avg_rating": 6.5, "version": 2}
+
+
+def test_bursts_are_coalesced():
+    local = Broker()
+    publisher = CoalescingPublisher(local, interval=0.1)
+
+    async def scenario():
+        subscription = local.subscribe("ratings:1", latest_only=True)
+        received = []
+        for count in range(1, 1001):
+            publisher.publish("ratings:1", {"rating_count": count})
+        while not received or received[-1]["rating_count"] < 1000:
+            received.append(await asyncio.wait_for(subscription.get(), timeout=2))
+        return received
+
+    received = asyncio.run(scenario())
+    assert len(received) <= 2
+    assert received[-1] == {"rating_count": 1000}
+
+
+def test_slow_subscriber_keeps_only_the_latest():
+    local = Broker()
+
+    async def scenario():
+        subscription = local.subscribe("ratings:1", latest_only=True)
+        for count in range(1, 51):
+            local.publish("ratings:1", {"rating_count": count})
+        await asyncio.sleep(0)
+        return subscription.queue.qsize(), await subscription.get()
+
+    size, message = asyncio.run(scenario())
+    assert size == 1
+    assert message == {"rating_count": 50}
+
+
+def test_out_of_order_totals_never_win():
+    local = Broker()
+    publisher = CoalescingPublisher(local, interval=0.05)
+
+    async def scenario():
+        subscription = local.subscribe("ratings:1", latest_only=True)
+        events = rating_average_events(subscription, {"rating_count": 1, "version": 1})
+        await anext(events)
+        # A commit that finished first publishes last, in this worker and through the broker
+        publisher.publish("ratings:1", {"rating_count": 3, "version": 3})
+        publisher.publish("ratings:1", {"rating_count": 2, "version": 2})
+        first = event_data(await anext(events))
+        local.publish("ratings:1", {"rating_count": 2, "version": 2})
+        local.publish("ratings:1", {"rating_count": 4, "version": 4})
+        second = event_data(await anext(events))
+        await events.aclose()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == {"rating_count": 3, "version": 3}
+    assert second == {"rating_count": 4, "version": 4}
+
+
+def test_latest_only_subscription_keeps_the_newer_version():
+    local = Broker()
+
+    async def scenario():
+        subscription = local.subscribe("ratings:1", latest_only=True)
+        local.publish("ratings:1", {"rating_count": 5, "version": 5})
+        local.publish("ratings:1", {"rating_count": 4, "version": 4})
+        await asyncio.sleep(0)
+        return await subscription.get()
+
+    assert asyncio.run(scenario()) == {"rating_count": 5, "version": 5}
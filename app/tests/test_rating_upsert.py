@@ -0,0 +1,120 @@
+import json
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import select
+import app.models as models
+from app.crud import IDEMPOTENCY_CLAIM_TIMEOUT
+
+
+@pytest.fixture(scope="module")
+def headers(client, signup_and_login):
+    headers = signup_and_login("upsertuser")
+
+    for title in ("Upsert One", "Upsert Two"):
+        response = client.post("/movies", json={"title": title, "genre": "Drama"}, headers=headers)
+        assert response.status_code == 201
+    return headers
+
+
+def test_rate_movie_conflict(client, headers):
+    response = client.post("/movies/ratings/1", json={"rating_value": 6}, headers=headers)
+    assert response.status_code == 201
+    data = response.json()
+    assert data["rating_value"] == 6
+    assert data["user"]["username"] == "upsertuser"
+
+    response = client.post("/movies/ratings/1", json={"rating_value": 8}, headers=headers)
+    assert response.status_code == 409
+
+    response = client.post("/movies/ratings/99", json={"rating_value": 8}, headers=headers)
+    assert response.status_code == 404
+
+
+def test_upsert_rating(client, headers):
+    response = client.put("/movies/ratings/movie/2", json={"rating_value": 4})
+    assert response.status_code == 401
+
+    response = client.put("/movies/ratings/movie/2", json={"rating_value": 4}, headers=headers)
+    assert response.status_code == 200
+    created = response.json()
+    assert created["movie_id"] == 2
+    assert created["rating_value"] == 4
+
+    response = client.put("/movies/ratings/movie/2", json={"rating_value": 9}, headers=headers)
+    assert response.status_code == 200
+    updated = response.json()
+    assert updated["id"] == created["id"]
+    assert updated["rating_value"] == 9
+
+    response = client.put("/movies/ratings/movie/99", json={"rating_value": 9}, headers=headers)
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Movie not found"}
+
+
+def test_upsert_rating_idempotency_key(client, headers):
+    retry_headers = {**headers, "Idempotency-Key": "retry-1"}
+
+    response = client.put("/movies/ratings/movie/1", json={"rating_value": 2}, headers=retry_headers)
+    assert response.status_code == 200
+    assert "idempotent-replayed" not in response.headers
+    first = response.json()
+
+    # A later write must not be undone by replaying the original request
+    response = client.put("/movies/ratings/movie/1", json={"rating_value": 7}, headers=headers)
+    assert response.json()["rating_value"] == 7
+
+    response = client.put("/movies/ratings/movie/1", json={"rating_value": 2}, headers=retry_headers)
+    assert response.status_code == 200
+    assert response.headers["idempotent-replayed"] == "true"
+    assert response.json() == first
+    assert client.get(f"/movies/ratings/{first['id']}").json()["rating_value"] == 7
+
+    response = client.put("/movies/ratings/movie/1", json={"rating_value": 3}, headers=retry_headers)
+    assert response.status_code == 422
+
+
+def test_idempotency_key_shared_through_database(client, headers, db_session):
+    retry_headers = {**headers, "Idempotency-Key": "retry-2"}
+    response = client.put("/movies/ratings/movie/2", json={"rating_value": 4}, headers=retry_headers)
+    assert response.status_code == 200
+
+    # What another worker would find when the retry lands there
+    stored = db_session.execute(select(models.IdempotencyKey).where(models.IdempotencyKey.key == "retry-2")).scalar_one()
+    assert stored.fingerprint == "2:4"
+    assert json.loads(stored.response) == response.json()
+
+
+def test_idempotency_key_in_flight_and_failed(client, headers, db_session):
+    user_id = client.get("/users/name/upsertuser").json()["id"]
+    db_session.add(models.IdempotencyKey(user_id=user_id, key="in-flight", fingerprint="1:5"))
+    db_session.commit()
+
+    retry_headers = {**headers, "Idempotency-Key": "in-flight"}
+    response = client.put("/movies/ratings/movie/1", json={"rating_value": 5}, headers=retry_headers)
+    assert response.status_code == 409
+
+    # A request that failed frees its key, so the retry runs for real
+    retry_headers = {**headers, "Idempotency-Key": "too-early"}
+    response = client.put("/movies/ratings/movie/99", json={"rating_value": 5}, headers=retry_headers)
+    assert response.status_code == 404
+    response = client.post("/movies", json={"title": "Late", "genre": "Drama"}, headers=headers)
+    late_id = response.json()["id"]
+    response = client.put(f"/movies/ratings/movie/{late_id}", json={"rating_value": 5}, headers=retry_headers)
+    assert response.status_code == 200
+    assert "idempotent-replayed" not in response.headers
+
+
+def test_abandoned_idempotency_claim_can_be_reclaimed(client, headers, db_session):
+    # A request that died after claiming the key and before its response was stored
+    user_id = client.get("/users/name/upsertuser").json()["id"]
+    claimed_at = datetime.now(timezone.utc) - IDEMPOTENCY_CLAIM_TIMEOUT - timedelta(seconds=5)
+    db_session.add(models.IdempotencyKey(user_id=user_id, key="abandoned", fingerprint="1:6", created_at=claimed_at))
+    db_session.commit()
+
+    retry_headers = {**headers, "Idempotency-Key": "abandoned"}
+    response = client.put("/movies/ratings/movie/1", json={"rating_value": 6}, headers=retry_headers)
+    assert response.status_code == 200
+    assert "idempotent-replayed" not in response.headers
+
+    response = client.put("/movies/ratings/movie/1", json={"rating_value": 6}, headers=retry_headers)
+    assert response.headers["idempotent-replayed"] == "true"
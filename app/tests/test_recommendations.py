@@ -0,0 +1,75 @@
+import pytest
+from app.crud import rating_crud_service
+from app.recommendations import RecommendationStore, save_model, solve_factors, train_als
+
+# Two taste groups: users 1-2 like the action movies, users 3-4 the dramas
+TITLES = ("Action 1", "Action 2", "Action 3", "Drama 1", "Drama 2", "Drama 3")
+RATINGS = {
+    "recuser1": {"Action 1": 9, "Action 2": 8, "Drama 1": 2},
+    "recuser2": {"Action 1": 8, "Action 2": 9, "Action 3": 9, "Drama 1": 1, "Drama 2": 2},
+    "recuser3": {"Drama 1": 9, "Drama 2": 8, "Action 1": 2},
+    "recuser4": {"Drama 1": 8, "Drama 2": 9, "Drama 3": 9, "Action 1": 1, "Action 2": 2},
+}
+
+
+@pytest.fixture(scope="module")
+def movie_ids(client, signup_and_login):
+    headers = {username: signup_and_login(username) for username in RATINGS}
+    ids = {}
+    for title in TITLES:
+        response = client.post("/movies", json={"title": title, "genre": title.split()[0]}, headers=headers["recuser1"])
+        assert response.status_code == 201
+        ids[title] = response.json()["id"]
+
+    for username, ratings in RATINGS.items():
+        for title, value in ratings.items():
+            response = client.put(f"/movies/ratings/movie/{ids[title]}", json={"rating_value": value}, headers=headers[username])
+            assert response.status_code == 200
+    return ids
+
+
+@pytest.fixture
+def user_ids(client, movie_ids):
+    return {username: client.get(f"/users/name/{username}").json()["id"] for username in RATINGS}
+
+
+def test_recommendations_without_model(client, movie_ids, user_ids, monkeypatch, tmp_path):
+    monkeypatch.setattr("app.routers.users.recommendation_store", RecommendationStore(str(tmp_path)))
+
+    response = client.get(f"/users/{user_ids['recuser1']}/recommendations")
+
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+def test_recommendations_unknown_user(client, movie_ids):
+    response = client.get("/users/999/recommendations")
+    assert response.status_code == 404
+
+
+def test_recommendations(client, movie_ids, user_ids, db_session, monkeypatch, tmp_path):
+    model = train_als(rating_crud_service.get_rating_triples(db_session), factors=2, iterations=20, regularization=0.05)
+    save_model(model, str(tmp_path))
+    monkeypatch.setattr("app.routers.users.recommendation_store", RecommendationStore(str(tmp_path)))
+
+    response = client.get(f"/users/{user_ids['recuser1']}/recommendations", params={"limit": 2})
+
+    assert response.status_code == 200
+    recommended = [movie["title"] for movie in response.json()]
+    # Already-rated movies are never recommended
+    assert not set(recommended) & set(RATINGS["recuser1"])
+    assert recommended[0] == "Action 3"
+
+
+def test_rows_longer_than_a_chunk_solve_the_same(monkeypatch):
+    import numpy as np
+    from scipy import sparse
+
+    rng = np.random.default_rng(0)
+    ratings = sparse.random(6, 40, density=0.5, format="csr", random_state=1, dtype=np.float32)
+    fixed = rng.normal(0, 1, (40, 4)).astype(np.float32)
+    batched = solve_factors(ratings, fixed, 0.1)
+
+    # Every row now exceeds the chunk and takes the V.T @ V path
+    monkeypatch.setattr("app.recommendations.ALS_CHUNK_RATINGS", 3)
+    assert np.allclose(solve_factors(ratings, fixed, 0.1), batched, atol=1e-4)
@@ -0,0 +1,100 @@
+import asyncio
+import pytest
+from sqlalchemy import event
+from app.loaders import ModelLoader
+from app.tests.conftest import engine
+
+
+@pytest.fixture(scope="module")
+def headers(client, signup_and_login):
+    return signup_and_login("loaderuser")
+
+
+@pytest.fixture(scope="module")
+def movie_id(client, headers):
+    response = client.post("/movies", json={"title": "Loaded", "genre": "Drama"}, headers=headers)
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def count_statements(client, method, path, **kwargs):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        response = getattr(client, method)(path, **kwargs)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return response, statements
+
+
+def selects_from(statements, table):
+    return [statement for statement in statements if statement.startswith("SELECT") and f"FROM {table}" in statement]
+
+
+def test_rate_movie_does_not_preload_the_movie(client, headers, movie_id):
+    response, statements = count_statements(client, "post", f"/movies/ratings/{movie_id}", json={"rating_value": 6}, headers=headers)
+    assert response.status_code == 201
+    # User, insert, stats, trending read and write, rating refresh, rating.user
+    assert len(statements) == 7
+    assert selects_from(statements, "movies") == []
+
+    response, statements = count_statements(client, "post", f"/movies/ratings/{movie_id}", json={"rating_value": 6}, headers=headers)
+    assert response.status_code == 409
+    assert len(selects_from(statements, "movies")) == 1
+
+    response, statements = count_statements(client, "post", "/movies/ratings/999", json={"rating_value": 6}, headers=headers)
+    assert response.status_code == 404
+    assert len(statements) == 3
+
+
+def test_reply_reads_the_parent_once(client, headers, movie_id):
+    response = client.post(f"/movies/comments/{movie_id}", json={"comment": "Parent"}, headers=headers)
+    assert response.status_code == 201
+    parent_id = response.json()["id"]
+
+    response, statements = count_statements(client, "post", f"/movies/comments/reply_comment/{parent_id}", json={"comment": "Reply"}, headers=headers)
+    assert response.status_code == 201
+    assert response.json()["parent_id"] == parent_id
+    # User, parent, trending read and write, insert, reply refresh, reply.author
+    assert len(statements) == 7
+    assert len(selects_from(statements, "users")) == 2
+
+    response, statements = count_statements(client, "post", "/movies/comments/reply_comment/999", json={"comment": "Reply"}, headers=headers)
+    assert response.status_code == 404
+    assert len(statements) == 2
+
+
+def test_update_and_delete_comment(client, headers, movie_id):
+    response = client.post(f"/movies/comments/{movie_id}", json={"comment": "Draft"}, headers=headers)
+    comment_id = response.json()["id"]
+
+    response, statements = count_statements(client, "put", f"/movies/comments/{comment_id}", json={"comment": "Final"}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["comment"] == "Final"
+    assert len(statements) == 6
+
+    response, statements = count_statements(client, "delete", f"/movies/comments/{comment_id}", headers=headers)
+    assert response.status_code == 200
+    # User, comment, its replies for the cascade, delete
+    assert len(statements) == 4
+
+
+def test_concurrent_loads_share_one_fetch():
+    calls = []
+
+    def fetch(ids):
+        calls.append(sorted(ids))
+        return [type("Row", (), {"id": row_id})() for row_id in ids if row_id != 3]
+
+    loader = ModelLoader(fetch)
+
+    async def scenario():
+        first = await asyncio.gather(loader.load(1), loader.load(2), loader.load(3), loader.load(1))
+        second = await asyncio.gather(loader.load(2), loader.load(3))
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert calls == [[1, 2, 3]]
+    assert [row and row.id for row in first] == [1, 2, None, 1]
+    assert [row and row.id for row in second] == [2, None]
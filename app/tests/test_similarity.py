@@ -0,0 +1,77 @@
+import pytest
+from app.similarity import build_rating_matrix, iter_neighbors, refresh_similarities
+
+# Three users; "Alien" and "Aliens" are rated alike, "Notebook" the other way round
+RATINGS = {
+    "simuser1": {"Alien": 9, "Aliens": 8, "Notebook": 2},
+    "simuser2": {"Alien": 8, "Aliens": 9, "Notebook": 3},
+    "simuser3": {"Alien": 2, "Aliens": 3, "Notebook": 9},
+}
+
+
+@pytest.fixture(scope="module")
+def movie_ids(client, signup_and_login):
+    headers = {username: signup_and_login(username) for username in RATINGS}
+    ids = {}
+    for title in ("Alien", "Aliens", "Notebook"):
+        response = client.post("/movies", json={"title": title, "genre": "Drama"}, headers=headers["simuser1"])
+        assert response.status_code == 201
+        ids[title] = response.json()["id"]
+
+    for username, ratings in RATINGS.items():
+        for title, value in ratings.items():
+            response = client.put(f"/movies/ratings/movie/{ids[title]}", json={"rating_value": value}, headers=headers[username])
+            assert response.status_code == 200
+    return ids
+
+
+def test_similar_movies_before_refresh(client, movie_ids):
+    response = client.get(f"/movies/{movie_ids['Alien']}/similar")
+
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+def test_similar_movies_unknown_movie(client, movie_ids):
+    response = client.get("/movies/999/similar")
+    assert response.status_code == 404
+
+
+def test_similar_movies(client, movie_ids, db_session):
+    stats = refresh_similarities(db_session)
+    assert stats["movies"] == 3
+    assert stats["recomputed"] == 3
+
+    response = client.get(f"/movies/{movie_ids['Alien']}/similar")
+
+    assert response.status_code == 200
+    similar = response.json()
+    assert [movie["title"] for movie in similar] == ["Aliens"]
+    assert 0 < similar[0]["score"] <= 1
+
+
+def test_refresh_is_incremental(client, movie_ids, db_session, signup_and_login):
+    assert refresh_similarities(db_session)["recomputed"] == 0
+
+    headers = signup_and_login("simuser4")
+    response = client.put(f"/movies/ratings/movie/{movie_ids['Notebook']}", json={"rating_value": 7}, headers=headers)
+    assert response.status_code == 200
+
+    stats = refresh_similarities(db_session)
+    assert 0 < stats["recomputed"] <= 3
+    assert refresh_similarities(db_session)["recomputed"] == 0
+
+
+def test_chunk_rows_shrink_with_the_movie_count(monkeypatch):
+    triples = [(user, movie, (user * movie) % 10 + 1) for user in range(1, 8) for movie in range(1, 12) if (user + movie) % 3]
+    matrix, *_ = build_rating_matrix(triples)
+    rows = list(range(matrix.shape[0]))
+    expected = [(row, list(neighbors)) for row, neighbors, _, _ in iter_neighbors(matrix, rows, 3)]
+
+    # Room for two rows of 11 movies per chunk
+    monkeypatch.setattr("app.similarity.SIMILARITY_CHUNK_CELLS", 22)
+    dots = []
+    original_dot = type(matrix).dot
+    monkeypatch.setattr(type(matrix), "dot", lambda self, other: dots.append(self.shape[0]) or original_dot(self, other))
+    assert [(row, list(neighbors)) for row, neighbors, _, _ in iter_neighbors(matrix, rows, 3)] == expected
+    assert dots == [2] * 5 + [1]
@@ -0,0 +1,89 @@
+import time
+from datetime import datetime, timedelta, timezone
+import pytest
+import app.schemas as schemas
+from app.crud import comment_crud_service, trending_crud_service
+from app.tests.conftest import TestingSessionLocal
+from app.trending import TRENDING_HALF_LIFE_SECONDS, decayed
+
+
+@pytest.fixture(scope="module")
+def headers(client, signup_and_login):
+    return [signup_and_login(f"trenduser{n}") for n in range(3)]
+
+
+@pytest.fixture(scope="module")
+def movie_ids(client, headers):
+    ids = {}
+    for title in ("Buzz", "Quiet", "Old News"):
+        response = client.post("/movies", json={"title": title, "genre": "Trending"}, headers=headers[0])
+        assert response.status_code == 201
+        ids[title] = response.json()["id"]
+
+    for user_headers in headers:
+        response = client.post(f"/movies/ratings/{ids['Buzz']}", json={"rating_value": 8}, headers=user_headers)
+        assert response.status_code == 201
+
+    # Comments go through the CRUD layer, which is where trending activity is recorded
+    db = TestingSessionLocal()
+    try:
+        for title, text in (("Buzz", "Everyone is talking about it"), ("Quiet", "Underrated")):
+            comment_crud_service.create_comment(db, schemas.CommentCreate(comment=text), movie_id=ids[title], user_id=1)
+    finally:
+        db.close()
+    return ids
+
+
+def test_decay_halves_every_half_life():
+    assert decayed(8.0, 0, TRENDING_HALF_LIFE_SECONDS) == 4.0
+    assert decayed(8.0, 0, 3 * TRENDING_HALF_LIFE_SECONDS) == 1.0
+
+
+def test_trending_by_genre(client, movie_ids):
+    response = client.get("/movies/trending/Trending")
+
+    assert response.status_code == 200
+    trending = response.json()
+    assert [movie["title"] for movie in trending] == ["Buzz", "Quiet"]
+    assert trending[0]["score"] == pytest.approx(3.5, rel=1e-3)
+    assert trending[1]["score"] == pytest.approx(0.5, rel=1e-3)
+
+
+def test_older_activity_ranks_lower(client, movie_ids, db_session):
+    # Five events three half-lives ago are worth 0.625 now, less than Quiet's single comment
+    trending_crud_service.record_activity(db_session, {movie_ids["Old News"]: 5.0}, at=time.time() - 3 * TRENDING_HALF_LIFE_SECONDS)
+    db_session.commit()
+
+    response = client.get("/movies/trending/Trending")
+    titles = [movie["title"] for movie in response.json()]
+    assert titles == ["Buzz", "Old News", "Quiet"]
+
+    response = client.get("/movies/trending", params={"limit": 1})
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+
+
+def test_rebuild_trending_replays_activity(client, movie_ids, db_session):
+    since = datetime.now(timezone.utc) - timedelta(days=1)
+    assert trending_crud_service.rebuild_trending(db_session, since) >= 2
+
+    response = client.get("/movies/trending/Trending")
+    assert [movie["title"] for movie in response.json()] == ["Buzz", "Quiet"]
+
+
+def test_re_rating_does_not_add_activity(client, movie_ids, headers):
+    response = client.post("/movies", json={"title": "Pumped", "genre": "Repeat"}, headers=headers[0])
+    pumped_id = response.json()["id"]
+
+    response = client.put(f"/movies/ratings/movie/{pumped_id}", json={"rating_value": 5}, headers=headers[1])
+    assert response.status_code == 200
+    first = client.get("/movies/trending/Repeat").json()[0]["score"]
+    assert first == pytest.approx(1.0, rel=1e-3)
+
+    for value in (6, 7, 8):
+        response = client.put(f"/movies/ratings/movie/{pumped_id}", json={"rating_value": value}, headers=headers[1])
+        assert response.status_code == 200
+        response = client.post("/movies/ratings/batch", json={"ratings": [{"movie_id": pumped_id, "rating_value": value}]}, headers=headers[1])
+        assert response.status_code == 200
+
+    assert client.get("/movies/trending/Repeat").json()[0]["score"] == pytest.approx(first, rel=1e-3)
@@ -0,0 +1,68 @@
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+from app.cli import main as cli_main
+from app.database import Base, TimedQueuePool
+from app.warmup import warm_up
+
+
+def test_warm_up_opens_pool_connections(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'warm.db'}", poolclass=TimedQueuePool, pool_size=3, max_overflow=0)
+    Base.metadata.create_all(bind=engine)
+
+    timings = warm_up([engine], connections=2)
+
+    assert "primary_ms" in timings
+    assert engine.pool.checkedin() == 2
+    assert engine.pool.checkedout() == 0
+
+
+def test_warm_up_survives_missing_schema(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+
+    timings = warm_up([engine])
+
+    assert "primary_ms" not in timings
+    assert "mappers_ms" in timings
+
+
+def test_create_schema_command(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    monkeypatch.setattr("app.cli.engine", engine)
+
+    assert cli_main(["create-schema"]) == 0
+    assert {"users", "movies", "ratings", "comments"} <= set(inspect(engine).get_table_names())
+
+
+def test_migrate_adds_constraints_to_existing_tables(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        # The ratings table as it was before the unique constraint and activity index
+        connection.exec_driver_sql(
+            "CREATE TABLE ratings (id INTEGER PRIMARY KEY, user_id INTEGER, movie_id INTEGER, rating_value INTEGER,"
+            " created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+        )
+        # Rating totals from before they carried a version
+        connection.exec_driver_sql(
+            "CREATE TABLE movie_rating_stats (movie_id INTEGER PRIMARY KEY, rating_count INTEGER NOT NULL, rating_sum INTEGER NOT NULL, "
+            + ", ".join(f"votes_{value} INTEGER NOT NULL" for value in range(1, 11))
+            + ", updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO ratings (user_id, movie_id, rating_value) VALUES (1, 1, 3), (1, 1, 8), (1, 2, 5), (2, NULL, 4), (2, NULL, 6)"
+        )
+    monkeypatch.setattr("app.cli.engine", engine)
+    monkeypatch.setattr("app.cli.SessionLocal", sessionmaker(bind=engine))
+
+    assert cli_main(["migrate"]) == 0
+
+    assert "version" in {column["name"] for column in inspect(engine).get_columns("movie_rating_stats")}
+    indexes = {index["name"] for index in inspect(engine).get_indexes("ratings")}
+    assert {"uq_ratings_user_movie", "ix_ratings_user_created"} <= indexes
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT user_id, movie_id, rating_value FROM ratings ORDER BY id").all() == [
+            (1, 1, 8), (1, 2, 5), (2, None, 4), (2, None, 6),
+        ]
+        assert connection.exec_driver_sql("SELECT movie_id, rating_count FROM movie_rating_stats ORDER BY movie_id").all() == [(1, 1), (2, 1)]
+
+    # A second run finds nothing left to do
+    assert cli_main(["migrate"]) == 0
@@ -0,0 +1,21 @@
+import math
+from app.config import get_settings
+
+# Trending scores decay exponentially: an event counts half as much after every half-life.
+# Scores are stored as of their last event and decayed when read, so writes touch one row
+TRENDING_HALF_LIFE_SECONDS = get_settings().trending_half_life_hours * 3600
+TRENDING_RATING_WEIGHT = 1.0
+TRENDING_COMMENT_WEIGHT = 0.5
+# Activity replayed by `python -m app.cli rebuild-trending`
+TRENDING_REBUILD_DAYS = 14
+TRENDING_MAX_LIMIT = 100
+
+
+def decayed(score: float, updated_at: float, now: float):
+    return score * 2 ** (-(now - updated_at) / TRENDING_HALF_LIFE_SECONDS)
+
+
+# Every score decays by the same factor, so movies order the same at any later time by
+# log2(score) + updated_at / half-life; stored and indexed, it serves ORDER BY ... LIMIT
+def rank_key(score: float, updated_at: float):
+    return math.log2(score) + updated_at / TRENDING_HALF_LIFE_SECONDS
@@ -0,0 +1,73 @@
+import time
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, configure_mappers
+from sqlalchemy.pool import QueuePool
+
+from app.auth import pwd_context
+from app.config import get_settings
+from app.crud import comment_crud_service, movie_crud_service, rating_crud_service, user_crud_service
+from app.logger import logger
+
+# Run once per worker from the lifespan handler, before the first request is accepted
+STARTUP_WARMUP = get_settings().startup_warmup
+WARMUP_CONNECTIONS = get_settings().warmup_connections
+
+# The hot read paths; id 0 never matches, so each one only compiles its statement and
+# round-trips once
+WARMUP_QUERIES = (
+    lambda db: user_crud_service.get_user_by_email_or_username(db, ""),
+    lambda db: user_crud_service.get_user_by_id(db, 0),
+    lambda db: movie_crud_service.get_movies(db, limit=1),
+    lambda db: movie_crud_service.get_movie_by_id(db, 0),
+    lambda db: rating_crud_service.get_rating_by_id(db, 0),
+    lambda db: rating_crud_service.aggregate_rating(db, 0),
+    lambda db: comment_crud_service.get_comments_by_movie(db, 0, limit=1),
+)
+
+
+# Opens up to `connections` connections at once so the pool keeps them for the first requests
+def warm_pool(engine, connections: int = WARMUP_CONNECTIONS):
+    if isinstance(engine.pool, QueuePool):
+        connections = min(connections, engine.pool.size())
+    held = []
+    try:
+        for _ in range(max(1, connections)):
+            connection = engine.connect()
+            held.append(connection)
+            connection.exec_driver_sql("SELECT 1")
+    finally:
+        for connection in held:
+            connection.close()
+
+
+# Fills the engine's compiled statement cache for the hot queries
+def warm_queries(engine):
+    with Session(bind=engine) as db:
+        for query in WARMUP_QUERIES:
+            query(db)
+
+
+def warm_up(engines, connections: int = WARMUP_CONNECTIONS):
+    timings = {}
+
+    start = time.perf_counter()
+    configure_mappers()
+    # The bcrypt backend and jose are otherwise loaded by the first login
+    pwd_context.handler().get_backend()
+    import jose.jwt  # noqa: F401
+    timings["mappers_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+    for index, engine in enumerate(engines):
+        name = "primary" if index == 0 else f"replica_{index}"
+        start = time.perf_counter()
+        try:
+            warm_pool(engine, connections)
+            warm_queries(engine)
+        except SQLAlchemyError as exc:
+            # A missing schema must not keep the worker from serving
+            logger.warning('Warm-up of the %s database failed: %s', name, exc.__class__.__name__, extra={'error': str(exc)})
+            continue
+        timings[f"{name}_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+    logger.info('Warm-up finished', extra=timings)
+    return timings
@@ -0,0 +1,61 @@
+import asyncio
+import os
+import time
+
+# The app refuses to import without a database URL; benchmarks default to a throwaway SQLite file
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+
+def percentile(sorted_samples, fraction: float):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, round(fraction * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def summarize(samples_ms, elapsed_s: float):
+    samples = sorted(samples_ms)
+    return {
+        "requests": len(samples),
+        "rps": round(len(samples) / elapsed_s, 1) if elapsed_s else 0.0,
+        "p50_ms": round(percentile(samples, 0.50), 3),
+        "p95_ms": round(percentile(samples, 0.95), 3),
+        "p99_ms": round(percentile(samples, 0.99), 3),
+        "max_ms": round(samples[-1], 3) if samples else 0.0,
+    }
+
+
+# Drive an ASGI app in-process (or a running server when base_url is given) with
+# `concurrency` clients issuing `requests` calls in total. `path` may be a callable
+# returning a fresh path per request, e.g. to spread lookups over random ids.
+async def run_load(app, method: str, path, requests: int, concurrency: int, base_url: str | None = None, **kwargs):
+    import httpx
+
+    samples = []
+    errors = 0
+    remaining = iter(range(requests))
+    next_path = path if callable(path) else (lambda: path)
+
+    async def worker(client):
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await client.request(method, next_path(), **kwargs)
+            samples.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 500:
+                errors += 1
+
+    if base_url:
+        client = httpx.AsyncClient(base_url=base_url, timeout=60)
+    else:
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark")
+    async with client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    summary = summarize(samples, elapsed)
+    summary["server_errors"] = errors
+    return summary
@@ -0,0 +1,231 @@
+# Per-method benchmarks of the *CRUDService layer at several data sizes. Each call is timed on
+# a fresh session, with its SQL statement count and tracemalloc allocations recorded alongside.
+#
+#   python -m benchmarks.crud --sizes 10 10k 1m --output crud_baseline.json
+#   python -m benchmarks.crud --baseline crud_baseline.json --max-regression 20
+#
+# At size N the target movie holds exactly N ratings, and get_replies walks a chain of
+# --reply-depth nested replies, whatever the number of movies the rest of the data spreads over.
+#
+# With --baseline the run exits non-zero when a method is more than --max-regression percent
+# slower (median) than in the baseline, or issues more queries than it did.
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.seed import insert_chunks, seed
+
+# Movie read by the per-movie cases; its ratings are replaced so it holds exactly `size` of them
+TARGET_MOVIE_ID = 1
+REPLY_CHAIN_DEPTH = 100
+REPLY_CHAIN_ROOT = "Reply chain root"
+
+
+def parse_size(value: str):
+    value = value.lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(value[-1], 1)
+    return int(float(value.rstrip("km")) * multiplier)
+
+
+# Rows per table for one data size; one user per rating, so the target movie can get `size`
+# ratings from distinct users
+def dataset_counts(size: int, movies: int = 10):
+    return {"users": max(10, size), "movies": movies, "ratings": size, "comments": size}
+
+
+# Gives the target movie exactly `size` ratings and hangs a chain of `reply_depth` nested replies
+# off a new comment on it
+def seed_targets(engine, size: int, reply_depth: int = REPLY_CHAIN_DEPTH, seed_value: int = 42):
+    from sqlalchemy import delete, func, select
+    from sqlalchemy.orm import Session
+    from app.crud import rating_stats_crud_service
+    import app.models as models
+
+    rng = random.Random(seed_value)
+    with engine.begin() as connection:
+        connection.execute(delete(models.Rating).where(models.Rating.movie_id == TARGET_MOVIE_ID))
+        ratings = ({"user_id": user_id, "movie_id": TARGET_MOVIE_ID, "rating_value": rng.randint(1, 10)}
+                   for user_id in range(1, size + 1))
+        insert_chunks(connection, models.Rating.__table__, ratings, 5000)
+
+        first_id = (connection.execute(select(func.max(models.Comment.id))).scalar() or 0) + 1
+        chain = (
+            {"id": first_id + depth, "user_id": 1, "movie_id": TARGET_MOVIE_ID,
+             "parent_id": first_id + depth - 1 if depth else None,
+             "comment": REPLY_CHAIN_ROOT if depth == 0 else f"Reply at depth {depth}"}
+            for depth in range(reply_depth + 1)
+        )
+        insert_chunks(connection, models.Comment.__table__, chain, 5000)
+        if engine.dialect.name == "postgresql":
+            connection.exec_driver_sql("SELECT setval(pg_get_serial_sequence('comments', 'id'), MAX(id)) FROM comments")
+
+    with Session(engine) as db:
+        rating_stats_crud_service.rebuild_stats(db)
+
+
+def build_cases():
+    from sqlalchemy import select
+    import app.models as models
+    import app.schemas as schemas
+    from app.crud import comment_crud_service, movie_crud_service, rating_crud_service, user_crud_service
+
+    def reply_chain_root(db):
+        return db.execute(select(models.Comment.id).where(models.Comment.comment == REPLY_CHAIN_ROOT)).scalar()
+
+    # One get_replies call per level, from the root down to the deepest reply
+    def walk_reply_chain(db, parent_id):
+        while replies := comment_crud_service.get_replies(db, parent_id):
+            parent_id = replies[0].id
+
+    # name -> (setup(db) returning call arguments, call(db, args))
+    return {
+        "UserCRUDService.get_users": (lambda db: None, lambda db, _: user_crud_service.get_users(db, offset=0, limit=10)),
+        "UserCRUDService.get_user_by_id": (lambda db: None, lambda db, _: user_crud_service.get_user_by_id(db, 1)),
+        "UserCRUDService.get_user_by_username": (lambda db: None, lambda db, _: user_crud_service.get_user_by_username(db, "bench_user_1")),
+        "UserCRUDService.get_user_by_email_or_username": (
+            lambda db: None, lambda db, _: user_crud_service.get_user_by_email_or_username(db, "bench_user_1")),
+        "MovieCRUDService.get_movies": (lambda db: None, lambda db, _: movie_crud_service.get_movies(db, offset=0, limit=10)),
+        "MovieCRUDService.get_movie_by_id": (lambda db: None, lambda db, _: movie_crud_service.get_movie_by_id(db, TARGET_MOVIE_ID)),
+        "MovieCRUDService.get_movie_by_genre": (lambda db: None, lambda db, _: movie_crud_service.get_movie_by_genre(db, "Comedy")),
+        "MovieCRUDService.get_existing_movie_ids": (
+            lambda db: list(range(1, 101)), lambda db, ids: movie_crud_service.get_existing_movie_ids(db, ids)),
+        "RatingCRUDService.get_ratings": (lambda db: None, lambda db, _: rating_crud_service.get_ratings(db, offset=0, limit=10)),
+        "RatingCRUDService.get_ratings_by_movie": (lambda db: None, lambda db, _: rating_crud_service.get_ratings_by_movie(db, TARGET_MOVIE_ID)),
+        "RatingCRUDService.aggregate_rating": (lambda db: None, lambda db, _: rating_crud_service.aggregate_rating(db, TARGET_MOVIE_ID)),
+        "RatingCRUDService.upsert_rating": (
+            lambda db: schemas.RatingCreate(rating_value=7),
+            lambda db, rating: rating_crud_service.upsert_rating(db, rating, user_id=1, movie_id=TARGET_MOVIE_ID)),
+        "CommentCRUDService.get_comments": (lambda db: None, lambda db, _: comment_crud_service.get_comments(db, offset=0, limit=10)),
+        "CommentCRUDService.get_comment_by_id": (lambda db: None, lambda db, _: comment_crud_service.get_comment_by_id(db, 1)),
+        "CommentCRUDService.get_replies": (reply_chain_root, walk_reply_chain),
+        "CommentCRUDService.get_comments_by_movie": (lambda db: None, lambda db, _: comment_crud_service.get_comments_by_movie(db, TARGET_MOVIE_ID)),
+    }
+
+
+def count_queries(engine):
+    from sqlalchemy import event
+
+    counter = {"queries": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter["queries"] += 1
+
+    return counter
+
+
+def measure(session_factory, counter, setup, call, rounds: int):
+    with session_factory() as db:
+        args = setup(db)
+        call(db, args)  # warm-up
+
+    samples = []
+    queries = 0
+    for _ in range(rounds):
+        with session_factory() as db:
+            before = counter["queries"]
+            start = time.perf_counter()
+            call(db, args)
+            samples.append((time.perf_counter() - start) * 1000)
+            queries = counter["queries"] - before
+
+    # Tracing slows everything down, so allocations are measured on a separate call
+    with session_factory() as db:
+        tracemalloc.start()
+        try:
+            baseline_bytes, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            call(db, args)
+            current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "median_ms": round(statistics.median(samples), 4),
+        "min_ms": round(min(samples), 4),
+        "queries": queries,
+        "peak_alloc_kb": round((peak_bytes - baseline_bytes) / 1024, 1),
+        "retained_kb": round((current_bytes - baseline_bytes) / 1024, 1),
+    }
+
+
+def run(sizes: list[int], rounds: int, selected: list[str] | None, database_url: str | None,
+        movies: int = 10, reply_depth: int = REPLY_CHAIN_DEPTH):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    cases = build_cases()
+    names = selected or list(cases)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            url = database_url or f"sqlite:///{os.path.join(directory, f'crud_{size}.db')}"
+            engine = create_engine(url)
+            seed(engine, dataset_counts(size, movies), reply_ratio=0.9, reset=True)
+            seed_targets(engine, size, reply_depth)
+            counter = count_queries(engine)
+            session_factory = sessionmaker(bind=engine)
+
+            for name in names:
+                setup, call = cases[name]
+                results[f"{name}[{size}]"] = measure(session_factory, counter, setup, call, rounds)
+            engine.dispose()
+
+    return results
+
+
+def find_regressions(results: dict, baseline: dict, max_regression: float):
+    regressions = []
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        if previous["median_ms"] and result["median_ms"] > previous["median_ms"] * (1 + max_regression / 100):
+            change = (result["median_ms"] - previous["median_ms"]) / previous["median_ms"] * 100
+            regressions.append(f"{key}: {previous['median_ms']}ms -> {result['median_ms']}ms (+{change:.1f}%)")
+        if result["queries"] > previous["queries"]:
+            regressions.append(f"{key}: {previous['queries']} -> {result['queries']} queries")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the CRUD service methods")
+    parser.add_argument("--sizes", nargs="*", default=["10", "10k"], help="Rows per table, e.g. 10 10k 1m")
+    parser.add_argument("--movies", type=int, default=10, help="Movies the rest of the ratings and comments spread over")
+    parser.add_argument("--reply-depth", type=int, default=REPLY_CHAIN_DEPTH, help="Nested replies walked by get_replies")
+    parser.add_argument("--rounds", type=int, default=20, help="Timed calls per method and size")
+    parser.add_argument("--methods", nargs="*", default=None, help="Subset, e.g. RatingCRUDService.aggregate_rating")
+    parser.add_argument("--database-url", default=None, help="Reset and reseed this database instead of temporary SQLite files")
+    parser.add_argument("--output", default=None, help="Write the results (usable as a later --baseline)")
+    parser.add_argument("--baseline", default=None, help="Earlier results to gate against")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="Allowed median slowdown in percent")
+    args = parser.parse_args(argv)
+
+    import logging
+    logging.disable(logging.INFO)
+
+    results = run([parse_size(size) for size in args.sizes], args.rounds, args.methods, args.database_url,
+                  movies=args.movies, reply_depth=args.reply_depth)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.max_regression)
+        if regressions:
+            print("Regressions against the baseline:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# Drive the Movie API with concurrent clients per endpoint and report RPS and latency
+# percentiles as JSON. Seed the database first with `python -m benchmarks.seed`.
+#
+#   python -m benchmarks.load --requests 2000 --concurrency 8 --output results.json
+#   python -m benchmarks.load --base-url http://localhost:8000 --baseline results.json
+#
+# Without --base-url the real ASGI app is driven in-process through httpx.
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+
+import benchmarks.common as common
+from benchmarks.seed import PASSWORD
+
+
+def build_scenarios(max_ids: dict, rng: random.Random):
+    movie_id = lambda: rng.randint(1, max_ids["movies"])
+    user_id = lambda: rng.randint(1, max_ids["users"])
+    page = lambda total: rng.randint(0, max(0, total - 10))
+
+    return {
+        "list_movies": ("GET", lambda: f"/movies/?offset={page(max_ids['movies'])}&limit=10", False),
+        "get_movie": ("GET", lambda: f"/movies/{movie_id()}", False),
+        "average_rating": ("GET", lambda: f"/movies/ratings/average_rating/{movie_id()}", False),
+        "list_comments": ("GET", lambda: f"/movies/comments/?offset={page(max_ids['comments'])}&limit=10", False),
+        "comments_by_movie": ("GET", lambda: f"/movies/comments/movie/{movie_id()}", False),
+        "get_user": ("GET", lambda: f"/users/{user_id()}", False),
+        "upsert_rating": ("PUT", lambda: f"/movies/ratings/movie/{movie_id()}", True),
+    }
+
+
+def seeded_max_ids():
+    from sqlalchemy import func, select
+    from app.database import engine
+    import app.models as models
+
+    with engine.connect() as connection:
+        return {
+            name: connection.execute(select(func.coalesce(func.max(model.id), 1))).scalar()
+            for name, model in (("users", models.User), ("movies", models.Movie), ("comments", models.Comment))
+        }
+
+
+async def login(app, base_url: str | None):
+    import httpx
+
+    if base_url:
+        client = httpx.AsyncClient(base_url=base_url)
+    else:
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark")
+    async with client:
+        response = await client.post("/login", data={"username": "bench_user_1", "password": PASSWORD})
+        response.raise_for_status()
+        return response.json()["access_token"]
+
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, baseline: dict):
+    deltas = {}
+    for name, result in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous:
+            continue
+        deltas[name] = {
+            "rps_change_pct": round((result["rps"] - previous["rps"]) / previous["rps"] * 100, 1) if previous["rps"] else None,
+            "p99_change_pct": round((result["p99_ms"] - previous["p99_ms"]) / previous["p99_ms"] * 100, 1) if previous["p99_ms"] else None,
+        }
+    return deltas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the Movie API")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--endpoints", nargs="*", default=None, help="Subset of scenarios to run")
+    parser.add_argument("--base-url", default=None, help="Target a running server instead of the in-process app")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    parser.add_argument("--baseline", default=None, help="Earlier JSON report to compare against")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    import logging
+    from app.database import engine
+    from app.main import app
+
+    # Logging I/O is measured by benchmarks.logging_latency; keep it out of these numbers
+    logging.disable(logging.INFO)
+
+    # The routes are async but use blocking sessions, so in-process a checkout that has to wait
+    # blocks the one event loop that would release a connection; it only ends at pool_timeout
+    capacity = getattr(engine.pool, "size", lambda: 0)() + max(0, getattr(engine.pool, "_max_overflow", 0))
+    if not args.base_url and capacity and args.concurrency > capacity:
+        print(f"warning: concurrency {args.concurrency} exceeds the pool's {capacity} connections; "
+              "in-process requests will stall on checkout", file=sys.stderr)
+
+    rng = random.Random(args.seed)
+    max_ids = seeded_max_ids()
+    scenarios = build_scenarios(max_ids, rng)
+    selected = args.endpoints or list(scenarios)
+
+    token = asyncio.run(login(app, args.base_url)) if any(scenarios[name][2] for name in selected) else None
+
+    results = {}
+    for name in selected:
+        method, path, needs_auth = scenarios[name]
+        kwargs = {}
+        if needs_auth:
+            kwargs["headers"] = {"Authorization": f"Bearer {token}"}
+        if method in ("POST", "PUT"):
+            kwargs["json"] = {"rating_value": rng.randint(1, 10)}
+        # Short warm-up so pools and caches are populated before measuring
+        asyncio.run(common.run_load(app, method, path, max(1, args.requests // 10), args.concurrency, base_url=args.base_url, **kwargs))
+        results[name] = asyncio.run(common.run_load(app, method, path, args.requests, args.concurrency, base_url=args.base_url, **kwargs))
+
+    report = {
+        "commit": current_commit(),
+        "timestamp": int(time.time()),
+        "target": args.base_url or "in-process",
+        "database": engine.url.render_as_string(hide_password=True),
+        "seeded_ids": max_ids,
+        "requests_per_endpoint": args.requests,
+        "concurrency": args.concurrency,
+        "results": results,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["compared_to"] = compare(results, json.load(f))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# Request latency with logging shipped through the queue, logged synchronously, and disabled.
+#
+#   python -m benchmarks.logging_latency --requests 5000 --concurrency 20
+import argparse
+import asyncio
+import json
+import logging
+import os
+
+import benchmarks.common as common
+
+
+def configure(mode: str):
+    from app import logger as app_logger
+
+    logging.disable(logging.NOTSET)
+    root = logging.getLogger()
+    if mode == "off":
+        logging.disable(logging.CRITICAL)
+    elif mode == "sync":
+        # The pre-queue setup: handlers run on the request path
+        root.handlers = [handler for handler in (app_logger.stream_handler, app_logger.better_stack_handler) if handler]
+    else:
+        root.handlers = [app_logger.queue_handler]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--path", default="/")
+    args = parser.parse_args(argv)
+
+    from app import logger as app_logger
+    from app.main import app
+
+    # Keep stdout for the report
+    app_logger.stream_handler.setStream(open(os.devnull, "w"))
+
+    results = {}
+    for mode in ("off", "queued", "sync"):
+        configure(mode)
+        asyncio.run(common.run_load(app, "GET", args.path, args.requests // 10, args.concurrency))
+        results[mode] = asyncio.run(common.run_load(app, "GET", args.path, args.requests, args.concurrency))
+    configure("queued")
+    results["queued"]["dropped_records"] = app_logger.get_log_stats()["dropped"]
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
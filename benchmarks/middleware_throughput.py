@@ -0,0 +1,67 @@
+# Throughput of the request logging middleware: the old BaseHTTPMiddleware dispatch
+# function against the pure ASGI LogMiddleware, plus a run with no middleware at all.
+#
+#   python -m benchmarks.middleware_throughput --requests 5000 --concurrency 20
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import benchmarks.common as common
+
+
+# The dispatch function app.middleware used before LogMiddleware
+async def legacy_log_middleware(request, call_next):
+    from app.logger import logger
+
+    start_time = time.time()
+    response = await call_next(request)
+    elapsed_time = time.time() - start_time
+    log_data = {
+        'url': str(request.url),
+        'method': request.method,
+        'status_code': response.status_code,
+        'process_time': round(elapsed_time * 1000, 2)
+    }
+    logger.info('Request Info: %s', log_data, extra=log_data)
+    return response
+
+
+def use_middleware(app, variant: str):
+    from starlette.middleware.base import BaseHTTPMiddleware
+    from app.middleware import LogMiddleware
+
+    app.user_middleware.clear()
+    app.middleware_stack = None
+    if variant == "base_http":
+        app.add_middleware(BaseHTTPMiddleware, dispatch=legacy_log_middleware)
+    elif variant == "asgi":
+        app.add_middleware(LogMiddleware)
+    app.middleware_stack = app.build_middleware_stack()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--path", default="/")
+    args = parser.parse_args(argv)
+
+    from app import logger as app_logger
+    from app.main import app
+
+    # Keep stdout for the report
+    app_logger.stream_handler.setStream(open(os.devnull, "w"))
+
+    results = {}
+    for variant in ("none", "base_http", "asgi"):
+        use_middleware(app, variant)
+        asyncio.run(common.run_load(app, "GET", args.path, args.requests // 10, args.concurrency))
+        results[variant] = asyncio.run(common.run_load(app, "GET", args.path, args.requests, args.concurrency))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
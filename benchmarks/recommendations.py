@@ -0,0 +1,65 @@
+# Request-time scoring latency of the recommendation model: one matrix-vector product over
+# every movie factor plus argpartition, read from memory-mapped factors.
+#
+#   python -m benchmarks.recommendations --movies 1000000 --factors 32 --requests 500
+import argparse
+import json
+import random
+import tempfile
+import time
+
+import benchmarks.common as common
+
+
+def synthetic_model(users: int, movies: int, factors: int, seed: int):
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    return {
+        "user_ids": np.arange(1, users + 1, dtype=np.int32),
+        "movie_ids": np.arange(1, movies + 1, dtype=np.int32),
+        "user_factors": rng.normal(0, 0.3, (users, factors)).astype(np.float32),
+        "movie_factors": rng.normal(0, 0.3, (movies, factors)).astype(np.float32),
+        "global_mean": 6.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark recommendation scoring")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--movies", type=int, default=1_000_000)
+    parser.add_argument("--factors", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--rated", type=int, default=50, help="Already-rated movies excluded per request")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    from app.recommendations import RecommendationModel, save_model
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        path = save_model(synthetic_model(args.users, args.movies, args.factors, args.seed), directory)
+
+        started = time.perf_counter()
+        model = RecommendationModel(path)
+        load_ms = (time.perf_counter() - started) * 1000
+
+        samples = []
+        started = time.perf_counter()
+        for _ in range(args.requests):
+            user_id = rng.randint(1, args.users)
+            rated = rng.sample(range(1, args.movies + 1), min(args.rated, args.movies))
+            start = time.perf_counter()
+            model.recommend(user_id, rated, args.limit)
+            samples.append((time.perf_counter() - start) * 1000)
+        elapsed = time.perf_counter() - started
+        del model
+
+    report = common.summarize(samples, elapsed)
+    report.update({"movies": args.movies, "factors": args.factors, "load_ms": round(load_ms, 3)})
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# Seed synthetic users, movies, ratings and threaded comments for load tests.
+#
+#   DATABASE_URL=postgresql://localhost/movies_bench python -m benchmarks.seed --scale 1m --reset
+#   python -m benchmarks.seed --users 500 --movies 2000 --ratings 20000 --comments 5000
+#
+# Every seeded user can log in as bench_user_<n> with the password "benchmark".
+import argparse
+import json
+import random
+import time
+from array import array
+
+import benchmarks.common as common
+
+# Total row count -> share of users/movies/ratings/comments
+SCALES = {
+    "10k": 10_000,
+    "100k": 100_000,
+    "1m": 1_000_000,
+    "10m": 10_000_000,
+}
+SHARES = {"users": 0.05, "movies": 0.10, "ratings": 0.60, "comments": 0.25}
+GENRES = ["Action", "Comedy", "Drama", "Horror", "Romance", "Sci-Fi", "Thriller", "Documentary", "Animation", "Fantasy"]
+PASSWORD = "benchmark"
+
+
+def plan_counts(scale: str | None, users: int | None, movies: int | None, ratings: int | None, comments: int | None):
+    total = SCALES[scale] if scale else 0
+    counts = {name: int(total * share) for name, share in SHARES.items()}
+    for name, value in (("users", users), ("movies", movies), ("ratings", ratings), ("comments", comments)):
+        if value is not None:
+            counts[name] = value
+    counts["users"] = max(1, counts["users"])
+    counts["movies"] = max(1, counts["movies"])
+    # One rating per (user, movie) pair
+    counts["ratings"] = min(counts["ratings"], counts["users"] * counts["movies"])
+    return counts
+
+
+def insert_chunks(connection, table, rows, chunk_size: int):
+    chunk = []
+    inserted = 0
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            connection.execute(table.insert(), chunk)
+            inserted += len(chunk)
+            chunk = []
+    if chunk:
+        connection.execute(table.insert(), chunk)
+        inserted += len(chunk)
+    return inserted
+
+
+def generate_users(count: int, hashed_password: str):
+    for i in range(1, count + 1):
+        yield {
+            "id": i,
+            "email": f"bench_user_{i}@example.com",
+            "username": f"bench_user_{i}",
+            "full_name": f"Bench User {i}",
+            "hashed_password": hashed_password,
+        }
+
+
+def generate_movies(count: int, users: int, rng: random.Random):
+    for i in range(1, count + 1):
+        yield {
+            "id": i,
+            "title": f"Bench Movie {i}",
+            "genre": GENRES[i % len(GENRES)],
+            "description": f"Synthetic movie number {i}",
+            "release_year": rng.randint(1950, 2025),
+            "user_id": rng.randint(1, users),
+        }
+
+
+def generate_ratings(count: int, users: int, movies: int, rng: random.Random):
+    # Rating i belongs to user i % users; each user walks the movies from a per-user offset,
+    # so (user, movie) pairs never repeat while i < users * movies
+    for i in range(count):
+        user_index = i % users
+        movie_index = (i // users + user_index * 7919) % movies
+        yield {
+            "id": i + 1,
+            "user_id": user_index + 1,
+            "movie_id": movie_index + 1,
+            "rating_value": rng.randint(1, 10),
+        }
+
+
+def generate_comments(count: int, users: int, movies: int, reply_ratio: float, rng: random.Random):
+    movie_of = array("i")
+    for i in range(count):
+        if i and rng.random() < reply_ratio:
+            # Replies attach to any earlier comment, which builds deep threads over time
+            parent_index = rng.randrange(i)
+            parent_id = parent_index + 1
+            movie_id = movie_of[parent_index]
+        else:
+            parent_id = None
+            movie_id = rng.randint(1, movies)
+        movie_of.append(movie_id)
+        yield {
+            "id": i + 1,
+            "user_id": rng.randint(1, users),
+            "movie_id": movie_id,
+            "parent_id": parent_id,
+            "comment": f"Synthetic comment {i + 1}",
+        }
+
+
+def seed(engine, counts: dict, chunk_size: int = 5000, reply_ratio: float = 0.4, reset: bool = False, seed_value: int = 42):
+    from sqlalchemy.orm import Session
+    from app.auth import get_password_hash
+    from app.crud import rating_stats_crud_service
+    from app.database import Base
+    import app.models as models
+
+    if reset:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    rng = random.Random(seed_value)
+    # Hashing once keeps seeding fast; all users share the same password
+    hashed_password = get_password_hash(PASSWORD)
+    timings = {}
+
+    with engine.begin() as connection:
+        steps = (
+            ("users", models.User.__table__, generate_users(counts["users"], hashed_password)),
+            ("movies", models.Movie.__table__, generate_movies(counts["movies"], counts["users"], rng)),
+            ("ratings", models.Rating.__table__, generate_ratings(counts["ratings"], counts["users"], counts["movies"], rng)),
+            ("comments", models.Comment.__table__, generate_comments(counts["comments"], counts["users"], counts["movies"], reply_ratio, rng)),
+        )
+        for name, table, rows in steps:
+            started = time.perf_counter()
+            insert_chunks(connection, table, rows, chunk_size)
+            timings[name] = round(time.perf_counter() - started, 2)
+
+        if engine.dialect.name == "postgresql":
+            # Explicit ids leave the serial sequences behind
+            for table in ("users", "movies", "ratings", "comments"):
+                connection.exec_driver_sql(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1)) FROM {table}"
+                )
+
+    # Ratings were inserted directly, so the aggregates the writes normally maintain start empty
+    started = time.perf_counter()
+    with Session(engine) as db:
+        rating_stats_crud_service.rebuild_stats(db)
+    timings["rating_stats"] = round(time.perf_counter() - started, 2)
+
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed synthetic data for benchmarks")
+    parser.add_argument("--scale", choices=SCALES, default=None, help="Total row count preset")
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--movies", type=int)
+    parser.add_argument("--ratings", type=int)
+    parser.add_argument("--comments", type=int)
+    parser.add_argument("--reply-ratio", type=float, default=0.4, help="Share of comments that are replies")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--reset", action="store_true", help="Drop and recreate all tables first")
+    args = parser.parse_args(argv)
+
+    from app.database import engine
+
+    counts = plan_counts(args.scale or (None if any((args.users, args.movies, args.ratings, args.comments)) else "10k"),
+                         args.users, args.movies, args.ratings, args.comments)
+    timings = seed(engine, counts, chunk_size=args.chunk_size, reply_ratio=args.reply_ratio, reset=args.reset)
+    print(json.dumps({"database": engine.url.render_as_string(hide_password=True), "rows": counts, "seconds": timings}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
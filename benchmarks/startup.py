@@ -0,0 +1,69 @@
+# Cold-start cost of one worker: importing app.main, running the lifespan startup, and the
+# first requests after it. Every run is a fresh interpreter, with and without warm-up.
+#
+#   python -m benchmarks.seed --scale 10k --reset
+#   python -m benchmarks.startup --runs 5
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+import benchmarks.common as common
+
+# Runs inside the child interpreter and prints its timings as one JSON line
+PROBE = """
+import asyncio, json, time
+import httpx
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+async def probe():
+    timings = {"import_ms": (imported - started) * 1000}
+    async with app.router.lifespan_context(app):
+        timings["startup_ms"] = (time.perf_counter() - imported) * 1000
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            for name in ("first_request_ms", "second_request_ms"):
+                start = time.perf_counter()
+                response = await client.get(PATH)
+                timings[name] = (time.perf_counter() - start) * 1000
+                timings["status"] = response.status_code
+    return timings
+
+print(json.dumps(asyncio.run(probe())))
+"""
+
+
+def run_once(path: str, warmup: bool):
+    env = dict(os.environ, STARTUP_WARMUP="true" if warmup else "false", LOG_FORMAT="json")
+    result = subprocess.run(
+        [sys.executable, "-c", f"PATH = {path!r}\n" + PROBE],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    # The app logs to stdout as well; the probe's report is the last JSON line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure worker startup time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/movies/1", help="Route requested right after startup")
+    args = parser.parse_args(argv)
+
+    report = {"database": os.environ["DATABASE_URL"], "runs": args.runs, "path": args.path}
+    for label, warmup in (("warmup", True), ("no_warmup", False)):
+        samples = [run_once(args.path, warmup) for _ in range(args.runs)]
+        report[label] = {
+            key: round(statistics.median(sample[key] for sample in samples), 2)
+            for key in ("import_ms", "startup_ms", "first_request_ms", "second_request_ms")
+        }
+        report[label]["status"] = samples[-1]["status"]
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()